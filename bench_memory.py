@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for client profiles
+Feeds synthetic GUILD_CREATE and MESSAGE_CREATE payloads into a client's
+connection state and reports resident memory per 1000 guilds.
+
+    python3 bench_memory.py --guilds 2000 --members 200 --messages 2000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+from client_profiles import PROFILES, client_options
+
+BOT_ID = 1 << 40
+
+
+def rss_bytes() -> int:
+    """Current resident set size"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def user_payload(user_id: int) -> dict:
+    return {'id': str(user_id), 'username': f'user{user_id}', 'discriminator': '0', 'avatar': None,
+            'global_name': f'User {user_id}', 'flags': 0}
+
+
+def guild_payload(guild_id: int, members: int, channels: int, roles: int) -> dict:
+    base = guild_id * 1_000_000
+    role_list = [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0,
+                  'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}]
+    role_list += [{'id': str(base + 500_000 + i), 'name': f'role{i}', 'permissions': '0', 'position': i + 1,
+                   'color': 0, 'hoist': False, 'managed': False, 'mentionable': False} for i in range(roles)]
+    channel_list = [{'id': str(base + 900_000 + i), 'type': 0, 'name': f'channel{i}', 'position': i,
+                     'permission_overwrites': [], 'guild_id': str(guild_id)} for i in range(channels)]
+    member_list = [{'user': user_payload(BOT_ID), 'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00',
+                    'deaf': False, 'mute': False, 'flags': 0}]
+    member_list += [{'user': user_payload(base + i), 'roles': [role_list[1 + i % roles]['id']] if roles else [],
+                     'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0}
+                    for i in range(members)]
+    return {
+        'id': str(guild_id), 'name': f'guild{guild_id}', 'owner_id': str(base), 'member_count': members + 1,
+        'roles': role_list, 'channels': channel_list, 'members': member_list, 'emojis': [], 'stickers': [],
+        'features': [], 'threads': [], 'voice_states': [], 'presences': [], 'large': members > 250,
+        'unavailable': False
+    }
+
+
+def message_payload(message_id: int, channel_id: int, guild_id: int, author_id: int) -> dict:
+    return {
+        'id': str(message_id), 'channel_id': str(channel_id), 'guild_id': str(guild_id),
+        'author': user_payload(author_id), 'content': 'x' * 80, 'timestamp': '2024-01-01T00:00:00+00:00',
+        'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [],
+        'attachments': [], 'embeds': [], 'pinned': False, 'type': 0
+    }
+
+
+async def measure(profile: str, guilds: int, members: int, channels: int, roles: int, messages: int) -> dict:
+    """Load a simulated guild set into a client and measure memory"""
+    import discord
+
+    client = discord.Client(**client_options(profile))
+    state = client._connection
+    state.user = discord.ClientUser(state=state, data={**user_payload(BOT_ID), 'bot': True, 'verified': True, 'mfa_enabled': False})
+
+    gc.collect()
+    tracemalloc.start()
+    rss_before = rss_bytes()
+
+    for guild_id in range(1, guilds + 1):
+        state._get_create_guild(guild_payload(guild_id, members, channels, roles))
+
+    # Message traffic as seen through MESSAGE_CREATE; the cache keeps up to max_messages
+    for i in range(messages):
+        guild_id = 1 + i % guilds
+        channel_id = guild_id * 1_000_000 + 900_000
+        if state._messages is not None:
+            channel = state.get_channel(channel_id)
+            message = discord.Message(state=state, channel=channel,
+                                      data=message_payload(10**15 + i, channel_id, guild_id, guild_id * 1_000_000))
+            state._messages.append(message)
+
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_bytes()
+
+    cached_members = sum(len(guild._members) for guild in state._guilds.values())
+    return {
+        'profile': profile,
+        'guilds': guilds,
+        'cached_members': cached_members,
+        'cached_messages': len(state._messages) if state._messages is not None else 0,
+        'rss_per_1k_guilds_mb': round((rss_after - rss_before) * 1000 / guilds / 2**20, 2),
+        'traced_per_1k_guilds_mb': round(traced * 1000 / guilds / 2**20, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure client memory per 1000 guilds")
+    parser.add_argument('--profile', choices=PROFILES, help="Run a single profile in this process")
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--members', type=int, default=100, help="Members per guild in GUILD_CREATE")
+    parser.add_argument('--channels', type=int, default=20)
+    parser.add_argument('--roles', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=1000, help="MESSAGE_CREATE events to replay")
+    args = parser.parse_args()
+
+    if args.profile:
+        result = asyncio.run(measure(args.profile, args.guilds, args.members, args.channels, args.roles,
+                                     args.messages))
+        print(json.dumps(result))
+        return
+
+    # Each profile runs in a fresh interpreter so RSS numbers are comparable
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile, '--guilds', str(args.guilds),
+             '--members', str(args.members), '--channels', str(args.channels), '--roles', str(args.roles),
+             '--messages', str(args.messages)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output)
+        print(f"{result['profile']:<8} guilds={result['guilds']} members={result['cached_members']} "
+              f"messages={result['cached_messages']} "
+              f"rss/1k guilds={result['rss_per_1k_guilds_mb']} MB "
+              f"traced/1k guilds={result['traced_per_1k_guilds_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for application button routing
+Compares the cost of making N pending applications' buttons clickable after a
+restart under the old per-message scheme (read persistent_views, build and
+register one View per message) and the current custom_id routing (one panel
+view plus the dynamic item classes, independent of N).
+
+    python3 bench_startup.py --applications 10000
+
+The old scheme also fetched every message over REST before attaching its view;
+those round trips are not simulated, so its numbers are a lower bound.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from tiers import DEFAULT_CATALOG
+
+SCHEMES = ('per_message', 'dynamic')
+
+
+def rss_bytes() -> int:
+    """Current resident set size"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def seed_persistent_views(path: str, applications: int):
+    """Persistent view rows as the old scheme stored them, one per pending application"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE persistent_views (
+            message_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            view_type TEXT NOT NULL,
+            view_data TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO persistent_views (message_id, channel_id, guild_id, view_type, view_data)
+        VALUES (?, '1', '1', 'tier_assignment', ?)
+    ''', [(str(10**15 + app_id), json.dumps({'application_id': app_id})) for app_id in range(1, applications + 1)])
+    conn.commit()
+    conn.close()
+
+
+def per_message_view(app_id: int):
+    """Equivalent of the removed PersistentTierAssignmentView: tier buttons plus "reject" """
+    import discord
+
+    view = discord.ui.View(timeout=None)
+    view.application_id = app_id
+    for index, tier in enumerate(DEFAULT_CATALOG):
+        view.add_item(discord.ui.Button(
+            label=tier.name,
+            style=discord.ButtonStyle.success if index == 0 else discord.ButtonStyle.secondary,
+            emoji=tier.emoji,
+            custom_id=f"assign_{tier.name.lower()}"
+        ))
+    view.add_item(discord.ui.Button(label="Отклонить", style=discord.ButtonStyle.danger, emoji="❌",
+                                    custom_id="reject_application"))
+    return view
+
+
+async def measure(scheme: str, applications: int) -> dict:
+    """Register button handlers for the given number of pending applications"""
+    import discord
+    from views import DYNAMIC_ITEMS, TierApplicationView
+
+    client = discord.Client(intents=discord.Intents.none())
+    db_path = None
+    if scheme == 'per_message':
+        db_path = tempfile.mktemp(suffix='.db')
+        seed_persistent_views(db_path, applications)
+
+    gc.collect()
+    tracemalloc.start()
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+
+    client.add_view(TierApplicationView())
+    if scheme == 'per_message':
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('SELECT message_id, view_data FROM persistent_views ORDER BY created_at DESC').fetchall()
+        conn.close()
+        for message_id, view_data in rows:
+            client.add_view(per_message_view(json.loads(view_data)['application_id']), message_id=int(message_id))
+    else:
+        client.add_dynamic_items(*DYNAMIC_ITEMS)
+
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_bytes()
+
+    if db_path:
+        os.remove(db_path)
+
+    return {
+        'scheme': scheme,
+        'applications': applications,
+        'registered_views': len(client.persistent_views),
+        'register_ms': round(elapsed * 1000, 2),
+        'rss_mb': round((rss_after - rss_before) / 2**20, 2),
+        'traced_mb': round(traced / 2**20, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare button registration cost at startup")
+    parser.add_argument('--scheme', choices=SCHEMES, help="Run a single scheme in this process")
+    parser.add_argument('--applications', type=int, default=10000, help="Pending applications")
+    args = parser.parse_args()
+
+    if args.scheme:
+        print(json.dumps(asyncio.run(measure(args.scheme, args.applications))))
+        return
+
+    # Each scheme runs in a fresh interpreter so RSS numbers are comparable
+    for scheme in SCHEMES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--scheme', scheme, '--applications', str(args.applications)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output)
+        print(f"{result['scheme']:<12} applications={result['applications']} "
+              f"views={result['registered_views']} register={result['register_ms']} ms "
+              f"rss={result['rss_mb']} MB traced={result['traced_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,38 +2,25 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from typing import Optional
-from views_persistent import PersistentTierApplicationView
-from models import get_tier_emoji
+from datetime import datetime, timezone
+from views import TierApplicationView
+from locks import LockTimeout
+from models import TierAssignment, to_epoch
+from tiers import MAX_TIERS, NO_TIER, TierDefinition, parse_color
+from pagination import KeysetPaginator
+from review_queue import REVIEW_PAGE_SIZE, ReviewQueueView
 from config import Config
 
+HISTORY_PAGE_SIZE = 10
+
 class TierCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
     
     async def check_user_permissions(self, interaction: discord.Interaction, need_admin: bool = False) -> bool:
         """Check if user has permissions to use bot commands"""
-        # Server owner and administrators always have access
-        if interaction.user.guild_permissions.administrator:
-            return True
-        
-        guild_id = str(interaction.guild.id)
-        
-        if need_admin:
-            # Check admin roles for tier assignment
-            admin_roles = await self.bot.db.get_guild_admin_roles(guild_id)
-            if admin_roles:
-                user_role_ids = [str(role.id) for role in interaction.user.roles]
-                return any(role_id in admin_roles for role_id in user_role_ids)
-            return False
-        else:
-            # Check allowed roles for general bot usage
-            allowed_roles = await self.bot.db.get_guild_allowed_roles(guild_id)
-            if not allowed_roles:
-                # If no roles set, allow everyone
-                return True
-            
-            user_role_ids = [str(role.id) for role in interaction.user.roles]
-            return any(role_id in allowed_roles for role_id in user_role_ids)
+        permissions = await self.bot.permissions.check(interaction.user)
+        return permissions.can_admin if need_admin else permissions.can_use
     
     @app_commands.command(name="tier_button", description="Отправить кнопку для подачи заявки на тир")
     @app_commands.describe(channel="Канал для отправки кнопки (по умолчанию текущий)")
@@ -48,18 +35,16 @@ class TierCommands(commands.Cog):
             return
         
         target_channel = channel or interaction.channel
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        tier_lines = "\n".join(f"{tier.emoji} **{tier.name}**" for tier in catalog)
         
         # Create embed
         embed = discord.Embed(
             title="🎯 Система тиров",
             description=(
                 "Подайте заявку на получение тира!\n\n"
-                "**Доступные тиры:**\n"
-                f"{get_tier_emoji('T1')} **T1** - Высший тир\n"
-                f"{get_tier_emoji('T2')} **T2** - Второй тир\n"
-                f"{get_tier_emoji('T3')} **T3** - Третий тир\n"
-                f"{get_tier_emoji('T4')} **T4** - Четвертый тир\n"
-                f"{get_tier_emoji('T5')} **T5** - Пятый тир\n\n"
+                "**Доступные тиры (от высшего к низшему):**\n"
+                f"{tier_lines}\n\n"
                 "Нажмите кнопку ниже, чтобы подать заявку!"
             ),
             color=Config.COLOR_INFO
@@ -67,19 +52,11 @@ class TierCommands(commands.Cog):
         
         embed.set_footer(text="Заполните все поля в форме для подачи заявки")
         
-        # Create persistent view with button
-        view = PersistentTierApplicationView()
+        # Create persistent view with button (registered once at startup for every message)
+        view = TierApplicationView()
         
         # Send message
-        message = await target_channel.send(embed=embed, view=view)
-        
-        # Save persistent view
-        await self.bot.db.save_persistent_view(
-            message_id=str(message.id),
-            channel_id=str(target_channel.id),
-            guild_id=str(interaction.guild.id),
-            view_type="tier_application"
-        )
+        await target_channel.send(embed=embed, view=view)
         
         await interaction.response.send_message(
             f"✅ Кнопка для подачи заявки отправлена в {target_channel.mention}",
@@ -98,7 +75,9 @@ class TierCommands(commands.Cog):
             return
         
         # Get leaderboard
-        leaderboard = await self.bot.db.get_tier_leaderboard(limit)
+        guild_id = str(interaction.guild.id)
+        leaderboard = await self.bot.db.get_tier_leaderboard(limit, guild_id=guild_id)
+        tier_counts = await self.bot.db.get_tier_counts(guild_id)
         
         if not leaderboard:
             await interaction.response.send_message(
@@ -107,44 +86,86 @@ class TierCommands(commands.Cog):
             )
             return
         
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        
         # Create embed
         embed = discord.Embed(
             title="🏆 Топ игроков по тирам",
-            description="Рейтинг игроков по тирам (T1 - высший)",
+            description=f"Рейтинг игроков по тирам ({catalog.names[0]} - высший)",
             color=Config.COLOR_INFO
         )
         
         # Group by tiers
         tiers_data = {}
         for player in leaderboard:
-            tier = player['tier']
+            tier = player.tier
             if tier not in tiers_data:
                 tiers_data[tier] = []
             tiers_data[tier].append(player)
         
+        # Resolve display names in one batch
+        names = await self.bot.names.resolve(interaction.guild, [player.discord_id for player in leaderboard])
+        
         # Add fields for each tier
-        for tier in ['T1', 'T2', 'T3', 'T4', 'T5']:
+        for definition in catalog:
+            tier = definition.name
             if tier in tiers_data:
                 players = tiers_data[tier]
                 players_list = []
                 
                 for i, player in enumerate(players, 1):
-                    try:
-                        user = self.bot.get_user(int(player['discord_id']))
-                        username = user.display_name if user else f"ID: {player['discord_id']}"
-                        game_nick = player.get('game_nickname', 'N/A')
-                        players_list.append(f"{i}. {username} ({game_nick})")
-                    except:
-                        players_list.append(f"{i}. ID: {player['discord_id']}")
+                    username = names.get(player.discord_id, f"ID: {player.discord_id}")
+                    game_nick = player.game_nickname or 'N/A'
+                    players_list.append(f"{i}. {username} ({game_nick})")
                 
                 if players_list:
                     embed.add_field(
-                        name=f"{get_tier_emoji(tier)} {tier} ({len(players)} игроков)",
+                        name=f"{definition.emoji} {tier} ({tier_counts.get(tier, len(players))} игроков)",
                         value="\n".join(players_list[:10]),  # Limit to 10 per tier
                         inline=False
                     )
         
-        embed.set_footer(text=f"Показано {len(leaderboard)} игроков из {limit} запрошенных")
+        embed.set_footer(text=f"Показано {len(leaderboard)} игроков из {sum(tier_counts.values())}")
+        
+        await interaction.response.send_message(embed=embed)
+    
+    @app_commands.command(name="tier_stats", description="Показать распределение игроков по тирам")
+    async def tier_stats(self, interaction: discord.Interaction):
+        """Show tier distribution from the maintained counters"""
+        if not await self.check_user_permissions(interaction, need_admin=False):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        tier_counts = await self.bot.db.get_tier_counts(str(interaction.guild.id))
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        # Shares are of the current catalog; players still holding removed tiers are listed apart
+        total = sum(tier_counts.get(tier.name, 0) for tier in catalog)
+        removed = {name: count for name, count in tier_counts.items() if name not in catalog}
+        
+        embed = discord.Embed(
+            title="📊 Распределение по тирам",
+            description=f"Всего игроков с тиром: **{total}**",
+            color=Config.COLOR_INFO
+        )
+        
+        for tier in catalog:
+            count = tier_counts.get(tier.name, 0)
+            share = count * 100 / total if total else 0
+            embed.add_field(
+                name=f"{tier.emoji} {tier.name}",
+                value=f"{count} ({share:.1f}%)",
+                inline=True
+            )
+        
+        if removed:
+            embed.add_field(
+                name="🗑️ Удалённые тиры",
+                value="\n".join(f"{name}: {count}" for name, count in sorted(removed.items())),
+                inline=False
+            )
         
         await interaction.response.send_message(embed=embed)
     
@@ -184,24 +205,25 @@ class TierCommands(commands.Cog):
         
         player = await self.bot.db.get_player_by_discord_id(str(interaction.user.id))
         
-        if not player or player['tier'] == 'None':
+        if not player or not player.has_tier:
             await interaction.response.send_message(
                 "❌ У вас пока нет присвоенного тира. Подайте заявку!",
                 ephemeral=True
             )
             return
         
-        tier = player['tier']
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        tier = player.tier
         embed = discord.Embed(
             title="🎯 Ваш тир",
-            description=f"Ваш текущий тир: **{tier}** {get_tier_emoji(tier)}",
-            color=Config.get_tier_color(tier)
+            description=f"Ваш текущий тир: **{tier}** {catalog.emoji(tier)}",
+            color=catalog.color(tier)
         )
         
-        if player['tier_assigned_at']:
+        if player.tier_assigned_at:
             embed.add_field(
                 name="📅 Присвоен",
-                value=f"<t:{int(player['tier_assigned_at'])}:R>",
+                value=f"<t:{to_epoch(player.tier_assigned_at)}:R>",
                 inline=True
             )
         
@@ -220,29 +242,30 @@ class TierCommands(commands.Cog):
             )
             return
         
+        catalog = self.bot.tiers.get(interaction.guild.id)
         embed = discord.Embed(
             title=f"👤 Информация об игроке",
             description=f"**Пользователь:** {user.mention}",
-            color=Config.get_tier_color(player['tier']) if player['tier'] != 'None' else Config.COLOR_INFO
+            color=catalog.color(player.tier) if player.has_tier else Config.COLOR_INFO
         )
         
         embed.add_field(
             name="🎯 Тир",
-            value=f"{get_tier_emoji(player['tier'])} {player['tier']}" if player['tier'] != 'None' else "Не присвоен",
+            value=f"{catalog.emoji(player.tier)} {player.tier}" if player.has_tier else "Не присвоен",
             inline=True
         )
         
-        if player.get('game_nickname'):
+        if player.game_nickname:
             embed.add_field(
                 name="🎮 Ник в игре",
-                value=player['game_nickname'],
+                value=player.game_nickname,
                 inline=True
             )
         
-        if player.get('tier_assigned_at'):
+        if player.tier_assigned_at:
             embed.add_field(
                 name="📅 Тир присвоен",
-                value=f"<t:{int(player['tier_assigned_at'])}:R>",
+                value=f"<t:{to_epoch(player.tier_assigned_at)}:R>",
                 inline=True
             )
         
@@ -262,7 +285,7 @@ class TierCommands(commands.Cog):
         
         player = await self.bot.db.get_player_by_discord_id(str(user.id))
         
-        if not player or player['tier'] == 'None':
+        if not player or not player.has_tier:
             await interaction.response.send_message(
                 f"❌ У пользователя {user.mention} нет присвоенного тира.",
                 ephemeral=True
@@ -272,8 +295,16 @@ class TierCommands(commands.Cog):
         # Remove tier
         await self.bot.db.assign_tier(
             discord_id=str(user.id),
-            new_tier='None',
-            assigned_by=str(interaction.user.id)
+            new_tier=NO_TIER,
+            assigned_by=str(interaction.user.id),
+            guild_id=str(interaction.guild.id)
+        )
+        self.bot.role_sync.schedule(interaction.guild.id, user.id, user)
+        
+        # Respond first: the tier list update may wait for another process's lock
+        await interaction.response.send_message(
+            f"✅ Тир снят с пользователя {user.mention}",
+            ephemeral=True
         )
         
         # Update tier list
@@ -282,11 +313,6 @@ class TierCommands(commands.Cog):
         except Exception as e:
             print(f"Error updating tierlist: {e}")
         
-        await interaction.response.send_message(
-            f"✅ Тир снят с пользователя {user.mention}",
-            ephemeral=True
-        )
-        
         # Notify user
         try:
             await user.send(
@@ -295,6 +321,209 @@ class TierCommands(commands.Cog):
         except:
             pass  # User might have DMs disabled
     
+    @staticmethod
+    def history_page(rows: list) -> tuple:
+        """Split a page fetched with one extra row into (rows, next_cursor)"""
+        if len(rows) > HISTORY_PAGE_SIZE:
+            rows = rows[:HISTORY_PAGE_SIZE]
+            return rows, (rows[-1].assigned_at, rows[-1].id)
+        return rows, None
+    
+    @staticmethod
+    def format_assignment(entry: TierAssignment, show_user: bool) -> str:
+        """Format one tier_assignments row"""
+        old_tier = entry.old_tier or '—'
+        new_tier = entry.new_tier if entry.new_tier != NO_TIER else 'снят'
+        who = f"<@{entry.discord_id}>" if show_user else f"<@{entry.assigned_by}>"
+        line = f"<t:{to_epoch(entry.assigned_at)}:d> {old_tier} → **{new_tier}** • {who}"
+        if entry.application_id:
+            line += f" • заявка #{entry.application_id}"
+        return line
+    
+    @app_commands.command(name="tier_history", description="Показать историю тиров игрока")
+    @app_commands.describe(user="Пользователь", days="За сколько последних дней (по умолчанию за всё время)")
+    async def tier_history(self, interaction: discord.Interaction, user: discord.Member, days: Optional[int] = None):
+        """Show tier change history for a player"""
+        if not await self.check_user_permissions(interaction, need_admin=False):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        if days is not None and days < 1:
+            await interaction.response.send_message(
+                "❌ Период должен быть не меньше 1 дня!",
+                ephemeral=True
+            )
+            return
+        
+        since = int(datetime.now().timestamp()) - days * 86400 if days else None
+        
+        async def fetch_page(cursor):
+            rows = await self.bot.db.get_tier_history(
+                str(user.id), since=since, cursor=cursor, limit=HISTORY_PAGE_SIZE + 1
+            )
+            return self.history_page(rows)
+        
+        def render(rows, page):
+            embed = discord.Embed(
+                title="📜 История тиров",
+                description=f"**Пользователь:** {user.mention}",
+                color=Config.COLOR_INFO
+            )
+            embed.add_field(
+                name="Изменения",
+                value="\n".join(self.format_assignment(row, show_user=False) for row in rows) or "Нет записей",
+                inline=False
+            )
+            embed.set_footer(text=f"Страница {page}")
+            return embed
+        
+        await KeysetPaginator(interaction.user.id, fetch_page, render).start(interaction)
+    
+    @app_commands.command(name="tier_audit", description="Аудит действий модератора")
+    @app_commands.describe(moderator="Модератор", days="Период в днях (по умолчанию 7)")
+    async def tier_audit(self, interaction: discord.Interaction, moderator: discord.Member, days: int = 7):
+        """Show a moderator's tier changes and daily totals"""
+        if not await self.check_user_permissions(interaction, need_admin=True):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        if days < 1 or days > 365:
+            await interaction.response.send_message(
+                "❌ Период должен быть от 1 до 365 дней!",
+                ephemeral=True
+            )
+            return
+        
+        guild_id = str(interaction.guild.id)
+        now = int(datetime.now().timestamp())
+        since = now - days * 86400
+        
+        # Daily totals come from the rollup table, not from scanning the log
+        daily = await self.bot.db.get_moderator_daily_stats(
+            guild_id, since_day=since // 86400, assigned_by=str(moderator.id)
+        )
+        total_assigned = sum(row['assignments'] for row in daily)
+        total_removed = sum(row['removals'] for row in daily)
+        daily_lines = [
+            f"{datetime.fromtimestamp(row['day'] * 86400, tz=timezone.utc):%d.%m}: "
+            f"выдано {row['assignments']}, снято {row['removals']}"
+            for row in daily[:7]
+        ]
+        
+        async def fetch_page(cursor):
+            rows = await self.bot.db.get_moderator_actions(
+                guild_id, str(moderator.id), since=since, cursor=cursor, limit=HISTORY_PAGE_SIZE + 1
+            )
+            return self.history_page(rows)
+        
+        def render(rows, page):
+            embed = discord.Embed(
+                title="🛡️ Аудит модератора",
+                description=(
+                    f"**Модератор:** {moderator.mention}\n"
+                    f"За {days} дн.: выдано **{total_assigned}**, снято **{total_removed}**"
+                ),
+                color=Config.COLOR_INFO
+            )
+            if daily_lines:
+                embed.add_field(name="По дням", value="\n".join(daily_lines), inline=False)
+            embed.add_field(
+                name="Действия",
+                value="\n".join(self.format_assignment(row, show_user=True) for row in rows) or "Нет записей",
+                inline=False
+            )
+            embed.set_footer(text=f"Страница {page}")
+            return embed
+        
+        await KeysetPaginator(interaction.user.id, fetch_page, render).start(interaction)
+    
+    @app_commands.command(name="review_queue", description="Очередь заявок на рассмотрение")
+    @app_commands.describe(
+        tier="Только заявки на этот тир",
+        clan="Только игроки из этого клана",
+        older_than_hours="Только заявки старше указанного числа часов"
+    )
+    async def review_queue(self, interaction: discord.Interaction, tier: Optional[str] = None,
+                           clan: Optional[str] = None, older_than_hours: Optional[int] = None):
+        """Page through pending applications and approve or reject them"""
+        if not await self.check_user_permissions(interaction, need_admin=True):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        desired_tier = None
+        if tier:
+            tier_definition = catalog.get(tier.strip())
+            if not tier_definition:
+                await interaction.response.send_message(
+                    f"❌ Тир {tier} не найден! Доступные тиры: {', '.join(catalog.names)}",
+                    ephemeral=True
+                )
+                return
+            desired_tier = tier_definition.name
+        
+        if older_than_hours is not None and older_than_hours < 0:
+            await interaction.response.send_message(
+                "❌ Возраст заявки не может быть отрицательным!",
+                ephemeral=True
+            )
+            return
+        
+        guild = interaction.guild
+        created_before = (int(datetime.now().timestamp()) - older_than_hours * 3600
+                          if older_than_hours else None)
+        clan = clan.strip() if clan and clan.strip() else None
+        
+        filters = []
+        if desired_tier:
+            filters.append(f"тир {catalog.emoji(desired_tier)} **{desired_tier}**")
+        if clan:
+            filters.append(f"клан **{clan}**")
+        if created_before:
+            filters.append(f"старше {older_than_hours} ч.")
+        
+        async def fetch_page(cursor):
+            rows = await self.bot.db.get_review_queue(
+                str(guild.id), desired_tier=desired_tier, clan=clan, created_before=created_before,
+                cursor=cursor, limit=REVIEW_PAGE_SIZE + 1
+            )
+            if len(rows) > REVIEW_PAGE_SIZE:
+                rows = rows[:REVIEW_PAGE_SIZE]
+                return rows, (rows[-1].created_at, rows[-1].id)
+            return rows, None
+        
+        def render(rows, page):
+            embed = discord.Embed(
+                title="🗂️ Очередь заявок",
+                description="Фильтр: " + ", ".join(filters) if filters else "Все ожидающие заявки",
+                color=Config.COLOR_WARNING
+            )
+            for app in rows:
+                value = (
+                    f"<@{app.discord_id}> • 🎯 {app.desired_tier} {catalog.emoji(app.desired_tier)}\n"
+                    f"🎮 {app.game_id} • 🏰 {app.current_clan or 'Не указан'}\n"
+                    f"📅 <t:{to_epoch(app.created_at)}:R>"
+                )
+                if app.message_id and app.channel_id:
+                    value += f" • [сообщение](https://discord.com/channels/{guild.id}/{app.channel_id}/{app.message_id})"
+                embed.add_field(name=f"#{app.id} • {app.game_nickname}", value=value, inline=False)
+            if not rows:
+                embed.add_field(name="Заявки", value="Нет ожидающих заявок", inline=False)
+            embed.set_footer(text=f"Страница {page}")
+            return embed
+        
+        view = ReviewQueueView(interaction.user.id, guild, catalog, fetch_page, render)
+        await view.start(interaction)
+    
     @app_commands.command(name="setup_tierlist", description="Создать автоматически обновляемый тир-лист")
     @app_commands.describe(channel="Канал для тир-листа")
     async def setup_tierlist(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
@@ -310,7 +539,7 @@ class TierCommands(commands.Cog):
         target_channel = channel or interaction.channel
         
         # Create tier list embed
-        embed = await self.create_tierlist_embed()
+        embed = await self.create_tierlist_embed(str(interaction.guild.id))
         
         # Send tier list message
         message = await target_channel.send(embed=embed)
@@ -327,10 +556,11 @@ class TierCommands(commands.Cog):
             ephemeral=True
         )
     
-    async def create_tierlist_embed(self):
+    async def create_tierlist_embed(self, guild_id: str):
         """Create tier list embed"""
         # Get leaderboard
-        leaderboard = await self.bot.db.get_tier_leaderboard(100)
+        leaderboard = await self.bot.db.get_tier_leaderboard(100, guild_id=guild_id)
+        tier_counts = await self.bot.db.get_tier_counts(guild_id)
         
         embed = discord.Embed(
             title="🏆 Тиры игроков",
@@ -341,43 +571,48 @@ class TierCommands(commands.Cog):
         # Group by tiers
         tiers_data = {}
         for player in leaderboard:
-            tier = player['tier']
+            tier = player.tier
             if tier not in tiers_data:
                 tiers_data[tier] = []
             tiers_data[tier].append(player)
         
+        # Only players without a game nickname need a Discord name
+        names = {}
+        guild = self.bot.get_guild(int(guild_id))
+        unnamed = [p.discord_id for p in leaderboard if p.game_nickname in (None, '', 'N/A')]
+        if guild and unnamed:
+            names = await self.bot.names.resolve(guild, unnamed)
+        
         # Add fields for each tier
-        for tier in ['T1', 'T2', 'T3', 'T4', 'T5']:
+        for definition in self.bot.tiers.get(guild_id):
+            tier = definition.name
             if tier in tiers_data:
                 players = tiers_data[tier]
                 players_list = []
                 
                 for player in players:
-                    try:
-                        user = self.bot.get_user(int(player['discord_id']))
-                        username = user.display_name if user else f"ID: {player['discord_id']}"
-                        game_nick = player.get('game_nickname', 'N/A')
-                        if game_nick and game_nick != 'N/A':
-                            players_list.append(f"• {game_nick}")
-                        else:
-                            players_list.append(f"• {username}")
-                    except:
-                        players_list.append(f"• ID: {player['discord_id']}")
+                    game_nick = player.game_nickname or 'N/A'
+                    if game_nick and game_nick != 'N/A':
+                        players_list.append(f"• {game_nick}")
+                    else:
+                        players_list.append(f"• {names.get(player.discord_id, 'ID: ' + player.discord_id)}")
                 
                 if players_list:
+                    shown = players_list[:15]
+                    remaining = tier_counts.get(tier, len(players_list)) - len(shown)
                     embed.add_field(
-                        name=f"{get_tier_emoji(tier)} {tier}",
-                        value="\n".join(players_list[:15]) + (f"\n... и еще {len(players_list) - 15}" if len(players_list) > 15 else ""),
+                        name=f"{definition.emoji} {tier}",
+                        value="\n".join(shown) + (f"\n... и еще {remaining}" if remaining > 0 else ""),
                         inline=True
                     )
             else:
                 embed.add_field(
-                    name=f"{get_tier_emoji(tier)} {tier}",
+                    name=f"{definition.emoji} {tier}",
                     value="Пусто",
                     inline=True
                 )
         
-        embed.set_footer(text=f"Автоматически обновляется при выдаче тиров • Всего игроков: {len(leaderboard)}")
+        embed.set_footer(text=f"Автоматически обновляется при выдаче тиров • Всего игроков: {sum(tier_counts.values())}")
         embed.timestamp = discord.utils.utcnow()
         
         return embed
@@ -385,27 +620,33 @@ class TierCommands(commands.Cog):
     async def update_tierlist(self, guild_id: str):
         """Update tier list message"""
         try:
-            tierlist_info = await self.bot.db.get_guild_tierlist_info(guild_id)
-            if not tierlist_info or not tierlist_info.get('channel_id') or not tierlist_info.get('message_id'):
-                return
-            
-            channel = self.bot.get_channel(int(tierlist_info['channel_id']))
-            if not channel:
-                return
-            
-            try:
-                message = await channel.fetch_message(int(tierlist_info['message_id']))
-                embed = await self.create_tierlist_embed()
-                await message.edit(embed=embed)
-            except discord.NotFound:
-                # Message was deleted, create new one
-                embed = await self.create_tierlist_embed()
-                new_message = await channel.send(embed=embed)
-                await self.bot.db.set_guild_tierlist_channel(
-                    guild_id=guild_id,
-                    channel_id=str(channel.id),
-                    message_id=str(new_message.id)
-                )
+            # One process at a time per guild: the holder renders from data read under the lock, so
+            # a waiter's change is picked up by its own render and no edit overwrites a newer one
+            async with self.bot.db.lease('tierlist', guild_id, timeout=Config.TIERLIST_LOCK_TIMEOUT,
+                                         ttl=Config.TIERLIST_LOCK_LEASE_SECONDS):
+                tierlist_info = await self.bot.db.get_guild_tierlist_info(guild_id)
+                if not tierlist_info or not tierlist_info.get('channel_id') or not tierlist_info.get('message_id'):
+                    return
+                
+                channel = self.bot.get_channel(int(tierlist_info['channel_id']))
+                if not channel:
+                    return
+                
+                try:
+                    message = await channel.fetch_message(int(tierlist_info['message_id']))
+                    embed = await self.create_tierlist_embed(guild_id)
+                    await message.edit(embed=embed)
+                except discord.NotFound:
+                    # Message was deleted, create new one
+                    embed = await self.create_tierlist_embed(guild_id)
+                    new_message = await channel.send(embed=embed)
+                    await self.bot.db.set_guild_tierlist_channel(
+                        guild_id=guild_id,
+                        channel_id=str(channel.id),
+                        message_id=str(new_message.id)
+                    )
+        except LockTimeout:
+            print(f"[TIERLIST] Lock for guild {guild_id} still held after {Config.TIERLIST_LOCK_TIMEOUT}s, skipping update")
         except Exception as e:
             print(f"Error updating tierlist: {e}")
     
@@ -455,6 +696,7 @@ class TierCommands(commands.Cog):
             await self.bot.db.set_guild_allowed_roles(guild_id, allowed_role_ids)
         if admin_role_ids:
             await self.bot.db.set_guild_admin_roles(guild_id, admin_role_ids)
+        self.bot.permissions.invalidate_guild(interaction.guild.id)
         
         # Create response
         embed = discord.Embed(
@@ -577,5 +819,181 @@ class TierCommands(commands.Cog):
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @app_commands.command(name="sync_roles", description="Сверить роли тиров участников с базой данных")
+    async def sync_roles(self, interaction: discord.Interaction):
+        """Run a full tier role reconcile for the guild"""
+        if not await self.check_user_permissions(interaction, need_admin=True):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        if not self.bot.role_sync.tier_roles(interaction.guild.id):
+            await interaction.response.send_message(
+                "❌ Ни одному тиру не назначена роль! Используйте `/tier_catalog_set` с параметром role.",
+                ephemeral=True
+            )
+            return
+        
+        # Listing members can take a while on large servers
+        await interaction.response.defer(ephemeral=True)
+        try:
+            queued = await self.bot.role_sync.reconcile_guild(interaction.guild)
+        except discord.HTTPException as e:
+            print(f"Error reconciling roles: {e}")
+            await interaction.followup.send("❌ Не удалось получить список участников.", ephemeral=True)
+            return
+        
+        if queued:
+            await interaction.followup.send(
+                f"🔄 Роли будут обновлены у {queued} участников.",
+                ephemeral=True
+            )
+        else:
+            await interaction.followup.send("✅ Роли всех участников уже соответствуют их тирам.", ephemeral=True)
+    
+    @app_commands.command(name="tier_catalog", description="Показать список тиров сервера")
+    async def tier_catalog(self, interaction: discord.Interaction):
+        """Show the guild's tier catalog"""
+        if not await self.check_user_permissions(interaction, need_admin=False):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        lines = []
+        for tier in catalog:
+            line = f"{tier.emoji} **{tier.name}** • ранг {tier.rank} • цвет #{tier.color:06x}"
+            if tier.role_id:
+                line += f" • <@&{tier.role_id}>"
+            lines.append(line)
+        
+        embed = discord.Embed(
+            title="📚 Тиры сервера",
+            description="\n".join(lines),
+            color=Config.COLOR_INFO
+        )
+        embed.set_footer(text="Ранг 1 - высший тир • /tier_catalog_set и /tier_catalog_delete для изменения")
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    @app_commands.command(name="tier_catalog_set", description="Добавить или изменить тир")
+    @app_commands.describe(
+        name="Название тира",
+        rank="Ранг (1 - высший)",
+        emoji="Эмодзи тира",
+        color="Цвет в формате #ffd700",
+        role="Роль Discord для этого тира"
+    )
+    async def tier_catalog_set(self, interaction: discord.Interaction, name: str, rank: int,
+                               emoji: Optional[str] = None, color: Optional[str] = None,
+                               role: Optional[discord.Role] = None):
+        """Add or update a tier in the guild's catalog"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        name = name.strip()
+        if not name or len(name) > 20 or ' ' in name or name.upper() == NO_TIER.upper():
+            await interaction.response.send_message(
+                "❌ Название тира должно быть одним словом длиной до 20 символов!",
+                ephemeral=True
+            )
+            return
+        
+        if rank < 1 or rank > 100:
+            await interaction.response.send_message(
+                "❌ Ранг должен быть от 1 до 100!",
+                ephemeral=True
+            )
+            return
+        
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        existing = catalog.get(name)
+        
+        if any(tier.rank == rank and tier is not existing for tier in catalog):
+            await interaction.response.send_message(
+                f"❌ Ранг {rank} уже занят другим тиром!",
+                ephemeral=True
+            )
+            return
+        
+        if not existing and len(catalog) >= MAX_TIERS:
+            await interaction.response.send_message(
+                f"❌ Можно создать не более {MAX_TIERS} тиров!",
+                ephemeral=True
+            )
+            return
+        
+        tier_color = parse_color(color) if color else (existing.color if existing else Config.COLOR_INFO)
+        if tier_color is None:
+            await interaction.response.send_message(
+                "❌ Неверный цвет! Используйте формат #ffd700",
+                ephemeral=True
+            )
+            return
+        
+        tier = TierDefinition(
+            name=existing.name if existing else name,
+            rank=rank,
+            color=tier_color,
+            emoji=emoji or (existing.emoji if existing else '🎖️'),
+            role_id=role.id if role else (existing.role_id if existing else None)
+        )
+        await self.bot.tiers.save(interaction.guild.id, catalog.with_tier(tier))
+        old_role_id = existing.role_id if existing else None
+        if tier.role_id != old_role_id:
+            self.bot.role_sync.request_reconcile(interaction.guild, retired_role_id=old_role_id)
+        
+        await interaction.response.send_message(
+            f"✅ Тир {tier.emoji} **{tier.name}** сохранен (ранг {tier.rank}).",
+            ephemeral=True
+        )
+        await self.update_tierlist(str(interaction.guild.id))
+    
+    @app_commands.command(name="tier_catalog_delete", description="Удалить тир из списка тиров")
+    @app_commands.describe(name="Название тира")
+    async def tier_catalog_delete(self, interaction: discord.Interaction, name: str):
+        """Remove a tier from the guild's catalog"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message(
+                "❌ У вас нет прав для использования этой команды!",
+                ephemeral=True
+            )
+            return
+        
+        catalog = self.bot.tiers.get(interaction.guild.id)
+        tier = catalog.get(name.strip())
+        if not tier:
+            await interaction.response.send_message(
+                f"❌ Тир {name} не найден! Доступные тиры: {', '.join(catalog.names)}",
+                ephemeral=True
+            )
+            return
+        
+        if len(catalog) == 1:
+            await interaction.response.send_message(
+                "❌ Нельзя удалить последний тир!",
+                ephemeral=True
+            )
+            return
+        
+        await self.bot.tiers.save(interaction.guild.id, catalog.without_tier(tier.name))
+        if tier.role_id:
+            self.bot.role_sync.request_reconcile(interaction.guild, retired_role_id=tier.role_id)
+        
+        holders = (await self.bot.db.get_tier_counts(str(interaction.guild.id))).get(tier.name, 0)
+        message = f"✅ Тир {tier.emoji} **{tier.name}** удален."
+        if holders:
+            message += f" Игроки с этим тиром ({holders}) больше не отображаются в тир-листе."
+        await interaction.response.send_message(message, ephemeral=True)
+        await self.update_tierlist(str(interaction.guild.id))
+
 async def setup(bot):
     await bot.add_cog(TierCommands(bot))
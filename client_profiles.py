@@ -0,0 +1,29 @@
+import discord
+
+PROFILES = ('default', 'lean')
+
+
+def client_options(profile: str = 'default') -> dict:
+    """Build discord.Client keyword arguments for a run profile"""
+    if profile == 'lean':
+        # Buttons, modals and slash commands arrive as interactions and need no
+        # message content or message cache. Members stay enabled as an intent
+        # (query_members needs it) but are not cached.
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.members = True
+        return {
+            'intents': intents,
+            'member_cache_flags': discord.MemberCacheFlags.none(),
+            'max_messages': None,
+            'chunk_guilds_at_startup': False
+        }
+    
+    if profile != 'default':
+        raise ValueError(f"Unknown client profile: {profile}")
+    
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.guilds = True
+    intents.members = True
+    return {'intents': intents}
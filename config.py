@@ -4,37 +4,68 @@ class Config:
     # Bot settings
     COMMAND_PREFIX = '!'
     
-    # Tier settings
-    AVAILABLE_TIERS = ['T1', 'T2', 'T3', 'T4', 'T5']
-    
     # Application settings
     MAX_PENDING_APPLICATIONS = 1  # Max pending applications per user
+    APPLICATION_TTL_HOURS = int(os.getenv('APPLICATION_TTL_HOURS', '72'))  # 0 disables expiry
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))  # 0 disables archiving
+    JANITOR_INTERVAL_MINUTES = int(os.getenv('JANITOR_INTERVAL_MINUTES', '30'))
+    JANITOR_BATCH_SIZE = 100
     
     # Colors
     COLOR_SUCCESS = 0x00ff00
     COLOR_ERROR = 0xff0000
     COLOR_WARNING = 0xffff00
     COLOR_INFO = 0x0099ff
-    COLOR_TIER_T1 = 0xffd700  # Gold
-    COLOR_TIER_T2 = 0xc0c0c0  # Silver
-    COLOR_TIER_T3 = 0xcd7f32  # Bronze
-    COLOR_TIER_T4 = 0x4169e1  # Royal Blue
-    COLOR_TIER_T5 = 0x32cd32  # Lime Green
+    COLOR_EXPIRED = 0x808080
+    
+    # Tier role sync
+    ROLE_SYNC_DELAY = 2  # Seconds to collect tier changes into one batch
+    ROLE_SYNC_EDIT_INTERVAL = float(os.getenv('ROLE_SYNC_EDIT_INTERVAL', '1'))  # Seconds between member edits
+    ROLE_RECONCILE_HOURS = int(os.getenv('ROLE_RECONCILE_HOURS', '24'))  # 0 disables the periodic full pass
+    
+    # Permission cache
+    PERMISSION_CACHE_SIZE = 10000  # Max cached (guild, member) decisions
+    PERMISSION_CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', '300'))  # Seconds
     
     # Database
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'tier_bot.db')
+    DATABASE_URL = os.getenv('DATABASE_URL')  # PostgreSQL is used when set
+    DATABASE_POOL_MIN_SIZE = int(os.getenv('DATABASE_POOL_MIN_SIZE', '2'))
+    DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', '10'))
+    DATABASE_STATEMENT_CACHE_SIZE = int(os.getenv('DATABASE_STATEMENT_CACHE_SIZE', '100'))  # 0 for PgBouncer
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')  # Optional read-only replica for lookups
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '5'))  # Read from primary beyond this
+    REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', '10'))
+    
+    # Write-behind buffer for view bookkeeping and the assignment log
+    WRITE_BUFFER_FLUSH_MS = int(os.getenv('WRITE_BUFFER_FLUSH_MS', '200'))  # 0 writes through immediately
+    WRITE_BUFFER_MAX_ROWS = int(os.getenv('WRITE_BUFFER_MAX_ROWS', '100'))  # Flush early at this many writes
+    WRITE_BUFFER_MAX_ATTEMPTS = int(os.getenv('WRITE_BUFFER_MAX_ATTEMPTS', '5'))  # Then a write is dead-lettered
+    WRITE_BUFFER_DEAD_LETTER_FILE = os.getenv('WRITE_BUFFER_DEAD_LETTER_FILE', 'write_buffer_dead_letter.jsonl')
+    
+    # Cache invalidation between bot processes (PostgreSQL uses LISTEN/NOTIFY)
+    INVALIDATION_FILE = os.getenv('INVALIDATION_FILE')  # SQLite: shared event file for several processes, e.g. invalidation_events.jsonl
+    INVALIDATION_POLL_MS = int(os.getenv('INVALIDATION_POLL_MS', '500'))
+    
+    # Per-guild tier list lock, so one process at a time renders and edits the message
+    TIERLIST_LOCK_TIMEOUT = float(os.getenv('TIERLIST_LOCK_TIMEOUT', '30'))  # Give up waiting after this
+    TIERLIST_LOCK_LEASE_SECONDS = float(os.getenv('TIERLIST_LOCK_LEASE_SECONDS', '60'))  # SQLite lease expiry
+    
+    # Online database snapshots (python3 snapshots.py, or periodically from the bot)
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+    SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', '7'))  # 0 keeps every snapshot
+    SNAPSHOT_INTERVAL_HOURS = float(os.getenv('SNAPSHOT_INTERVAL_HOURS', '0'))  # 0 disables scheduled snapshots
+    SNAPSHOT_STEP_SLEEP_MS = int(os.getenv('SNAPSHOT_STEP_SLEEP_MS', '0'))  # SQLite: pause between backup steps
+    SNAPSHOT_LEASE_SECONDS = 3600  # SQLite: another process may start a snapshot after this
     
     # Discord
     DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
     
-    @staticmethod
-    def get_tier_color(tier: str) -> int:
-        """Get color for tier"""
-        colors = {
-            'T1': Config.COLOR_TIER_T1,
-            'T2': Config.COLOR_TIER_T2,
-            'T3': Config.COLOR_TIER_T3,
-            'T4': Config.COLOR_TIER_T4,
-            'T5': Config.COLOR_TIER_T5
-        }
-        return colors.get(tier, Config.COLOR_INFO)
+    # Application command sync
+    COMMAND_SYNC_STATE_PATH = os.getenv('COMMAND_SYNC_STATE_PATH', 'command_sync_state.json')
+    DEV_GUILD_ID = os.getenv('DEV_GUILD_ID')  # Sync commands to this guild only (development)
+    
+    # Runtime
+    CLIENT_PROFILE = os.getenv('BOT_PROFILE', 'default')  # 'default' or 'lean'
+    KEEP_ALIVE_ENABLED = os.getenv('KEEP_ALIVE', '1') != '0'
+    STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', '0') == '1'
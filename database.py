@@ -1,17 +1,90 @@
 import aiosqlite
 import asyncio
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from itertools import groupby
+from operator import itemgetter
+from typing import AsyncIterator, List, Optional, Dict, Any, Sequence, Tuple
+from config import Config
+from locks import wait_for_lock
+from models import Application, Player, TierAssignment
+from statements import StatementRegistry
+from tiers import DEFAULT_CATALOG
+
+# Current unix time in SQL: timestamps are integer epochs, like the BIGINT columns in PostgreSQL
+NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
 
 class Database:
+    # Writes that may go through the write-behind buffer: kind -> statements run with the same named params
+    DEFERRED_WRITES = {
+        'assignment': ['''
+            INSERT INTO tier_assignments
+            (discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id, guild_id)
+            VALUES (:discord_id, :old_tier, :new_tier, :assigned_by, :assigned_at, :application_id, :guild_id)
+        ''', '''
+            INSERT INTO moderator_daily_stats (guild_id, assigned_by, day, assignments, removals)
+            VALUES (:guild_id, :assigned_by, :assigned_at / 86400,
+                    1 - :removed, :removed)
+            ON CONFLICT (guild_id, assigned_by, day) DO UPDATE SET
+                assignments = assignments + excluded.assignments,
+                removals = removals + excluded.removals
+        '''],
+    }
+    
+    # Hot-path lookups, run on one long-lived connection whose statement cache keeps them compiled
+    STATEMENTS = StatementRegistry({
+        'has_pending_application': '''
+            SELECT EXISTS (SELECT 1 FROM applications WHERE discord_id = ? AND status = 'pending')
+        ''',
+        'get_player_by_discord_id': 'SELECT * FROM players WHERE discord_id = ?',
+        'get_guild_allowed_roles': 'SELECT allowed_roles FROM guild_settings WHERE guild_id = ?',
+        'get_guild_admin_roles': 'SELECT admin_roles FROM guild_settings WHERE guild_id = ?',
+        # Players without a guild rank everywhere: two index-ordered range scans, merged until the limit
+        'guild_tier_leaderboard': '''
+            SELECT * FROM players WHERE guild_id = ?1 AND tier_rank > 0
+            UNION ALL
+            SELECT * FROM players WHERE guild_id = '' AND tier_rank > 0
+            ORDER BY tier_rank ASC, tier_assigned_at ASC
+            LIMIT ?2
+        ''',
+    })
+    
+    # Columns of the tier assignment log, in the same order in the live table and its archive
+    ASSIGNMENT_COLUMNS = 'id, discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id, guild_id'
+    
+    # Timestamp columns, converted from CURRENT_TIMESTAMP text once (PRAGMA user_version 1)
+    TIMESTAMP_COLUMNS = {
+        'players': ('tier_assigned_at', 'created_at', 'updated_at'),
+        'applications': ('created_at', 'processed_at'),
+        'tier_assignments': ('assigned_at',),
+        'guild_settings': ('created_at', 'updated_at'),
+        'applications_archive': ('created_at', 'processed_at'),
+        'tier_assignments_archive': ('assigned_at',),
+        'member_names': ('updated_at',),
+    }
+    EPOCH_TIMESTAMPS_VERSION = 1
+    
+    SNAPSHOT_SUFFIX = '.db.gz'
+    SNAPSHOT_PAGES_PER_STEP = 256  # Pages copied per backup step; writers can get in between steps
+    
     def __init__(self, db_path: str = "tier_bot.db"):
         self.db_path = db_path
+        self.write_buffer = None  # WriteBehindBuffer, attached by the bot
+        self.invalidation = None  # InvalidationBus, attached by the bot
+        self._lookup_db = None
+        self._lookup_lock = asyncio.Lock()
         
     async def init_db(self):
         """Initialize database tables"""
         async with aiosqlite.connect(self.db_path) as db:
             # Players table
-            await db.execute('''
+            await db.execute(f'''
                 CREATE TABLE IF NOT EXISTS players (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     discord_id TEXT UNIQUE NOT NULL,
@@ -20,15 +93,15 @@ class Database:
                     current_clan TEXT,
                     page_info TEXT,
                     tier TEXT DEFAULT 'None',
-                    tier_assigned_at TIMESTAMP,
+                    tier_assigned_at INTEGER,
                     tier_assigned_by TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at INTEGER DEFAULT ({NOW}),
+                    updated_at INTEGER DEFAULT ({NOW})
                 )
             ''')
             
             # Applications table
-            await db.execute('''
+            await db.execute(f'''
                 CREATE TABLE IF NOT EXISTS applications (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     discord_id TEXT NOT NULL,
@@ -40,165 +113,624 @@ class Database:
                     status TEXT DEFAULT 'pending',
                     message_id TEXT,
                     channel_id TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    processed_at TIMESTAMP,
+                    created_at INTEGER DEFAULT ({NOW}),
+                    processed_at INTEGER,
                     processed_by TEXT
                 )
             ''')
             
             # Tier assignments log
-            await db.execute('''
+            await db.execute(f'''
                 CREATE TABLE IF NOT EXISTS tier_assignments (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     discord_id TEXT NOT NULL,
                     old_tier TEXT,
                     new_tier TEXT NOT NULL,
                     assigned_by TEXT NOT NULL,
-                    assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    assigned_at INTEGER DEFAULT ({NOW}),
                     application_id INTEGER,
                     FOREIGN KEY (application_id) REFERENCES applications (id)
                 )
             ''')
             
             # Guild settings
-            await db.execute('''
+            await db.execute(f'''
                 CREATE TABLE IF NOT EXISTS guild_settings (
                     guild_id TEXT PRIMARY KEY,
                     applications_channel_id TEXT,
                     tier_roles TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    tier_list_channel_id TEXT,
+                    tier_list_message_id TEXT,
+                    allowed_roles TEXT,
+                    admin_roles TEXT,
+                    created_at INTEGER DEFAULT ({NOW}),
+                    updated_at INTEGER DEFAULT ({NOW})
+                )
+            ''')
+            
+            # Buttons are routed by custom_id now; per-message view rows are obsolete
+            await db.execute('DROP TABLE IF EXISTS persistent_views')
+            
+            # Archive tables for processed applications and old assignment logs
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS applications_archive (
+                    id INTEGER PRIMARY KEY,
+                    discord_id TEXT NOT NULL,
+                    game_id TEXT,
+                    game_nickname TEXT,
+                    current_clan TEXT,
+                    page_info TEXT,
+                    desired_tier TEXT,
+                    status TEXT,
+                    message_id TEXT,
+                    channel_id TEXT,
+                    created_at INTEGER,
+                    processed_at INTEGER,
+                    processed_by TEXT
                 )
             ''')
             
-            # Persistent views table
             await db.execute('''
-                CREATE TABLE IF NOT EXISTS persistent_views (
-                    message_id TEXT PRIMARY KEY,
-                    channel_id TEXT NOT NULL,
+                CREATE TABLE IF NOT EXISTS tier_assignments_archive (
+                    id INTEGER PRIMARY KEY,
+                    discord_id TEXT NOT NULL,
+                    old_tier TEXT,
+                    new_tier TEXT,
+                    assigned_by TEXT,
+                    assigned_at INTEGER,
+                    application_id INTEGER,
+                    guild_id TEXT NOT NULL DEFAULT ''
+                )
+            ''')
+            
+            await self._add_missing_columns(db, 'guild_settings', {
+                'tier_list_channel_id': 'TEXT',
+                'tier_list_message_id': 'TEXT',
+                'allowed_roles': 'TEXT',
+                'admin_roles': 'TEXT'
+            })
+            
+            # Per-guild tier catalogs (guilds without rows use the default tiers)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS tier_catalog (
                     guild_id TEXT NOT NULL,
-                    view_type TEXT NOT NULL,
-                    view_data TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    name TEXT NOT NULL,
+                    rank INTEGER NOT NULL,
+                    color INTEGER NOT NULL,
+                    emoji TEXT NOT NULL,
+                    role_id TEXT,
+                    PRIMARY KEY (guild_id, name)
+                )
+            ''')
+            
+            # Display name cache, so leaderboards don't need the member cache
+            await db.execute(f'''
+                CREATE TABLE IF NOT EXISTS member_names (
+                    guild_id TEXT NOT NULL,
+                    discord_id TEXT NOT NULL,
+                    display_name TEXT NOT NULL,
+                    updated_at INTEGER DEFAULT ({NOW}),
+                    PRIMARY KEY (guild_id, discord_id)
+                )
+            ''')
+            
+            # Leases for work that only one bot process may do at a time
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS locks (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at INTEGER NOT NULL
                 )
             ''')
             
+            # Materialized player counts per guild and tier
+            cursor = await db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tier_counters'"
+            )
+            counters_exist = await cursor.fetchone() is not None
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS tier_counters (
+                    guild_id TEXT NOT NULL,
+                    tier TEXT NOT NULL,
+                    player_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, tier)
+                )
+            ''')
+            
+            added = await self._add_missing_columns(db, 'players', {
+                'guild_id': "TEXT NOT NULL DEFAULT ''",
+                'tier_rank': 'INTEGER NOT NULL DEFAULT 0'
+            })
+            if 'tier_rank' in added:
+                await db.executemany('UPDATE players SET tier_rank = ? WHERE tier = ?',
+                                     [(tier.rank, tier.name) for tier in DEFAULT_CATALOG])
+            
+            if not counters_exist:
+                await db.execute('''
+                    INSERT INTO tier_counters (guild_id, tier, player_count)
+                    SELECT guild_id, tier, COUNT(*) FROM players
+                    WHERE tier IS NOT NULL AND tier != 'None'
+                    GROUP BY guild_id, tier
+                ''')
+            
+            # Per-moderator daily rollup of tier assignments
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS moderator_daily_stats (
+                    guild_id TEXT NOT NULL,
+                    assigned_by TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    assignments INTEGER NOT NULL DEFAULT 0,
+                    removals INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, assigned_by, day)
+                )
+            ''')
+            
+            await self._add_missing_columns(db, 'tier_assignments', {
+                'guild_id': "TEXT NOT NULL DEFAULT ''"
+            })
+            await self._add_missing_columns(db, 'tier_assignments_archive', {
+                'guild_id': "TEXT NOT NULL DEFAULT ''"
+            })
+            
+            # Leaderboard reads are a range scan over ranked players of a guild
+            await db.execute('DROP INDEX IF EXISTS idx_players_guild_tier')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_players_guild_rank
+                ON players (guild_id, tier_rank, tier_assigned_at)
+            ''')
+            
+            # Indexes for history and audit queries, which read the log and its archive
+            for table in ('tier_assignments', 'tier_assignments_archive'):
+                await db.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_{table}_user
+                    ON {table} (discord_id, assigned_at, id)
+                ''')
+                await db.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_{table}_moderator
+                    ON {table} (guild_id, assigned_by, assigned_at, id)
+                ''')
+            
+            # Older versions stored CURRENT_TIMESTAMP text; integers sort and compare without parsing
+            cursor = await db.execute('PRAGMA user_version')
+            if (await cursor.fetchone())[0] < self.EPOCH_TIMESTAMPS_VERSION:
+                for table, columns in self.TIMESTAMP_COLUMNS.items():
+                    for column in columns:
+                        await db.execute(f'''
+                            UPDATE {table} SET {column} = CASE
+                                WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-*' THEN CAST(strftime('%s', {column}) AS INTEGER)
+                                ELSE CAST({column} AS INTEGER)
+                            END
+                            WHERE typeof({column}) = 'text'
+                        ''')
+                await db.execute(f'PRAGMA user_version = {self.EPOCH_TIMESTAMPS_VERSION}')
+            
+            # Build the rollup once for logs written before it existed
+            cursor = await db.execute('SELECT 1 FROM moderator_daily_stats LIMIT 1')
+            if not await cursor.fetchone():
+                await db.execute('''
+                    INSERT INTO moderator_daily_stats (guild_id, assigned_by, day, assignments, removals)
+                    SELECT guild_id, assigned_by, assigned_at / 86400,
+                           SUM(new_tier != 'None'), SUM(new_tier = 'None')
+                    FROM (
+                        SELECT guild_id, assigned_by, assigned_at, new_tier FROM tier_assignments
+                        UNION ALL
+                        SELECT guild_id, assigned_by, assigned_at, new_tier FROM tier_assignments_archive
+                    )
+                    GROUP BY 1, 2, 3
+                ''')
+            
+            # At most one pending application per user
+            cursor = await db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_applications_one_pending'"
+            )
+            if not await cursor.fetchone():
+                # Duplicates from double submissions would block the index; keep the newest
+                await db.execute(f'''
+                    UPDATE applications
+                    SET status = 'expired', processed_at = {NOW}, processed_by = 'system'
+                    WHERE status = 'pending' AND id NOT IN (
+                        SELECT MAX(id) FROM applications WHERE status = 'pending' GROUP BY discord_id
+                    )
+                ''')
+                await db.execute('''
+                    CREATE UNIQUE INDEX idx_applications_one_pending
+                    ON applications (discord_id) WHERE status = 'pending'
+                ''')
+            
+            # Applications from before guild_id existed are matched through the guild's applications channel
+            added = await self._add_missing_columns(db, 'applications', {
+                'guild_id': "TEXT NOT NULL DEFAULT ''"
+            })
+            if 'guild_id' in added:
+                await db.execute('''
+                    UPDATE applications SET guild_id = COALESCE((
+                        SELECT guild_id FROM guild_settings
+                        WHERE guild_settings.applications_channel_id = applications.channel_id
+                    ), '')
+                ''')
+            
+            # Review queue: a guild's pending applications, oldest first, optionally by desired tier
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_review
+                ON applications (guild_id, created_at, id) WHERE status = 'pending'
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_review_tier
+                ON applications (guild_id, desired_tier, created_at, id) WHERE status = 'pending'
+            ''')
+            
+            # Indexes for the janitor scans
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_status_created
+                ON applications (status, created_at)
+            ''')
+            # Buttons posted before custom_ids carried the application id are resolved by message
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_message
+                ON applications (message_id)
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tier_assignments_assigned_at
+                ON tier_assignments (assigned_at)
+            ''')
+            
             await db.commit()
     
-    async def create_application(self, discord_id: str, game_id: str, game_nickname: str, 
-                               current_clan: str, page_info: str, desired_tier: str) -> int:
-        """Create a new tier application"""
+    async def _add_missing_columns(self, db, table: str, columns: Dict[str, str]) -> List[str]:
+        """Add columns introduced after the table was first created, returning the ones added"""
+        cursor = await db.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in await cursor.fetchall()}
+        added = []
+        for name, definition in columns.items():
+            if name not in existing:
+                await db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+                added.append(name)
+        return added
+    
+    async def create_application_if_absent(self, discord_id: str, game_id: str, game_nickname: str,
+                                           current_clan: str, page_info: str, desired_tier: str,
+                                           guild_id: str = '') -> Tuple[Optional[Application], bool]:
+        """Create a pending application unless the user already has one; returns (application, created)"""
         async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute(f'''
+                INSERT INTO applications
+                (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, guild_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, {NOW})
+                ON CONFLICT (discord_id) WHERE status = 'pending' DO NOTHING
+            ''', (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, guild_id))
+            created = cursor.rowcount > 0
+            
             cursor = await db.execute('''
-                INSERT INTO applications (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier))
+                SELECT * FROM applications WHERE discord_id = ? AND status = 'pending'
+            ''', (discord_id,))
+            row = await cursor.fetchone()
             await db.commit()
-            return cursor.lastrowid or 0
+            return (Application.from_row(row) if row else None), created
     
-    async def get_application(self, app_id: int) -> Optional[Dict[str, Any]]:
+    async def get_application(self, app_id: int) -> Optional[Application]:
         """Get application by ID"""
         async with aiosqlite.connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('SELECT * FROM applications WHERE id = ?', (app_id,))
             row = await cursor.fetchone()
-            return dict(row) if row else None
+            return Application.from_row(row) if row else None
     
-    async def update_application_status(self, app_id: int, status: str, processed_by: str = None):
-        """Update application status"""
+    async def get_application_by_message(self, message_id: str) -> Optional[Application]:
+        """Get the application posted as the given moderator message"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute('SELECT * FROM applications WHERE message_id = ?', (message_id,))
+            row = await cursor.fetchone()
+            return Application.from_row(row) if row else None
+
+    async def get_review_queue(self, guild_id: str, desired_tier: str = None, clan: str = None,
+                               created_before: int = None, cursor: tuple = None,
+                               limit: int = 10) -> List[Application]:
+        """Get a guild's pending applications, oldest first (keyset paginated by (created_at, id))"""
+        conditions = ["status = 'pending'", "guild_id IN (?, '')"]
+        params = [guild_id]
+        if desired_tier is not None:
+            conditions.append('desired_tier = ?')
+            params.append(desired_tier)
+        if clan is not None:
+            conditions.append('current_clan = ? COLLATE NOCASE')
+            params.append(clan)
+        if created_before is not None:
+            conditions.append("created_at <= ?")
+            params.append(created_before)
+        if cursor is not None:
+            conditions.append('(created_at, id) > (?, ?)')
+            params.extend(cursor)
+        params.append(limit)
+        
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            rows = await db.execute_fetchall(f'''
+                SELECT * FROM applications
+                WHERE {' AND '.join(conditions)}
+                ORDER BY created_at, id
+                LIMIT ?
+            ''', params)
+            return [Application.from_row(row) for row in rows]
+    
+    async def update_application_status(self, app_id: int, status: str, processed_by: str = None) -> bool:
+        """Move a pending application to its final status; False if it was already processed"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(f'''
                 UPDATE applications 
-                SET status = ?, processed_at = CURRENT_TIMESTAMP, processed_by = ?
-                WHERE id = ?
+                SET status = ?, processed_at = {NOW}, processed_by = ?
+                WHERE id = ? AND status = 'pending'
             ''', (status, processed_by or "", app_id))
             await db.commit()
+            return cursor.rowcount > 0
     
-    async def assign_tier(self, discord_id: str, new_tier: str, assigned_by: str, application_id: int = None):
-        """Assign tier to player"""
+    async def set_application_message(self, app_id: int, message_id: str, channel_id: str):
+        """Remember the moderator message posted for an application"""
         async with aiosqlite.connect(self.db_path) as db:
-            # Get current player info
-            cursor = await db.execute('SELECT * FROM players WHERE discord_id = ?', (discord_id,))
-            row = await cursor.fetchone()
-            old_tier = row[0] if row else None
-            
-            # Get application info if provided
-            game_id = "N/A"
-            game_nickname = "N/A"
-            current_clan = "N/A"
-            page_info = "N/A"
-            
-            if application_id:
-                app_cursor = await db.execute('SELECT * FROM applications WHERE id = ?', (application_id,))
-                app_row = await app_cursor.fetchone()
-                if app_row:
-                    # app_row format: (id, discord_id, game_id, game_nickname, current_clan, page_info, ...)
-                    game_id = app_row[2] or "N/A"
-                    game_nickname = app_row[3] or "N/A"
-                    current_clan = app_row[4] or "N/A"
-                    page_info = app_row[5] or "N/A"
-            
-            # Update or insert player with all required fields
             await db.execute('''
-                INSERT OR REPLACE INTO players 
-                (discord_id, game_id, game_nickname, current_clan, page_info, tier, tier_assigned_at, tier_assigned_by, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, CURRENT_TIMESTAMP)
-            ''', (discord_id, game_id, game_nickname, current_clan, page_info, new_tier, assigned_by))
-            
-            # Log assignment
-            await db.execute('''
-                INSERT INTO tier_assignments (discord_id, old_tier, new_tier, assigned_by, application_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (discord_id, old_tier, new_tier, assigned_by, application_id))
-            
+                UPDATE applications SET message_id = ?, channel_id = ? WHERE id = ?
+            ''', (message_id, channel_id, app_id))
             await db.commit()
     
-    async def get_tier_leaderboard(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get tier leaderboard"""
+    async def get_expired_applications(self, cutoff: int, limit: int = 100) -> List[Application]:
+        """Get pending applications created before the cutoff (unix time)"""
         async with aiosqlite.connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute('''
-                SELECT discord_id, game_nickname, tier, tier_assigned_at,
-                       CASE tier
-                           WHEN 'T1' THEN 1
-                           WHEN 'T2' THEN 2
-                           WHEN 'T3' THEN 3
-                           WHEN 'T4' THEN 4
-                           WHEN 'T5' THEN 5
-                           ELSE 6
-                       END as tier_order
-                FROM players 
-                WHERE tier IS NOT NULL AND tier != 'None'
-                ORDER BY tier_order ASC, tier_assigned_at ASC
+                SELECT * FROM applications
+                WHERE status = 'pending' AND created_at < ?
+                ORDER BY created_at ASC
                 LIMIT ?
-            ''', (limit,))
+            ''', (cutoff, limit))
             rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [Application.from_row(row) for row in rows]
     
-    async def get_player_by_discord_id(self, discord_id: str) -> Optional[Dict[str, Any]]:
-        """Get player by Discord ID"""
+    async def expire_application(self, app_id: int) -> bool:
+        """Mark a pending application as expired, returns False if it was already processed"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(f'''
+                UPDATE applications 
+                SET status = 'expired', processed_at = {NOW}, processed_by = 'system'
+                WHERE id = ? AND status = 'pending'
+            ''', (app_id,))
+            await db.commit()
+            return cursor.rowcount > 0
+    
+    async def archive_applications(self, cutoff: int) -> int:
+        """Move applications processed before the cutoff (unix time) into the archive"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute('''
+                INSERT OR REPLACE INTO applications_archive
+                SELECT id, discord_id, game_id, game_nickname, current_clan, page_info, desired_tier,
+                       status, message_id, channel_id, created_at, processed_at, processed_by
+                FROM applications
+                WHERE status != 'pending' AND processed_at < ?
+            ''', (cutoff,))
+            cursor = await db.execute('''
+                DELETE FROM applications
+                WHERE status != 'pending' AND processed_at < ?
+            ''', (cutoff,))
+            await db.commit()
+            return cursor.rowcount
+    
+    async def archive_tier_assignments(self, cutoff: int) -> int:
+        """Move tier assignment log entries older than the cutoff (unix time) into the archive"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute('''
+                INSERT OR REPLACE INTO tier_assignments_archive
+                SELECT id, discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id, guild_id
+                FROM tier_assignments
+                WHERE assigned_at < ?
+            ''', (cutoff,))
+            cursor = await db.execute('''
+                DELETE FROM tier_assignments WHERE assigned_at < ?
+            ''', (cutoff,))
+            await db.commit()
+            return cursor.rowcount
+    
+    async def assign_tier(self, discord_id: str, new_tier: str, assigned_by: str, application_id: int = None,
+                          guild_id: str = ''):
+        """Assign tier to player"""
+        async with aiosqlite.connect(self.db_path) as db:
+            entry = await self._write_tier_change(db, discord_id, new_tier, assigned_by, application_id, guild_id)
+            await db.commit()
+        await self._tier_changed(entry)
+    
+    async def approve_application(self, app_id: int, tier: str, processed_by: str, guild_id: str = '') -> bool:
+        """Approve a pending application and assign its tier in one transaction; False if it was already processed"""
+        async with aiosqlite.connect(self.db_path) as db:
+            # Claiming the application first also takes the write lock for the tier change
+            cursor = await db.execute(f'''
+                UPDATE applications 
+                SET status = 'approved', processed_at = {NOW}, processed_by = ?
+                WHERE id = ? AND status = 'pending'
+            ''', (processed_by, app_id))
+            if cursor.rowcount == 0:
+                return False
+            cursor = await db.execute('SELECT discord_id FROM applications WHERE id = ?', (app_id,))
+            discord_id = (await cursor.fetchone())[0]
+            entry = await self._write_tier_change(db, discord_id, tier, processed_by, app_id, guild_id)
+            await db.commit()
+        await self._tier_changed(entry)
+        return True
+    
+    async def _write_tier_change(self, db, discord_id: str, new_tier: str, assigned_by: str,
+                                 application_id: Optional[int], guild_id: str) -> dict:
+        """Update the player, counters and (without a write buffer) the log; returns the log entry"""
+        # Get current tier
+        cursor = await db.execute('SELECT tier, guild_id FROM players WHERE discord_id = ?', (discord_id,))
+        row = await cursor.fetchone()
+        old_tier = row[0] if row else None
+        old_guild_id = row[1] if row else None
+        new_guild_id = guild_id or old_guild_id or ''
+        
+        # Rank comes from the guild's catalog, or the default tiers if it has none
+        cursor = await db.execute('''
+            SELECT rank FROM tier_catalog WHERE guild_id = ? AND name = ?
+        ''', (new_guild_id, new_tier))
+        rank_row = await cursor.fetchone()
+        tier_rank = rank_row[0] if rank_row else DEFAULT_CATALOG.rank(new_tier)
+        
+        # Get application info if provided (existing player info is kept otherwise)
+        player_info = {'game_id': None, 'game_nickname': None, 'current_clan': None, 'page_info': None}
+        
+        if application_id:
+            app_cursor = await db.execute('''
+                SELECT game_id, game_nickname, current_clan, page_info FROM applications WHERE id = ?
+            ''', (application_id,))
+            app_row = await app_cursor.fetchone()
+            if app_row:
+                player_info = {
+                    'game_id': app_row[0] or "N/A",
+                    'game_nickname': app_row[1] or "N/A",
+                    'current_clan': app_row[2] or "N/A",
+                    'page_info': app_row[3] or "N/A"
+                }
+        
+        # Update or insert player
+        await db.execute(f'''
+            INSERT INTO players 
+            (discord_id, game_id, game_nickname, current_clan, page_info, tier, tier_rank, tier_assigned_at,
+             tier_assigned_by, created_at, updated_at, guild_id)
+            VALUES (:discord_id, COALESCE(:game_id, 'N/A'), COALESCE(:game_nickname, 'N/A'),
+                    COALESCE(:current_clan, 'N/A'), COALESCE(:page_info, 'N/A'), :tier, :tier_rank,
+                    {NOW}, :assigned_by, {NOW}, {NOW}, :guild_id)
+            ON CONFLICT (discord_id) DO UPDATE SET
+                game_id = COALESCE(:game_id, game_id),
+                game_nickname = COALESCE(:game_nickname, game_nickname),
+                current_clan = COALESCE(:current_clan, current_clan),
+                page_info = COALESCE(:page_info, page_info),
+                tier = :tier,
+                tier_rank = :tier_rank,
+                tier_assigned_at = {NOW},
+                tier_assigned_by = :assigned_by,
+                updated_at = {NOW},
+                guild_id = :guild_id
+        ''', {'discord_id': discord_id, 'tier': new_tier, 'tier_rank': tier_rank,
+              'assigned_by': assigned_by,
+              'guild_id': new_guild_id, **player_info})
+        
+        # Keep per-guild tier counters in step with the players table
+        if old_tier and old_tier != 'None':
+            await db.execute('''
+                UPDATE tier_counters SET player_count = player_count - 1
+                WHERE guild_id = ? AND tier = ?
+            ''', (old_guild_id, old_tier))
+        if new_tier != 'None':
+            await db.execute('''
+                INSERT INTO tier_counters (guild_id, tier, player_count) VALUES (?, ?, 1)
+                ON CONFLICT (guild_id, tier) DO UPDATE SET player_count = player_count + 1
+            ''', (new_guild_id, new_tier))
+        
+        # Log assignment and update the moderator rollup (queued after commit when a write buffer is attached)
+        entry = {
+            'discord_id': discord_id, 'old_tier': old_tier, 'new_tier': new_tier, 'assigned_by': assigned_by,
+            'assigned_at': int(datetime.now(timezone.utc).timestamp()),
+            'application_id': application_id, 'guild_id': new_guild_id,
+            'removed': 1 if new_tier == 'None' else 0
+        }
+        if self.write_buffer is None:
+            await self._execute_deferrable(db, 'assignment', entry)
+        return entry
+    
+    async def _tier_changed(self, entry: dict):
+        """After a tier change committed: queue its log entry and tell other processes"""
+        self._defer('assignment', entry)
+        await self._invalidate('tier', guild_id=entry['guild_id'], discord_id=entry['discord_id'])
+    
+    async def _fetch_assignment_log(self, conditions: List[str], params: list, limit: int) -> List[TierAssignment]:
+        """Read matching tier changes from the log and its archive, newest first"""
+        where = ' AND '.join(conditions)
         async with aiosqlite.connect(self.db_path) as db:
             db.row_factory = aiosqlite.Row
-            cursor = await db.execute('SELECT * FROM players WHERE discord_id = ?', (discord_id,))
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+            rows = await db.execute_fetchall(f'''
+                SELECT * FROM (
+                    SELECT {self.ASSIGNMENT_COLUMNS} FROM tier_assignments WHERE {where}
+                    ORDER BY assigned_at DESC, id DESC LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT {self.ASSIGNMENT_COLUMNS} FROM tier_assignments_archive WHERE {where}
+                    ORDER BY assigned_at DESC, id DESC LIMIT ?
+                )
+                ORDER BY assigned_at DESC, id DESC
+                LIMIT ?
+            ''', [*params, limit, *params, limit, limit])
+            return [TierAssignment.from_row(row) for row in rows]
+    
+    async def get_tier_history(self, discord_id: str, since: int = None, cursor: tuple = None,
+                               limit: int = 10) -> List[TierAssignment]:
+        """Get tier changes for a player, newest first (keyset paginated by (assigned_at, id))"""
+        conditions = ['discord_id = ?']
+        params = [discord_id]
+        if since is not None:
+            conditions.append("assigned_at >= ?")
+            params.append(since)
+        if cursor is not None:
+            conditions.append('(assigned_at, id) < (?, ?)')
+            params.extend(cursor)
+        return await self._fetch_assignment_log(conditions, params, limit)
+    
+    async def get_moderator_actions(self, guild_id: str, assigned_by: str, since: int = None,
+                                    cursor: tuple = None, limit: int = 10) -> List[TierAssignment]:
+        """Get tier changes made by a moderator in a guild, newest first (keyset paginated)"""
+        conditions = ['guild_id = ?', 'assigned_by = ?']
+        params = [guild_id, assigned_by]
+        if since is not None:
+            conditions.append("assigned_at >= ?")
+            params.append(since)
+        if cursor is not None:
+            conditions.append('(assigned_at, id) < (?, ?)')
+            params.extend(cursor)
+        return await self._fetch_assignment_log(conditions, params, limit)
+    
+    async def get_moderator_daily_stats(self, guild_id: str, since_day: int,
+                                        assigned_by: str = None) -> List[Dict[str, Any]]:
+        """Get per-moderator daily assignment counts from the rollup table"""
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            rows = await db.execute_fetchall('''
+                SELECT assigned_by, day, assignments, removals FROM moderator_daily_stats
+                WHERE guild_id = ? AND day >= ? AND (? IS NULL OR assigned_by = ?)
+                ORDER BY day DESC, assignments DESC
+            ''', (guild_id, since_day, assigned_by, assigned_by))
+            return [dict(row) for row in rows]
+    
+    async def get_tier_counts(self, guild_id: str) -> Dict[str, int]:
+        """Get number of players per tier for a guild (players without a guild count everywhere)"""
+        async with aiosqlite.connect(self.db_path) as db:
+            rows = await db.execute_fetchall('''
+                SELECT tier, SUM(player_count) FROM tier_counters
+                WHERE guild_id IN (?, '')
+                GROUP BY tier
+            ''', (guild_id,))
+            return {row[0]: row[1] for row in rows if row[1] > 0}
+    
+    async def get_tier_leaderboard(self, limit: int, guild_id: str) -> List[Player]:
+        """Get a guild's tier leaderboard: highest tier first, earliest assignment first within a tier"""
+        rows = await self._run_statement('guild_tier_leaderboard', (guild_id, limit))
+        return [Player.from_row(row) for row in rows]
+    
+    async def get_player_by_discord_id(self, discord_id: str) -> Optional[Player]:
+        """Get player by Discord ID"""
+        rows = await self._run_statement('get_player_by_discord_id', (discord_id,))
+        return Player.from_row(rows[0]) if rows else None
     
     async def has_pending_application(self, discord_id: str) -> bool:
         """Check if user has pending application"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM applications 
-                WHERE discord_id = ? AND status = 'pending'
-            ''', (discord_id,))
-            count = await cursor.fetchone()
-            return count[0] > 0
+        rows = await self._run_statement('has_pending_application', (discord_id,))
+        return bool(rows[0][0])
     
     async def set_guild_applications_channel(self, guild_id: str, channel_id: str):
         """Set applications channel for guild"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO guild_settings (guild_id, applications_channel_id, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
+            await db.execute(f'''
+                INSERT INTO guild_settings (guild_id, applications_channel_id, created_at, updated_at)
+                VALUES (?, ?, {NOW}, {NOW})
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    applications_channel_id = excluded.applications_channel_id,
+                    updated_at = {NOW}
             ''', (guild_id, channel_id))
             await db.commit()
     
@@ -214,15 +746,15 @@ class Database:
     async def set_guild_tierlist_channel(self, guild_id: str, channel_id: str, message_id: str = None):
         """Set tierlist channel and message for guild"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO guild_settings 
-                (guild_id, applications_channel_id, tier_list_channel_id, tier_list_message_id, updated_at)
-                VALUES (
-                    ?, 
-                    COALESCE((SELECT applications_channel_id FROM guild_settings WHERE guild_id = ?), ?),
-                    ?, ?, CURRENT_TIMESTAMP
-                )
-            ''', (guild_id, guild_id, channel_id, channel_id, message_id))
+            await db.execute(f'''
+                INSERT INTO guild_settings
+                (guild_id, tier_list_channel_id, tier_list_message_id, created_at, updated_at)
+                VALUES (?, ?, ?, {NOW}, {NOW})
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    tier_list_channel_id = excluded.tier_list_channel_id,
+                    tier_list_message_id = excluded.tier_list_message_id,
+                    updated_at = {NOW}
+            ''', (guild_id, channel_id, message_id))
             await db.commit()
     
     async def get_guild_tierlist_info(self, guild_id: str) -> Optional[Dict[str, str]]:
@@ -240,113 +772,319 @@ class Database:
                 }
             return None
     
+    async def get_tier_catalogs(self) -> List[Dict[str, Any]]:
+        """Get all customized tier catalog entries"""
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            rows = await db.execute_fetchall('''
+                SELECT guild_id, name, rank, color, emoji, role_id FROM tier_catalog ORDER BY guild_id, rank
+            ''')
+            return [dict(row) for row in rows]
+    
+    async def get_guild_tier_catalog(self, guild_id: str) -> List[Dict[str, Any]]:
+        """Get one guild's customized tier catalog entries (empty if it uses the default tiers)"""
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            rows = await db.execute_fetchall('''
+                SELECT guild_id, name, rank, color, emoji, role_id FROM tier_catalog WHERE guild_id = ? ORDER BY rank
+            ''', (guild_id,))
+            return [dict(row) for row in rows]
+    
+    async def save_guild_tier_catalog(self, guild_id: str, tiers: List[Dict[str, Any]]):
+        """Replace a guild's tier catalog and re-rank its players to match"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute('DELETE FROM tier_catalog WHERE guild_id = ?', (guild_id,))
+            await db.executemany('''
+                INSERT INTO tier_catalog (guild_id, name, rank, color, emoji, role_id)
+                VALUES (:guild_id, :name, :rank, :color, :emoji, :role_id)
+            ''', [{'guild_id': guild_id, **tier} for tier in tiers])
+            
+            # Legacy players without a guild are listed on every guild's leaderboard, so they follow the
+            # catalog saved last; a guild without a catalog of its own uses the default tiers
+            ranks = ([(tier['rank'], tier['name']) for tier in tiers]
+                     or [(tier.rank, tier.name) for tier in DEFAULT_CATALOG])
+            await db.execute("UPDATE players SET tier_rank = 0 WHERE guild_id IN (?, '')", (guild_id,))
+            await db.executemany("UPDATE players SET tier_rank = ? WHERE guild_id IN (?, '') AND tier = ?",
+                                 [(rank, guild_id, name) for rank, name in ranks])
+            await db.commit()
+        await self._invalidate('catalog', guild_id=guild_id)
+    
     async def set_guild_allowed_roles(self, guild_id: str, role_ids: List[str]):
         """Set roles that can use the bot"""
         role_ids_str = ','.join(role_ids) if role_ids else None
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO guild_settings 
-                (guild_id, applications_channel_id, tier_list_channel_id, tier_list_message_id, allowed_roles, admin_roles, updated_at)
-                VALUES (
-                    ?, 
-                    COALESCE((SELECT applications_channel_id FROM guild_settings WHERE guild_id = ?), NULL),
-                    COALESCE((SELECT tier_list_channel_id FROM guild_settings WHERE guild_id = ?), NULL),
-                    COALESCE((SELECT tier_list_message_id FROM guild_settings WHERE guild_id = ?), NULL),
-                    ?,
-                    COALESCE((SELECT admin_roles FROM guild_settings WHERE guild_id = ?), NULL),
-                    CURRENT_TIMESTAMP
-                )
-            ''', (guild_id, guild_id, guild_id, guild_id, role_ids_str, guild_id))
+            await db.execute(f'''
+                INSERT INTO guild_settings (guild_id, allowed_roles, created_at, updated_at)
+                VALUES (?, ?, {NOW}, {NOW})
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    allowed_roles = excluded.allowed_roles,
+                    updated_at = {NOW}
+            ''', (guild_id, role_ids_str))
             await db.commit()
+        await self._invalidate('settings', guild_id=guild_id)
     
     async def set_guild_admin_roles(self, guild_id: str, role_ids: List[str]):
         """Set roles that can assign tiers"""
         role_ids_str = ','.join(role_ids) if role_ids else None
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO guild_settings 
-                (guild_id, applications_channel_id, tier_list_channel_id, tier_list_message_id, allowed_roles, admin_roles, updated_at)
-                VALUES (
-                    ?, 
-                    COALESCE((SELECT applications_channel_id FROM guild_settings WHERE guild_id = ?), NULL),
-                    COALESCE((SELECT tier_list_channel_id FROM guild_settings WHERE guild_id = ?), NULL),
-                    COALESCE((SELECT tier_list_message_id FROM guild_settings WHERE guild_id = ?), NULL),
-                    COALESCE((SELECT allowed_roles FROM guild_settings WHERE guild_id = ?), NULL),
-                    ?,
-                    CURRENT_TIMESTAMP
-                )
-            ''', (guild_id, guild_id, guild_id, guild_id, guild_id, role_ids_str))
+            await db.execute(f'''
+                INSERT INTO guild_settings (guild_id, admin_roles, created_at, updated_at)
+                VALUES (?, ?, {NOW}, {NOW})
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    admin_roles = excluded.admin_roles,
+                    updated_at = {NOW}
+            ''', (guild_id, role_ids_str))
             await db.commit()
+        await self._invalidate('settings', guild_id=guild_id)
     
     async def get_guild_allowed_roles(self, guild_id: str) -> List[str]:
         """Get roles that can use the bot"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('''
-                SELECT allowed_roles FROM guild_settings WHERE guild_id = ?
-            ''', (guild_id,))
-            row = await cursor.fetchone()
-            if row and row[0]:
-                return row[0].split(',')
-            return []
+        rows = await self._run_statement('get_guild_allowed_roles', (guild_id,))
+        if rows and rows[0][0]:
+            return rows[0][0].split(',')
+        return []
     
     async def get_guild_admin_roles(self, guild_id: str) -> List[str]:
         """Get roles that can assign tiers"""
+        rows = await self._run_statement('get_guild_admin_roles', (guild_id,))
+        if rows and rows[0][0]:
+            return rows[0][0].split(',')
+        return []
+    
+    async def get_member_names(self, guild_id: str, discord_ids: List[str]) -> Dict[str, str]:
+        """Get stored display names for guild members"""
+        result = {}
         async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('''
-                SELECT admin_roles FROM guild_settings WHERE guild_id = ?
+            for start in range(0, len(discord_ids), 500):
+                chunk = discord_ids[start:start + 500]
+                rows = await db.execute_fetchall(f'''
+                    SELECT discord_id, display_name FROM member_names
+                    WHERE guild_id = ? AND discord_id IN ({','.join('?' * len(chunk))})
+                ''', (guild_id, *chunk))
+                result.update({row[0]: row[1] for row in rows})
+        return result
+    
+    async def get_player_tiers(self, guild_id: str, discord_ids: List[str]) -> Dict[str, str]:
+        """Get ranked tiers for the given players as seen from a guild"""
+        result = {}
+        async with aiosqlite.connect(self.db_path) as db:
+            for start in range(0, len(discord_ids), 500):
+                chunk = discord_ids[start:start + 500]
+                rows = await db.execute_fetchall(f'''
+                    SELECT discord_id, tier FROM players
+                    WHERE guild_id IN (?, '') AND tier_rank > 0 AND discord_id IN ({','.join('?' * len(chunk))})
+                ''', (guild_id, *chunk))
+                result.update({row[0]: row[1] for row in rows})
+        return result
+    
+    async def get_guild_player_tiers(self, guild_id: str) -> Dict[str, str]:
+        """Get every ranked player's tier as seen from a guild"""
+        async with aiosqlite.connect(self.db_path) as db:
+            rows = await db.execute_fetchall('''
+                SELECT discord_id, tier FROM players WHERE guild_id IN (?, '') AND tier_rank > 0
             ''', (guild_id,))
-            row = await cursor.fetchone()
-            if row and row[0]:
-                return row[0].split(',')
-            return []
+            return {row[0]: row[1] for row in rows}
     
-    async def save_persistent_view(self, message_id: str, channel_id: str, guild_id: str, 
-                                 view_type: str, view_data: dict = None):
-        """Save persistent view data"""
+    async def save_member_names(self, guild_id: str, names: Dict[str, str]):
+        """Store display names for guild members"""
         async with aiosqlite.connect(self.db_path) as db:
-            current_time = int(datetime.now().timestamp())
-            import json
-            view_data_json = json.dumps(view_data) if view_data else None
-            
+            await db.executemany(f'''
+                INSERT INTO member_names (guild_id, discord_id, display_name, updated_at)
+                VALUES (?, ?, ?, {NOW})
+                ON CONFLICT (guild_id, discord_id) DO UPDATE SET
+                    display_name = excluded.display_name,
+                    updated_at = {NOW}
+            ''', [(guild_id, discord_id, name) for discord_id, name in names.items()])
+            await db.commit()
+        await self._invalidate('names', guild_id=guild_id, discord_ids=list(names))
+    
+    async def iter_guild_rows(self, table: str, guild_id: str, columns: Sequence[str], key: str,
+                              batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a guild's rows of a table in key order, holding one batch in memory at a time"""
+        select = ', '.join(dict.fromkeys([key, *columns]))
+        last = None
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            while True:
+                after = f'AND {key} > ?' if last is not None else ''
+                params = (guild_id, last, batch_size) if last is not None else (guild_id, batch_size)
+                # +guild_id keeps the planner on the key's index: a guild index would sort the guild's rows per batch
+                rows = await db.execute_fetchall(f'''
+                    SELECT {select} FROM {table}
+                    WHERE +guild_id = ? {after}
+                    ORDER BY {key}
+                    LIMIT ?
+                ''', params)
+                for row in rows:
+                    yield {column: row[column] for column in columns}
+                if len(rows) < batch_size:
+                    return
+                last = rows[-1][key]
+    
+    async def import_players(self, guild_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Upsert a batch of players (epoch timestamps, tier_rank filled in) into a guild"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.executemany(f'''
+                INSERT INTO players
+                (discord_id, game_id, game_nickname, current_clan, page_info, tier, tier_rank, tier_assigned_at,
+                 tier_assigned_by, created_at, updated_at, guild_id)
+                VALUES (:discord_id, :game_id, :game_nickname, :current_clan, :page_info, :tier, :tier_rank,
+                        :tier_assigned_at, :tier_assigned_by, COALESCE(:created_at, {NOW}),
+                        COALESCE(:updated_at, {NOW}), :guild_id)
+                ON CONFLICT (discord_id) DO UPDATE SET
+                    game_id = excluded.game_id,
+                    game_nickname = excluded.game_nickname,
+                    current_clan = excluded.current_clan,
+                    page_info = excluded.page_info,
+                    tier = excluded.tier,
+                    tier_rank = excluded.tier_rank,
+                    tier_assigned_at = excluded.tier_assigned_at,
+                    tier_assigned_by = excluded.tier_assigned_by,
+                    updated_at = excluded.updated_at,
+                    guild_id = excluded.guild_id
+            ''', [{**row, 'guild_id': guild_id} for row in rows])
+            await db.commit()
+        return len(rows)
+    
+    async def import_applications(self, guild_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Insert a batch of applications (epoch timestamps) as new rows; returns how many were inserted
+        
+        A second pending application for the same user is skipped.
+        """
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.executemany(f'''
+                INSERT OR IGNORE INTO applications
+                (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, status, created_at,
+                 processed_at, processed_by, guild_id)
+                VALUES (:discord_id, :game_id, :game_nickname, :current_clan, :page_info, :desired_tier,
+                        COALESCE(:status, 'pending'), COALESCE(:created_at, {NOW}), :processed_at,
+                        :processed_by, :guild_id)
+            ''', [{**row, 'guild_id': guild_id} for row in rows])
+            await db.commit()
+            return cursor.rowcount
+    
+    async def import_tier_assignments(self, guild_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Append a batch of tier log entries (epoch timestamps) and count them in the moderator rollup"""
+        now = int(time.time())
+        await self.apply_writes([('assignment', {
+            **row, 'assigned_at': row['assigned_at'] or now, 'application_id': None, 'guild_id': guild_id,
+            'removed': 1 if row['new_tier'] == 'None' else 0
+        }) for row in rows])
+        return len(rows)
+    
+    async def rebuild_tier_counters(self):
+        """Recount players per guild and tier after bulk changes"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute('DELETE FROM tier_counters')
             await db.execute('''
-                INSERT OR REPLACE INTO persistent_views 
-                (message_id, channel_id, guild_id, view_type, view_data, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (message_id, channel_id, guild_id, view_type, view_data_json, current_time))
+                INSERT INTO tier_counters (guild_id, tier, player_count)
+                SELECT guild_id, tier, COUNT(*) FROM players
+                WHERE tier IS NOT NULL AND tier != 'None'
+                GROUP BY guild_id, tier
+            ''')
             await db.commit()
-
-    async def get_persistent_views(self) -> List[Dict[str, Any]]:
-        """Get all persistent views for restoration"""
+    
+    async def snapshot(self, path: str) -> int:
+        """Write a gzip-compressed online copy of the database to path; returns the uncompressed size"""
+        return await asyncio.to_thread(self._write_snapshot, path)
+    
+    def _write_snapshot(self, path: str) -> int:
+        copy_path = f"{path}.partial.db"
+        try:
+            source = sqlite3.connect(self.db_path)
+            copy = sqlite3.connect(copy_path)
+            try:
+                # Incremental backup API: each step holds the read lock for a few pages only, and an
+                # optional pause between steps leaves the disk to the bot on busy hosts
+                step_sleep = Config.SNAPSHOT_STEP_SLEEP_MS / 1000
+                progress = (lambda *_: time.sleep(step_sleep)) if step_sleep > 0 else None
+                source.backup(copy, pages=self.SNAPSHOT_PAGES_PER_STEP, progress=progress)
+            finally:
+                copy.close()
+                source.close()
+            size = os.path.getsize(copy_path)
+            with open(copy_path, 'rb') as src, gzip.open(f"{path}.partial", 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(f"{path}.partial", path)
+        except BaseException:
+            # Retention only prunes finished snapshots, so nothing else would clean these up
+            for partial in (f"{path}.partial", copy_path):
+                if os.path.exists(partial):
+                    os.remove(partial)
+            raise
+        os.remove(copy_path)
+        return size
+    
+    @asynccontextmanager
+    async def lease(self, kind: str, key: str, timeout: float, ttl: float):
+        """Hold the named lock shared by every process using this database file
+        
+        The lease expires after ttl seconds so a crashed holder cannot block the others for good;
+        the work done under it must finish well within ttl. Raises LockTimeout after timeout seconds.
+        """
+        name = f"{kind}:{key}"
+        owner = uuid.uuid4().hex
+        await wait_for_lock(lambda: self._try_lease(name, owner, ttl), kind, timeout)
+        try:
+            yield
+        finally:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.execute('DELETE FROM locks WHERE name = ? AND owner = ?', (name, owner))
+                await db.commit()
+    
+    async def _try_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = int(time.time())
         async with aiosqlite.connect(self.db_path) as db:
             cursor = await db.execute('''
-                SELECT * FROM persistent_views ORDER BY created_at DESC
-            ''')
-            rows = await cursor.fetchall()
-            
-            result = []
-            for row in rows:
-                import json
-                view_data = {
-                    'message_id': row[0],
-                    'channel_id': row[1], 
-                    'guild_id': row[2],
-                    'view_type': row[3],
-                    'view_data': json.loads(row[4]) if row[4] else None,
-                    'created_at': row[5]
-                }
-                result.append(view_data)
-            return result
-
-    async def delete_persistent_view(self, message_id: str):
-        """Delete persistent view"""
+                INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    owner = excluded.owner,
+                    expires_at = excluded.expires_at
+                WHERE locks.expires_at <= ?
+            ''', (name, owner, now + int(ttl), now))
+            await db.commit()
+            return cursor.rowcount == 1
+    
+    async def _invalidate(self, topic: str, **payload):
+        """Tell other bot processes to drop cached data this write changed"""
+        if self.invalidation is not None:
+            await self.invalidation.publish(topic, **payload)
+    
+    def _defer(self, kind: str, params: dict) -> bool:
+        """Hand a write to the write-behind buffer, if one is attached"""
+        if self.write_buffer is None:
+            return False
+        self.write_buffer.add(kind, params)
+        return True
+    
+    async def _execute_deferrable(self, db, kind: str, params: dict):
+        for sql in self.DEFERRED_WRITES[kind]:
+            await db.execute(sql, params)
+    
+    async def apply_writes(self, ops: List[Tuple[str, dict]]):
+        """Apply a batch of deferred writes in one transaction, in the order they were queued"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                DELETE FROM persistent_views WHERE message_id = ?
-            ''', (message_id,))
+            for kind, group in groupby(ops, key=itemgetter(0)):
+                params = [op[1] for op in group]
+                for sql in self.DEFERRED_WRITES[kind]:
+                    await db.executemany(sql, params)
             await db.commit()
     
     async def close(self):
-        """Close database connection (for SQLite, this is a no-op)"""
-        pass
+        """Close the long-lived lookup connection"""
+        if self._lookup_db is not None:
+            await self._lookup_db.close()
+            self._lookup_db = None
+    
+    async def _run_statement(self, name: str, params: tuple) -> list:
+        """Run a registered lookup and return its rows"""
+        with self.STATEMENTS.timed(name):
+            if self._lookup_db is None:
+                async with self._lookup_lock:
+                    if self._lookup_db is None:
+                        db = await aiosqlite.connect(self.db_path)
+                        db.row_factory = aiosqlite.Row
+                        self._lookup_db = db
+            return await self._lookup_db.execute_fetchall(self.STATEMENTS[name], params)
     
 
@@ -1,17 +1,97 @@
+import asyncio
 import asyncpg
+import gzip
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-import json
+from itertools import groupby
+from operator import itemgetter
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence, Tuple
+from config import Config
+from locks import wait_for_lock
+from metrics import METRICS
+from models import Application, Player, TierAssignment
+from statements import StatementRegistry
+from tiers import DEFAULT_CATALOG
 
 class PostgreSQLDatabase:
+    # Writes that may go through the write-behind buffer: kind -> (statement, param keys) pairs
+    DEFERRED_WRITES = {
+        'assignment': [('''
+            INSERT INTO tier_assignments
+            (discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id, guild_id)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+        ''', ('discord_id', 'old_tier', 'new_tier', 'assigned_by', 'assigned_at', 'application_id', 'guild_id')), ('''
+            INSERT INTO moderator_daily_stats (guild_id, assigned_by, day, assignments, removals)
+            VALUES ($1, $2, $3::bigint / 86400, 1 - $4::int, $4::int)
+            ON CONFLICT (guild_id, assigned_by, day) DO UPDATE SET
+                assignments = moderator_daily_stats.assignments + EXCLUDED.assignments,
+                removals = moderator_daily_stats.removals + EXCLUDED.removals
+        ''', ('guild_id', 'assigned_by', 'assigned_at', 'removed'))],
+    }
+
+    # Hot-path lookups, prepared once per pool connection by asyncpg's statement cache
+    STATEMENTS = StatementRegistry({
+        'has_pending_application': '''
+            SELECT EXISTS (SELECT 1 FROM applications WHERE discord_id = $1 AND status = 'pending')
+        ''',
+        'get_player_by_discord_id': 'SELECT * FROM players WHERE discord_id = $1',
+        'get_guild_allowed_roles': 'SELECT allowed_roles FROM guild_settings WHERE guild_id = $1',
+        'get_guild_admin_roles': 'SELECT admin_roles FROM guild_settings WHERE guild_id = $1',
+        # Players without a guild rank everywhere: two index-ordered range scans, merged until the limit
+        'guild_tier_leaderboard': '''
+            (SELECT * FROM players WHERE guild_id = $2 AND tier_rank > 0
+             ORDER BY tier_rank ASC, tier_assigned_at ASC LIMIT $1)
+            UNION ALL
+            (SELECT * FROM players WHERE guild_id = '' AND tier_rank > 0
+             ORDER BY tier_rank ASC, tier_assigned_at ASC LIMIT $1)
+            ORDER BY tier_rank ASC, tier_assigned_at ASC
+            LIMIT $1
+        ''',
+    })
+
+    # Columns of the tier assignment log, in the same order in the live table and its archive
+    ASSIGNMENT_COLUMNS = 'id, discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id, guild_id'
+
+    SNAPSHOT_SUFFIX = '.sql.gz'
+    SNAPSHOT_WRITE_CHUNK = 1 << 20  # Buffer COPY output and compress it off the event loop in chunks this big
+
     def __init__(self):
         self.db_url = os.getenv('DATABASE_URL')
+        self.replica_url = Config.DATABASE_REPLICA_URL
         self.pool = None
+        self.replica_pool = None
+        self.write_buffer = None  # WriteBehindBuffer, attached by the bot
+        self.invalidation = None  # InvalidationBus, attached by the bot
+
+        # Advisory lock session, opened on first use (see lease())
+        self._lock_conn = None
+        self._lock_conn_guard = asyncio.Lock()
+        self._held_locks = set()
+
+        # Replica routing state (time.monotonic() deadlines)
+        self._replica_ok = False
+        self._replica_checked_at = None
+        self._replica_check_lock = asyncio.Lock()
+        self._primary_until = 0.0
+
+    @staticmethod
+    def pool_options() -> Dict[str, Any]:
+        return {
+            'min_size': Config.DATABASE_POOL_MIN_SIZE,
+            'max_size': Config.DATABASE_POOL_MAX_SIZE,
+            'statement_cache_size': Config.DATABASE_STATEMENT_CACHE_SIZE
+        }
 
     async def init_db(self):
         """Initialize database connection pool and tables"""
-        self.pool = await asyncpg.create_pool(self.db_url)
+        self.pool = await asyncpg.create_pool(self.db_url, **self.pool_options())
+        if self.replica_url:
+            try:
+                self.replica_pool = await asyncpg.create_pool(self.replica_url, **self.pool_options())
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"[DB] Read replica unavailable, reading from primary: {e}")
 
         async with self.pool.acquire() as conn:
             # Create tables
@@ -73,133 +153,606 @@ class PostgreSQLDatabase:
                 )
             ''')
 
+            # Buttons are routed by custom_id now; per-message view rows are obsolete
+            await conn.execute('DROP TABLE IF EXISTS persistent_views')
+
+            # Archive tables for processed applications and old assignment logs
             await conn.execute('''
-                CREATE TABLE IF NOT EXISTS persistent_views (
-                    id SERIAL PRIMARY KEY,
-                    message_id TEXT UNIQUE NOT NULL,
-                    channel_id TEXT NOT NULL,
+                CREATE TABLE IF NOT EXISTS applications_archive (
+                    id INTEGER PRIMARY KEY,
+                    discord_id TEXT NOT NULL,
+                    game_id TEXT,
+                    game_nickname TEXT,
+                    current_clan TEXT,
+                    page_info TEXT,
+                    desired_tier TEXT,
+                    status TEXT,
+                    message_id TEXT,
+                    channel_id TEXT,
+                    created_at BIGINT,
+                    processed_at BIGINT,
+                    processed_by TEXT
+                )
+            ''')
+
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS tier_assignments_archive (
+                    id INTEGER PRIMARY KEY,
+                    discord_id TEXT NOT NULL,
+                    old_tier TEXT,
+                    new_tier TEXT,
+                    assigned_by TEXT,
+                    assigned_at BIGINT,
+                    application_id INTEGER,
+                    guild_id TEXT NOT NULL DEFAULT ''
+                )
+            ''')
+
+            # Per-guild tier catalogs (guilds without rows use the default tiers)
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS tier_catalog (
+                    guild_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    rank SMALLINT NOT NULL,
+                    color INTEGER NOT NULL,
+                    emoji TEXT NOT NULL,
+                    role_id TEXT,
+                    PRIMARY KEY (guild_id, name)
+                )
+            ''')
+
+            # Display name cache, so leaderboards don't need the member cache
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS member_names (
+                    guild_id TEXT NOT NULL,
+                    discord_id TEXT NOT NULL,
+                    display_name TEXT NOT NULL,
+                    updated_at BIGINT DEFAULT EXTRACT(epoch FROM NOW()),
+                    PRIMARY KEY (guild_id, discord_id)
+                )
+            ''')
+
+            # Materialized player counts per guild and tier
+            counters_exist = await conn.fetchval("SELECT to_regclass('tier_counters') IS NOT NULL")
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS tier_counters (
+                    guild_id TEXT NOT NULL,
+                    tier TEXT NOT NULL,
+                    player_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, tier)
+                )
+            ''')
+
+            await conn.execute('''
+                ALTER TABLE players ADD COLUMN IF NOT EXISTS guild_id TEXT NOT NULL DEFAULT ''
+            ''')
+            rank_exists = await conn.fetchval('''
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'players' AND column_name = 'tier_rank'
+            ''')
+            if not rank_exists:
+                await conn.execute('''
+                    ALTER TABLE players ADD COLUMN tier_rank SMALLINT NOT NULL DEFAULT 0
+                ''')
+                await conn.executemany('UPDATE players SET tier_rank = $1 WHERE tier = $2',
+                                       [(tier.rank, tier.name) for tier in DEFAULT_CATALOG])
+
+            # Leaderboard reads are a range scan over ranked players of a guild
+            await conn.execute('DROP INDEX IF EXISTS idx_players_guild_tier')
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_players_guild_rank
+                ON players (guild_id, tier_rank, tier_assigned_at)
+            ''')
+
+            if not counters_exist:
+                await conn.execute('''
+                    INSERT INTO tier_counters (guild_id, tier, player_count)
+                    SELECT guild_id, tier, COUNT(*) FROM players
+                    WHERE tier IS NOT NULL AND tier != 'None'
+                    GROUP BY guild_id, tier
+                ''')
+
+            # Per-moderator daily rollup of tier assignments
+            rollup_exists = await conn.fetchval("SELECT to_regclass('moderator_daily_stats') IS NOT NULL")
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS moderator_daily_stats (
                     guild_id TEXT NOT NULL,
-                    view_type TEXT NOT NULL,
-                    view_data JSONB,
-                    created_at BIGINT DEFAULT EXTRACT(epoch FROM NOW())
+                    assigned_by TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    assignments INTEGER NOT NULL DEFAULT 0,
+                    removals INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, assigned_by, day)
                 )
             ''')
 
+            await conn.execute('''
+                ALTER TABLE tier_assignments ADD COLUMN IF NOT EXISTS guild_id TEXT NOT NULL DEFAULT ''
+            ''')
+            await conn.execute('''
+                ALTER TABLE tier_assignments_archive ADD COLUMN IF NOT EXISTS guild_id TEXT NOT NULL DEFAULT ''
+            ''')
+
+            # Indexes for history and audit queries, which read the log and its archive
+            for table in ('tier_assignments', 'tier_assignments_archive'):
+                await conn.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_{table}_user
+                    ON {table} (discord_id, assigned_at, id)
+                ''')
+                await conn.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_{table}_moderator
+                    ON {table} (guild_id, assigned_by, assigned_at, id)
+                ''')
+
+            # Build the rollup once for logs written before it existed
+            if not rollup_exists:
+                await conn.execute('''
+                    INSERT INTO moderator_daily_stats (guild_id, assigned_by, day, assignments, removals)
+                    SELECT guild_id, assigned_by, (assigned_at / 86400)::int,
+                           COUNT(*) FILTER (WHERE new_tier != 'None'), COUNT(*) FILTER (WHERE new_tier = 'None')
+                    FROM (
+                        SELECT guild_id, assigned_by, assigned_at, new_tier FROM tier_assignments
+                        UNION ALL
+                        SELECT guild_id, assigned_by, assigned_at, new_tier FROM tier_assignments_archive
+                    ) AS log
+                    GROUP BY 1, 2, 3
+                ''')
+
+            # At most one pending application per user
+            if not await conn.fetchval("SELECT to_regclass('idx_applications_one_pending') IS NOT NULL"):
+                # Duplicates from double submissions would block the index; keep the newest
+                await conn.execute('''
+                    UPDATE applications
+                    SET status = 'expired', processed_at = EXTRACT(epoch FROM NOW()), processed_by = 'system'
+                    WHERE status = 'pending' AND id NOT IN (
+                        SELECT MAX(id) FROM applications WHERE status = 'pending' GROUP BY discord_id
+                    )
+                ''')
+                await conn.execute('''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_applications_one_pending
+                    ON applications (discord_id) WHERE status = 'pending'
+                ''')
+
+            # Applications from before guild_id existed are matched through the guild's applications channel
+            app_guild_exists = await conn.fetchval('''
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'applications' AND column_name = 'guild_id'
+            ''')
+            if not app_guild_exists:
+                await conn.execute('''
+                    ALTER TABLE applications ADD COLUMN guild_id TEXT NOT NULL DEFAULT ''
+                ''')
+                await conn.execute('''
+                    UPDATE applications SET guild_id = guild_settings.guild_id
+                    FROM guild_settings
+                    WHERE guild_settings.applications_channel_id = applications.channel_id
+                ''')
+
+            # Review queue: a guild's pending applications, oldest first, optionally by desired tier
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_review
+                ON applications (guild_id, created_at, id) WHERE status = 'pending'
+            ''')
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_review_tier
+                ON applications (guild_id, desired_tier, created_at, id) WHERE status = 'pending'
+            ''')
+
+            # Indexes for the janitor scans
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_status_created
+                ON applications (status, created_at)
+            ''')
+            # Buttons posted before custom_ids carried the application id are resolved by message
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_applications_message
+                ON applications (message_id)
+            ''')
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tier_assignments_assigned_at
+                ON tier_assignments (assigned_at)
+            ''')
+
     async def close(self):
         """Close database connection pool"""
+        if self._lock_conn is not None:
+            await self._lock_conn.close()
+        if self.replica_pool:
+            await self.replica_pool.close()
         if self.pool:
             await self.pool.close()
 
-    async def create_application(self, discord_id: str, game_id: str, game_nickname: str, 
-                               current_clan: str, page_info: str, desired_tier: str) -> int:
-        """Create a new tier application"""
+    async def replica_lag(self) -> float:
+        """Seconds the replica is behind the primary; 0 when it has replayed everything it received"""
+        async with self.replica_pool.acquire() as conn:
+            lag = await conn.fetchval('''
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END
+            ''')
+            return float(lag)
+
+    async def _replica_usable(self) -> bool:
+        """Whether reads may go to the replica; its lag is re-checked every REPLICA_LAG_CHECK_SECONDS"""
+        if self.replica_pool is None or time.monotonic() < self._primary_until:
+            return False
+        if not self._replica_check_due():
+            return self._replica_ok
+
+        async with self._replica_check_lock:
+            if not self._replica_check_due():
+                return self._replica_ok
+
+            try:
+                lag = await self.replica_lag()
+                METRICS.set_gauge('db.replica_lag_seconds', round(lag, 3))
+                ok = lag <= Config.REPLICA_MAX_LAG_SECONDS
+                reason = f"lag {lag:.1f}s"
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                ok = False
+                reason = str(e)
+
+            if ok != self._replica_ok:
+                print(f"[DB] Reads {'moved to replica' if ok else 'fell back to primary'} ({reason})")
+            self._replica_ok = ok
+            self._replica_checked_at = time.monotonic()
+            return ok
+
+    def _replica_check_due(self) -> bool:
+        return (self._replica_checked_at is None
+                or time.monotonic() - self._replica_checked_at >= Config.REPLICA_LAG_CHECK_SECONDS)
+
+    def pin_primary(self):
+        """Read from the primary until the replica has had time to replay a write we just made"""
+        if self.replica_pool is not None:
+            self._primary_until = time.monotonic() + Config.REPLICA_MAX_LAG_SECONDS
+
+    async def _run_statement(self, conn, name: str, method: str, *args):
+        """Run a registered statement with fetch/fetchrow/fetchval
+
+        With DATABASE_STATEMENT_CACHE_SIZE > 0 asyncpg prepares it on the first run on each pool connection.
+        """
+        with self.STATEMENTS.timed(name):
+            return await getattr(conn, method)(self.STATEMENTS[name], *args)
+
+    @asynccontextmanager
+    async def _read_conn(self):
+        """Connection for lookups that tolerate REPLICA_MAX_LAG_SECONDS of staleness"""
+        pool = self.replica_pool if await self._replica_usable() else self.pool
+        METRICS.inc('db.reads.replica' if pool is self.replica_pool else 'db.reads.primary')
+        async with pool.acquire() as conn:
+            yield conn
+
+    async def create_application_if_absent(self, discord_id: str, game_id: str, game_nickname: str,
+                                           current_clan: str, page_info: str, desired_tier: str,
+                                           guild_id: str = '') -> Tuple[Optional[Application], bool]:
+        """Create a pending application unless the user already has one; returns (application, created)"""
         async with self.pool.acquire() as conn:
             current_time = int(datetime.now().timestamp())
 
-            query = """
-                INSERT INTO applications 
-                (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, created_at)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                RETURNING id
-                """
-            result = await conn.fetchrow(query, discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, current_time)
+            row = await conn.fetchrow('''
+                INSERT INTO applications
+                (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, created_at, guild_id)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT (discord_id) WHERE status = 'pending' DO NOTHING
+                RETURNING *
+            ''', discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, current_time,
+                guild_id)
+            if row:
+                return Application.from_row(row), True
 
-            return result['id']
+            row = await conn.fetchrow('''
+                SELECT * FROM applications WHERE discord_id = $1 AND status = 'pending'
+            ''', discord_id)
+            return (Application.from_row(row) if row else None), False
 
-    async def get_application(self, app_id: int) -> Optional[Dict[str, Any]]:
+    async def get_application(self, app_id: int) -> Optional[Application]:
         """Get application by ID"""
         async with self.pool.acquire() as conn:
             row = await conn.fetchrow('''
                 SELECT * FROM applications WHERE id = $1
             ''', app_id)
 
-            return dict(row) if row else None
+            return Application.from_row(row) if row else None
 
-    async def update_application_status(self, app_id: int, status: str, processed_by: str = None):
-        """Update application status"""
+    async def get_application_by_message(self, message_id: str) -> Optional[Application]:
+        """Get the application posted as the given moderator message"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow('''
+                SELECT * FROM applications WHERE message_id = $1
+            ''', message_id)
+
+            return Application.from_row(row) if row else None
+
+    async def get_review_queue(self, guild_id: str, desired_tier: str = None, clan: str = None,
+                               created_before: int = None, cursor: tuple = None,
+                               limit: int = 10) -> List[Application]:
+        """Get a guild's pending applications, oldest first (keyset paginated by (created_at, id))"""
+        conditions = ["status = 'pending'", "guild_id IN ($1, '')"]
+        params = [guild_id]
+        if desired_tier is not None:
+            params.append(desired_tier)
+            conditions.append(f'desired_tier = ${len(params)}')
+        if clan is not None:
+            params.append(clan)
+            conditions.append(f'lower(current_clan) = lower(${len(params)})')
+        if created_before is not None:
+            params.append(created_before)
+            conditions.append(f'created_at <= ${len(params)}')
+        if cursor is not None:
+            params.extend(cursor)
+            conditions.append(f'(created_at, id) > (${len(params) - 1}, ${len(params)})')
+        params.append(limit)
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(f'''
+                SELECT * FROM applications
+                WHERE {' AND '.join(conditions)}
+                ORDER BY created_at, id
+                LIMIT ${len(params)}
+            ''', *params)
+
+            return [Application.from_row(row) for row in rows]
+
+    async def update_application_status(self, app_id: int, status: str, processed_by: str = None) -> bool:
+        """Move a pending application to its final status; False if it was already processed"""
         async with self.pool.acquire() as conn:
             current_time = int(datetime.now().timestamp())
 
-            await conn.execute('''
+            result = await conn.execute('''
                 UPDATE applications 
                 SET status = $1, processed_at = $2, processed_by = $3
-                WHERE id = $4
+                WHERE id = $4 AND status = 'pending'
             ''', status, current_time, processed_by, app_id)
+            return result != 'UPDATE 0'
 
-    async def assign_tier(self, discord_id: str, new_tier: str, assigned_by: str, application_id: int = None):
-        """Assign tier to player"""
+    async def set_application_message(self, app_id: int, message_id: str, channel_id: str):
+        """Remember the moderator message posted for an application"""
+        async with self.pool.acquire() as conn:
+            await conn.execute('''
+                UPDATE applications SET message_id = $1, channel_id = $2 WHERE id = $3
+            ''', message_id, channel_id, app_id)
+
+    async def get_expired_applications(self, cutoff: int, limit: int = 100) -> List[Application]:
+        """Get pending applications created before the cutoff (unix time)"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('''
+                SELECT * FROM applications
+                WHERE status = 'pending' AND created_at < $1
+                ORDER BY created_at ASC
+                LIMIT $2
+            ''', cutoff, limit)
+
+            return [Application.from_row(row) for row in rows]
+
+    async def expire_application(self, app_id: int) -> bool:
+        """Mark a pending application as expired, returns False if it was already processed"""
         async with self.pool.acquire() as conn:
             current_time = int(datetime.now().timestamp())
 
-            # Get current tier
-            current_player = await conn.fetchrow('''
-                SELECT tier FROM players WHERE discord_id = $1
-            ''', discord_id)
+            result = await conn.execute('''
+                UPDATE applications 
+                SET status = 'expired', processed_at = $1, processed_by = 'system'
+                WHERE id = $2 AND status = 'pending'
+            ''', current_time, app_id)
 
-            old_tier = current_player['tier'] if current_player else None
+            return result != 'UPDATE 0'
 
-            # Update or create player
+    async def archive_applications(self, cutoff: int) -> int:
+        """Move applications processed before the cutoff (unix time) into the archive"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute('''
+                WITH moved AS (
+                    DELETE FROM applications
+                    WHERE status != 'pending' AND processed_at < $1
+                    RETURNING id, discord_id, game_id, game_nickname, current_clan, page_info, desired_tier,
+                              status, message_id, channel_id, created_at, processed_at, processed_by
+                )
+                INSERT INTO applications_archive SELECT * FROM moved
+                ON CONFLICT (id) DO NOTHING
+            ''', cutoff)
+
+            return int(result.split()[-1])
+
+    async def archive_tier_assignments(self, cutoff: int) -> int:
+        """Move tier assignment log entries older than the cutoff (unix time) into the archive"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute('''
+                WITH moved AS (
+                    DELETE FROM tier_assignments
+                    WHERE assigned_at < $1
+                    RETURNING id, discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id, guild_id
+                )
+                INSERT INTO tier_assignments_archive SELECT * FROM moved
+                ON CONFLICT (id) DO NOTHING
+            ''', cutoff)
+
+            return int(result.split()[-1])
+
+    async def assign_tier(self, discord_id: str, new_tier: str, assigned_by: str, application_id: int = None,
+                          guild_id: str = ''):
+        """Assign tier to player"""
+        async with self.pool.acquire() as conn, conn.transaction():
+            entry = await self._write_tier_change(conn, discord_id, new_tier, assigned_by, application_id, guild_id)
+        await self._tier_changed(entry)
+
+    async def approve_application(self, app_id: int, tier: str, processed_by: str, guild_id: str = '') -> bool:
+        """Approve a pending application and assign its tier in one transaction; False if it was already processed"""
+        async with self.pool.acquire() as conn, conn.transaction():
+            discord_id = await conn.fetchval('''
+                UPDATE applications
+                SET status = 'approved', processed_at = $1, processed_by = $2
+                WHERE id = $3 AND status = 'pending'
+                RETURNING discord_id
+            ''', int(datetime.now().timestamp()), processed_by, app_id)
+            if discord_id is None:
+                return False
+            entry = await self._write_tier_change(conn, discord_id, tier, processed_by, app_id, guild_id)
+        await self._tier_changed(entry)
+        return True
+
+    async def _write_tier_change(self, conn, discord_id: str, new_tier: str, assigned_by: str,
+                                 application_id: Optional[int], guild_id: str) -> dict:
+        """Update the player, counters and (without a write buffer) the log; returns the log entry"""
+        current_time = int(datetime.now().timestamp())
+
+        # Get current tier
+        current_player = await conn.fetchrow('''
+            SELECT tier, guild_id FROM players WHERE discord_id = $1 FOR UPDATE
+        ''', discord_id)
+
+        old_tier = current_player['tier'] if current_player else None
+        old_guild_id = current_player['guild_id'] if current_player else None
+        new_guild_id = guild_id or old_guild_id or ''
+
+        # Rank comes from the guild's catalog, or the default tiers if it has none
+        tier_rank = await conn.fetchval('''
+            SELECT rank FROM tier_catalog WHERE guild_id = $1 AND name = $2
+        ''', new_guild_id, new_tier)
+        if tier_rank is None:
+            tier_rank = DEFAULT_CATALOG.rank(new_tier)
+
+        # Update the player, or create it from its latest application like the SQLite backend ('N/A' without one)
+        if current_player:
             await conn.execute('''
-                INSERT INTO players 
-                (discord_id, game_id, game_nickname, current_clan, page_info, tier, tier_assigned_at, tier_assigned_by, updated_at)
-                SELECT $1, game_id, game_nickname, current_clan, page_info, $2, $3, $4, $5
-                FROM applications WHERE discord_id = $1 
-                ORDER BY created_at DESC LIMIT 1
-                ON CONFLICT (discord_id) 
-                DO UPDATE SET 
+                UPDATE players SET
                     tier = $2,
+                    tier_rank = $7,
                     tier_assigned_at = $3,
                     tier_assigned_by = $4,
-                    updated_at = $5
-            ''', discord_id, new_tier, current_time, assigned_by, current_time)
+                    updated_at = $5,
+                    guild_id = $6
+                WHERE discord_id = $1
+            ''', discord_id, new_tier, current_time, assigned_by, current_time, new_guild_id,
+                tier_rank)
+        else:
+            await conn.execute('''
+                INSERT INTO players 
+                (discord_id, game_id, game_nickname, current_clan, page_info, tier, tier_rank, tier_assigned_at,
+                 tier_assigned_by, updated_at, guild_id)
+                SELECT $1, COALESCE(app.game_id, 'N/A'), COALESCE(app.game_nickname, 'N/A'),
+                       COALESCE(app.current_clan, 'N/A'), COALESCE(app.page_info, 'N/A'), $2, $7, $3, $4, $5, $6
+                FROM (SELECT 1) AS one
+                LEFT JOIN LATERAL (
+                    SELECT * FROM applications WHERE discord_id = $1 ORDER BY created_at DESC LIMIT 1
+                ) AS app ON true
+            ''', discord_id, new_tier, current_time, assigned_by, current_time, new_guild_id,
+                tier_rank)
 
-            # Log tier assignment
+        # Keep per-guild tier counters in step with the players table
+        if old_tier and old_tier != 'None':
             await conn.execute('''
-                INSERT INTO tier_assignments 
-                (discord_id, old_tier, new_tier, assigned_by, assigned_at, application_id)
-                VALUES ($1, $2, $3, $4, $5, $6)
-            ''', discord_id, old_tier, new_tier, assigned_by, current_time, application_id)
+                UPDATE tier_counters SET player_count = player_count - 1
+                WHERE guild_id = $1 AND tier = $2
+            ''', old_guild_id, old_tier)
+        if new_tier != 'None':
+            await conn.execute('''
+                INSERT INTO tier_counters (guild_id, tier, player_count) VALUES ($1, $2, 1)
+                ON CONFLICT (guild_id, tier) DO UPDATE SET player_count = tier_counters.player_count + 1
+            ''', new_guild_id, new_tier)
 
-    async def get_tier_leaderboard(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get tier leaderboard"""
-        async with self.pool.acquire() as conn:
+        # Log tier assignment and update the moderator rollup (queued after commit if a write buffer is attached)
+        entry = {
+            'discord_id': discord_id, 'old_tier': old_tier, 'new_tier': new_tier, 'assigned_by': assigned_by,
+            'assigned_at': current_time, 'application_id': application_id, 'guild_id': new_guild_id,
+            'removed': 1 if new_tier == 'None' else 0
+        }
+        if self.write_buffer is None:
+            await self._execute_deferrable(conn, 'assignment', entry)
+        return entry
+
+    async def _tier_changed(self, entry: dict):
+        """After a tier change committed: queue its log entry and tell other processes"""
+        self._defer('assignment', entry)
+        self.pin_primary()
+        await self._invalidate('tier', guild_id=entry['guild_id'], discord_id=entry['discord_id'])
+
+    async def _fetch_assignment_log(self, conditions: List[str], params: list) -> List[TierAssignment]:
+        """Read matching tier changes from the log and its archive, newest first (the limit is the last param)"""
+        where = ' AND '.join(conditions)
+        limit = f'${len(params)}'
+        async with self._read_conn() as conn:
+            rows = await conn.fetch(f'''
+                (SELECT {self.ASSIGNMENT_COLUMNS} FROM tier_assignments WHERE {where}
+                 ORDER BY assigned_at DESC, id DESC LIMIT {limit})
+                UNION ALL
+                (SELECT {self.ASSIGNMENT_COLUMNS} FROM tier_assignments_archive WHERE {where}
+                 ORDER BY assigned_at DESC, id DESC LIMIT {limit})
+                ORDER BY assigned_at DESC, id DESC
+                LIMIT {limit}
+            ''', *params)
+
+            return [TierAssignment.from_row(row) for row in rows]
+
+    async def get_tier_history(self, discord_id: str, since: int = None, cursor: tuple = None,
+                               limit: int = 10) -> List[TierAssignment]:
+        """Get tier changes for a player, newest first (keyset paginated by (assigned_at, id))"""
+        conditions = ['discord_id = $1']
+        params = [discord_id]
+        if since is not None:
+            params.append(since)
+            conditions.append(f'assigned_at >= ${len(params)}')
+        if cursor is not None:
+            params.extend(cursor)
+            conditions.append(f'(assigned_at, id) < (${len(params) - 1}, ${len(params)})')
+        params.append(limit)
+        return await self._fetch_assignment_log(conditions, params)
+
+    async def get_moderator_actions(self, guild_id: str, assigned_by: str, since: int = None,
+                                    cursor: tuple = None, limit: int = 10) -> List[TierAssignment]:
+        """Get tier changes made by a moderator in a guild, newest first (keyset paginated)"""
+        conditions = ['guild_id = $1', 'assigned_by = $2']
+        params = [guild_id, assigned_by]
+        if since is not None:
+            params.append(since)
+            conditions.append(f'assigned_at >= ${len(params)}')
+        if cursor is not None:
+            params.extend(cursor)
+            conditions.append(f'(assigned_at, id) < (${len(params) - 1}, ${len(params)})')
+        params.append(limit)
+        return await self._fetch_assignment_log(conditions, params)
+
+    async def get_moderator_daily_stats(self, guild_id: str, since_day: int,
+                                        assigned_by: str = None) -> List[Dict[str, Any]]:
+        """Get per-moderator daily assignment counts from the rollup table"""
+        async with self._read_conn() as conn:
             rows = await conn.fetch('''
-                SELECT * FROM players 
-                WHERE tier != 'None'
-                ORDER BY 
-                    CASE tier 
-                        WHEN 'T1' THEN 1 
-                        WHEN 'T2' THEN 2 
-                        WHEN 'T3' THEN 3 
-                        WHEN 'T4' THEN 4 
-                        WHEN 'T5' THEN 5 
-                        ELSE 6 
-                    END,
-                    tier_assigned_at DESC
-                LIMIT $1
-            ''', limit)
+                SELECT assigned_by, day, assignments, removals FROM moderator_daily_stats
+                WHERE guild_id = $1 AND day >= $2 AND ($3::text IS NULL OR assigned_by = $3)
+                ORDER BY day DESC, assignments DESC
+            ''', guild_id, since_day, assigned_by)
 
             return [dict(row) for row in rows]
 
-    async def get_player_by_discord_id(self, discord_id: str) -> Optional[Dict[str, Any]]:
+    async def get_tier_counts(self, guild_id: str) -> Dict[str, int]:
+        """Get number of players per tier for a guild (players without a guild count everywhere)"""
+        async with self._read_conn() as conn:
+            rows = await conn.fetch('''
+                SELECT tier, SUM(player_count) AS player_count FROM tier_counters
+                WHERE guild_id IN ($1, '')
+                GROUP BY tier
+            ''', guild_id)
+
+            return {row['tier']: row['player_count'] for row in rows if row['player_count'] > 0}
+
+    async def get_tier_leaderboard(self, limit: int, guild_id: str) -> List[Player]:
+        """Get a guild's tier leaderboard: highest tier first, earliest assignment first within a tier"""
+        async with self._read_conn() as conn:
+            rows = await self._run_statement(conn, 'guild_tier_leaderboard', 'fetch', limit, guild_id)
+
+            return [Player.from_row(row) for row in rows]
+
+    async def get_player_by_discord_id(self, discord_id: str) -> Optional[Player]:
         """Get player by Discord ID"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow('''
-                SELECT * FROM players WHERE discord_id = $1
-            ''', discord_id)
+        async with self._read_conn() as conn:
+            row = await self._run_statement(conn, 'get_player_by_discord_id', 'fetchrow', discord_id)
 
-            return dict(row) if row else None
+            return Player.from_row(row) if row else None
 
     async def has_pending_application(self, discord_id: str) -> bool:
         """Check if user has pending application"""
         async with self.pool.acquire() as conn:
-            result = await conn.fetchrow('''
-                SELECT id FROM applications 
-                WHERE discord_id = $1 AND status = 'pending'
-                LIMIT 1
-            ''', discord_id)
-
-            return result is not None
+            return await self._run_statement(conn, 'has_pending_application', 'fetchval', discord_id)
 
     async def set_guild_applications_channel(self, guild_id: str, channel_id: str):
         """Set applications channel for guild"""
@@ -255,6 +808,42 @@ class PostgreSQLDatabase:
                 }
             return None
 
+    async def get_tier_catalogs(self) -> List[Dict[str, Any]]:
+        """Get all customized tier catalog entries"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('''
+                SELECT guild_id, name, rank, color, emoji, role_id FROM tier_catalog ORDER BY guild_id, rank
+            ''')
+            return [dict(row) for row in rows]
+
+    async def get_guild_tier_catalog(self, guild_id: str) -> List[Dict[str, Any]]:
+        """Get one guild's customized tier catalog entries (empty if it uses the default tiers)"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('''
+                SELECT guild_id, name, rank, color, emoji, role_id FROM tier_catalog WHERE guild_id = $1 ORDER BY rank
+            ''', guild_id)
+            return [dict(row) for row in rows]
+
+    async def save_guild_tier_catalog(self, guild_id: str, tiers: List[Dict[str, Any]]):
+        """Replace a guild's tier catalog and re-rank its players to match"""
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute('DELETE FROM tier_catalog WHERE guild_id = $1', guild_id)
+            await conn.executemany('''
+                INSERT INTO tier_catalog (guild_id, name, rank, color, emoji, role_id)
+                VALUES ($1, $2, $3, $4, $5, $6)
+            ''', [(guild_id, tier['name'], tier['rank'], tier['color'], tier['emoji'], tier['role_id'])
+                  for tier in tiers])
+
+            # Legacy players without a guild are listed on every guild's leaderboard, so they follow the
+            # catalog saved last; a guild without a catalog of its own uses the default tiers
+            ranks = ([(tier['rank'], tier['name']) for tier in tiers]
+                     or [(tier.rank, tier.name) for tier in DEFAULT_CATALOG])
+            await conn.execute("UPDATE players SET tier_rank = 0 WHERE guild_id IN ($1, '')", guild_id)
+            await conn.executemany("UPDATE players SET tier_rank = $1 WHERE guild_id IN ($2, '') AND tier = $3",
+                                   [(rank, guild_id, name) for rank, name in ranks])
+        self.pin_primary()
+        await self._invalidate('catalog', guild_id=guild_id)
+
     async def set_guild_allowed_roles(self, guild_id: str, role_ids: List[str]):
         """Set roles that can use the bot"""
         role_ids_str = ','.join(role_ids) if role_ids else None
@@ -269,6 +858,8 @@ class PostgreSQLDatabase:
                     allowed_roles = $2,
                     updated_at = $3
             ''', guild_id, role_ids_str, current_time)
+        self.pin_primary()
+        await self._invalidate('settings', guild_id=guild_id)
 
     async def set_guild_admin_roles(self, guild_id: str, role_ids: List[str]):
         """Set roles that can assign tiers"""
@@ -284,13 +875,13 @@ class PostgreSQLDatabase:
                     admin_roles = $2,
                     updated_at = $3
             ''', guild_id, role_ids_str, current_time)
+        self.pin_primary()
+        await self._invalidate('settings', guild_id=guild_id)
 
     async def get_guild_allowed_roles(self, guild_id: str) -> List[str]:
         """Get roles that can use the bot"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow('''
-                SELECT allowed_roles FROM guild_settings WHERE guild_id = $1
-            ''', guild_id)
+        async with self._read_conn() as conn:
+            row = await self._run_statement(conn, 'get_guild_allowed_roles', 'fetchrow', guild_id)
 
             if row and row['allowed_roles']:
                 return row['allowed_roles'].split(',')
@@ -298,42 +889,249 @@ class PostgreSQLDatabase:
 
     async def get_guild_admin_roles(self, guild_id: str) -> List[str]:
         """Get roles that can assign tiers"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow('''
-                SELECT admin_roles FROM guild_settings WHERE guild_id = $1
-            ''', guild_id)
+        async with self._read_conn() as conn:
+            row = await self._run_statement(conn, 'get_guild_admin_roles', 'fetchrow', guild_id)
 
             if row and row['admin_roles']:
                 return row['admin_roles'].split(',')
             return []
 
-    async def save_persistent_view(self, message_id: str, channel_id: str, guild_id: str, 
-                                 view_type: str, view_data: dict = None):
-        """Save persistent view data"""
+    async def get_member_names(self, guild_id: str, discord_ids: List[str]) -> Dict[str, str]:
+        """Get stored display names for guild members"""
+        async with self._read_conn() as conn:
+            rows = await conn.fetch('''
+                SELECT discord_id, display_name FROM member_names
+                WHERE guild_id = $1 AND discord_id = ANY($2::text[])
+            ''', guild_id, discord_ids)
+
+            return {row['discord_id']: row['display_name'] for row in rows}
+
+    async def get_player_tiers(self, guild_id: str, discord_ids: List[str]) -> Dict[str, str]:
+        """Get ranked tiers for the given players as seen from a guild"""
+        async with self._read_conn() as conn:
+            rows = await conn.fetch('''
+                SELECT discord_id, tier FROM players
+                WHERE guild_id IN ($1, '') AND tier_rank > 0 AND discord_id = ANY($2::text[])
+            ''', guild_id, discord_ids)
+
+            return {row['discord_id']: row['tier'] for row in rows}
+
+    async def get_guild_player_tiers(self, guild_id: str) -> Dict[str, str]:
+        """Get every ranked player's tier as seen from a guild"""
+        async with self._read_conn() as conn:
+            rows = await conn.fetch('''
+                SELECT discord_id, tier FROM players WHERE guild_id IN ($1, '') AND tier_rank > 0
+            ''', guild_id)
+
+            return {row['discord_id']: row['tier'] for row in rows}
+
+    async def save_member_names(self, guild_id: str, names: Dict[str, str]):
+        """Store display names for guild members"""
         async with self.pool.acquire() as conn:
             current_time = int(datetime.now().timestamp())
 
-            await conn.execute('''
-                INSERT INTO persistent_views 
-                (message_id, channel_id, guild_id, view_type, view_data, created_at)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                ON CONFLICT (message_id) 
-                DO UPDATE SET 
-                    view_data = $5
-            ''', message_id, channel_id, guild_id, view_type, view_data, current_time)
+            await conn.executemany('''
+                INSERT INTO member_names (guild_id, discord_id, display_name, updated_at)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (guild_id, discord_id) DO UPDATE SET
+                    display_name = EXCLUDED.display_name,
+                    updated_at = EXCLUDED.updated_at
+            ''', [(guild_id, discord_id, name, current_time) for discord_id, name in names.items()])
+        self.pin_primary()
+        await self._invalidate('names', guild_id=guild_id, discord_ids=list(names))
 
-    async def get_persistent_views(self) -> List[Dict[str, Any]]:
-        """Get all persistent views for restoration"""
+    async def iter_guild_rows(self, table: str, guild_id: str, columns: Sequence[str], key: str,
+                              batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a guild's rows of a table in key order through a server-side cursor"""
+        async with self._read_conn() as conn, conn.transaction(readonly=True):
+            async for row in conn.cursor(f'''
+                SELECT {', '.join(columns)} FROM {table} WHERE guild_id = $1 ORDER BY {key}
+            ''', guild_id, prefetch=batch_size):
+                yield dict(row)
+
+    @staticmethod
+    def _unnest(rows: List[Dict[str, Any]], columns: Sequence[str]) -> List[list]:
+        return [[row[column] for row in rows] for column in columns]
+
+    async def import_players(self, guild_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Upsert a batch of players (epoch timestamps, tier_rank filled in) into a guild"""
+        now = int(time.time())
+        # One upsert cannot touch a row twice: the last line for a player wins
+        rows = [{**row, 'created_at': row['created_at'] or now, 'updated_at': row['updated_at'] or now}
+                for row in {row['discord_id']: row for row in rows}.values()]
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch('''
-                SELECT * FROM persistent_views ORDER BY created_at DESC
-            ''')
+            await conn.execute('''
+                INSERT INTO players
+                (discord_id, game_id, game_nickname, current_clan, page_info, tier, tier_rank, tier_assigned_at,
+                 tier_assigned_by, created_at, updated_at, guild_id)
+                SELECT *, $12::text FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[],
+                                                $6::text[], $7::smallint[], $8::bigint[], $9::text[],
+                                                $10::bigint[], $11::bigint[])
+                ON CONFLICT (discord_id) DO UPDATE SET
+                    game_id = EXCLUDED.game_id,
+                    game_nickname = EXCLUDED.game_nickname,
+                    current_clan = EXCLUDED.current_clan,
+                    page_info = EXCLUDED.page_info,
+                    tier = EXCLUDED.tier,
+                    tier_rank = EXCLUDED.tier_rank,
+                    tier_assigned_at = EXCLUDED.tier_assigned_at,
+                    tier_assigned_by = EXCLUDED.tier_assigned_by,
+                    updated_at = EXCLUDED.updated_at,
+                    guild_id = EXCLUDED.guild_id
+            ''', *self._unnest(rows, ('discord_id', 'game_id', 'game_nickname', 'current_clan', 'page_info', 'tier',
+                                      'tier_rank', 'tier_assigned_at', 'tier_assigned_by', 'created_at',
+                                      'updated_at')), guild_id)
+        return len(rows)
 
-            return [dict(row) for row in rows]
+    async def import_applications(self, guild_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Insert a batch of applications (epoch timestamps) as new rows; returns how many were inserted
 
-    async def delete_persistent_view(self, message_id: str):
-        """Delete persistent view"""
+        A second pending application for the same user is skipped.
+        """
+        now = int(time.time())
+        rows = [{**row, 'status': row['status'] or 'pending', 'created_at': row['created_at'] or now}
+                for row in rows]
         async with self.pool.acquire() as conn:
+            status = await conn.execute('''
+                INSERT INTO applications
+                (discord_id, game_id, game_nickname, current_clan, page_info, desired_tier, status, created_at,
+                 processed_at, processed_by, guild_id)
+                SELECT *, $11::text FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[],
+                                                $6::text[], $7::text[], $8::bigint[], $9::bigint[], $10::text[])
+                ON CONFLICT DO NOTHING
+            ''', *self._unnest(rows, ('discord_id', 'game_id', 'game_nickname', 'current_clan', 'page_info',
+                                      'desired_tier', 'status', 'created_at', 'processed_at', 'processed_by')),
+                guild_id)
+        return int(status.split()[-1])
+
+    async def import_tier_assignments(self, guild_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Append a batch of tier log entries (epoch timestamps) and count them in the moderator rollup"""
+        now = int(time.time())
+        await self.apply_writes([('assignment', {
+            **row, 'assigned_at': row['assigned_at'] or now, 'application_id': None, 'guild_id': guild_id,
+            'removed': 1 if row['new_tier'] == 'None' else 0
+        }) for row in rows])
+        return len(rows)
+
+    async def rebuild_tier_counters(self):
+        """Recount players per guild and tier after bulk changes"""
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute('DELETE FROM tier_counters')
             await conn.execute('''
-                DELETE FROM persistent_views WHERE message_id = $1
-            ''', message_id)
\ No newline at end of file
+                INSERT INTO tier_counters (guild_id, tier, player_count)
+                SELECT guild_id, tier, COUNT(*) FROM players
+                WHERE tier IS NOT NULL AND tier != 'None'
+                GROUP BY guild_id, tier
+            ''')
+
+    async def snapshot(self, path: str) -> int:
+        """Write a gzip-compressed online copy of every table to path; returns the uncompressed size
+
+        The file is a psql script (TRUNCATE, one COPY block per table, sequence positions) read from a
+        single repeatable-read transaction, so it is consistent while the bot keeps writing.
+        Restore into a schema created by init_db: gunzip -c FILE | psql DATABASE_URL
+        """
+        out = await asyncio.to_thread(gzip.open, f"{path}.partial", 'wb', 6)
+        buffer = bytearray()
+        size = 0
+
+        async def write(data: bytes, flush: bool = False):
+            nonlocal size
+            buffer.extend(data)
+            size += len(data)
+            if flush or len(buffer) >= self.SNAPSHOT_WRITE_CHUNK:
+                chunk = bytes(buffer)
+                buffer.clear()
+                await asyncio.to_thread(out.write, chunk)
+
+        try:
+            async with self.pool.acquire() as conn, conn.transaction(isolation='repeatable_read', readonly=True):
+                tables = [row['tablename'] for row in await conn.fetch('''
+                    SELECT tablename FROM pg_tables WHERE schemaname = current_schema() ORDER BY tablename
+                ''')]
+                await write(b'BEGIN;\n')
+                if tables:
+                    await write(f"TRUNCATE {', '.join(tables)};\n".encode())
+                for table in tables:
+                    columns = [row['column_name'] for row in await conn.fetch('''
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = current_schema() AND table_name = $1
+                        ORDER BY ordinal_position
+                    ''', table)]
+                    await write(f"COPY {table} ({', '.join(columns)}) FROM stdin;\n".encode())
+                    await conn.copy_from_table(table, columns=columns, output=write)
+                    await write(b'\\.\n')
+                for row in await conn.fetch('''
+                    SELECT pg_get_serial_sequence(table_name, column_name) AS sequence, table_name, column_name
+                    FROM information_schema.columns
+                    WHERE table_schema = current_schema()
+                      AND pg_get_serial_sequence(table_name, column_name) IS NOT NULL
+                '''):
+                    await write(f"SELECT setval('{row['sequence']}', COALESCE((SELECT MAX({row['column_name']}) "
+                                f"FROM {row['table_name']}), 0) + 1, false);\n".encode())
+                await write(b'COMMIT;\n', flush=True)
+            await asyncio.to_thread(out.close)
+            os.replace(f"{path}.partial", path)
+        except BaseException:
+            await asyncio.to_thread(out.close)
+            os.remove(f"{path}.partial")
+            raise
+        return size
+
+    @asynccontextmanager
+    async def lease(self, kind: str, key: str, timeout: float, ttl: float):
+        """Hold the named lock shared by every process using this database
+
+        A session advisory lock on one connection kept outside the pool, so holders and waiters never
+        take pool connections away from the work done under the lock. It lasts until released or until
+        that connection drops, so ttl is not needed here. Raises LockTimeout after timeout seconds.
+        """
+        name = f"{kind}:{key}"
+        await wait_for_lock(lambda: self._try_advisory_lock(name), kind, timeout)
+        try:
+            yield
+        finally:
+            await self._advisory_unlock(name)
+
+    async def _try_advisory_lock(self, name: str) -> bool:
+        async with self._lock_conn_guard:
+            # Session locks are re-entrant, so holders within this process are tracked here as well
+            if name in self._held_locks:
+                return False
+            if self._lock_conn is None or self._lock_conn.is_closed():
+                self._lock_conn = await asyncpg.connect(self.db_url)
+            acquired = await self._lock_conn.fetchval('SELECT pg_try_advisory_lock(hashtextextended($1, 0))', name)
+            if acquired:
+                self._held_locks.add(name)
+            return acquired
+
+    async def _advisory_unlock(self, name: str):
+        async with self._lock_conn_guard:
+            self._held_locks.discard(name)
+            if self._lock_conn is not None and not self._lock_conn.is_closed():
+                await self._lock_conn.execute('SELECT pg_advisory_unlock(hashtextextended($1, 0))', name)
+
+    async def _invalidate(self, topic: str, **payload):
+        """Tell other bot processes to drop cached data this write changed"""
+        if self.invalidation is not None:
+            await self.invalidation.publish(topic, **payload)
+
+    def _defer(self, kind: str, params: dict) -> bool:
+        """Hand a write to the write-behind buffer, if one is attached"""
+        if self.write_buffer is None:
+            return False
+        self.write_buffer.add(kind, params)
+        return True
+
+    async def _execute_deferrable(self, conn, kind: str, params: dict):
+        for sql, keys in self.DEFERRED_WRITES[kind]:
+            await conn.execute(sql, *[params[key] for key in keys])
+
+    async def apply_writes(self, ops: List[Tuple[str, dict]]):
+        """Apply a batch of deferred writes in one transaction, in the order they were queued"""
+        async with self.pool.acquire() as conn, conn.transaction():
+            for kind, group in groupby(ops, key=itemgetter(0)):
+                params = [op[1] for op in group]
+                for sql, keys in self.DEFERRED_WRITES[kind]:
+                    await conn.executemany(sql, [[p[key] for key in keys] for p in params])
+        self.pin_primary()
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from config import Config
+from metrics import METRICS
+
+Handler = Callable[[dict], Union[Awaitable[None], None]]
+
+CHANNEL = 'tier_bot_invalidation'
+MAX_PAYLOAD_BYTES = 7900  # NOTIFY payloads are limited to 8000 bytes
+
+
+class InvalidationBus:
+    """Broadcasts cache invalidations to the other bot processes sharing the database
+
+    Messages are {'topic': ..., **payload}. A process never receives its own messages: it invalidates
+    locally where it writes. This base class delivers between buses in the same process, which is
+    enough for a single instance and for tests.
+    """
+
+    _local: Dict[str, List['InvalidationBus']] = {}
+
+    def __init__(self, channel: str = CHANNEL):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, topic: str, handler: Handler):
+        """Call handler(payload) for messages on a topic; 'reset' means messages may have been missed"""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def start(self):
+        self._local.setdefault(self.channel, []).append(self)
+
+    async def close(self):
+        buses = self._local.get(self.channel, [])
+        if self in buses:
+            buses.remove(self)
+        for task in self._tasks:
+            task.cancel()
+
+    async def publish(self, topic: str, **payload):
+        """Send a message to the other processes; failures are logged, never raised into the writer"""
+        data = self.encode(topic, payload)
+        try:
+            await self._send(data)
+            METRICS.inc(f'invalidation.published.{topic}')
+        except Exception as e:
+            print(f"[INVALIDATE] Could not publish {topic}: {e}")
+
+    def encode(self, topic: str, payload: dict) -> str:
+        data = json.dumps({'topic': topic, 'origin': self.origin, **payload}, separators=(',', ':'))
+        if len(data.encode('utf-8')) > MAX_PAYLOAD_BYTES:
+            # Too many keys to list: drop the lists, receivers then invalidate the whole scope
+            payload = {key: value for key, value in payload.items() if not isinstance(value, list)}
+            data = json.dumps({'topic': topic, 'origin': self.origin, **payload}, separators=(',', ':'))
+        return data
+
+    async def _send(self, data: str):
+        for bus in list(self._local.get(self.channel, [])):
+            await bus._receive(data)
+
+    async def _receive(self, data: str):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            print(f"[INVALIDATE] Ignoring malformed message: {data[:100]}")
+            return
+        if message.pop('origin', None) == self.origin:
+            return
+        await self._dispatch(message.pop('topic', None), message)
+
+    async def _dispatch(self, topic: str, payload: dict):
+        METRICS.inc(f'invalidation.received.{topic}')
+        for handler in self._handlers.get(topic, []):
+            try:
+                result = handler(payload)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"[INVALIDATE] Handler for {topic} failed: {e}")
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """LISTEN/NOTIFY on a dedicated connection; notifications go out through the database pool"""
+
+    def __init__(self, dsn: str, db, channel: str = CHANNEL):
+        super().__init__(channel)
+        self.dsn = dsn
+        self.db = db
+        self._conn = None
+        self._closing = False
+
+    async def start(self):
+        await self._listen()
+
+    async def _listen(self):
+        import asyncpg
+
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.add_listener(self.channel, self._on_notify)
+        self._conn.add_termination_listener(self._on_terminated)
+
+    async def _receive(self, data: str):
+        # Caches refilled right away must not read the change's old state from a lagging replica
+        self.db.pin_primary()
+        await super()._receive(data)
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str):
+        self._spawn(self._receive(payload))
+
+    def _on_terminated(self, conn):
+        if not self._closing:
+            self._spawn(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 1
+        while not self._closing:
+            try:
+                await self._listen()
+            except Exception as e:
+                print(f"[INVALIDATE] Reconnect failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            # Anything sent while we were disconnected is lost
+            await self._dispatch('reset', {})
+            return
+
+    async def close(self):
+        self._closing = True
+        await super().close()
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+
+    async def _send(self, data: str):
+        async with self.db.pool.acquire() as conn:
+            await conn.execute('SELECT pg_notify($1, $2)', self.channel, data)
+
+
+class FileInvalidationBus(InvalidationBus):
+    """Append-only JSON lines file polled by every process (SQLite deployments on one host)
+
+    The writer that pushes the file past its size limit unlinks it; readers finish the old file
+    through their open handle before switching to the new one.
+    """
+
+    MAX_FILE_BYTES = 1 << 20
+
+    def __init__(self, path: str, poll_interval_ms: int = None, channel: str = CHANNEL):
+        super().__init__(channel)
+        self.path = path
+        self.poll_interval = (poll_interval_ms or Config.INVALIDATION_POLL_MS) / 1000
+        self._file = None
+        self._buffer = ''
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._open(at_end=True)
+        self._task = asyncio.create_task(self._poll())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        if self._file:
+            self._file.close()
+        await super().close()
+
+    def _open(self, at_end: bool = False):
+        # Create the file if nobody has written yet so there is an inode to follow
+        with open(self.path, 'a', encoding='utf-8'):
+            pass
+        self._file = open(self.path, 'r', encoding='utf-8')
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+        self._buffer = ''
+
+    async def _send(self, data: str):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data + '\n')  # One small O_APPEND write, not interleaved with other writers
+            rotate = f.tell() > self.MAX_FILE_BYTES
+        if rotate:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._read_new()
+                if self._rotated():
+                    await self._read_new()
+                    self._file.close()
+                    self._open()
+            except OSError as e:
+                print(f"[INVALIDATE] Could not read {self.path}: {e}")
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    async def _read_new(self):
+        self._buffer += self._file.read()
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            if line:
+                await self._receive(line)
+
+
+def create_invalidation_bus(db) -> InvalidationBus:
+    """Bus matching the configured database backend; start() it once the database is initialized"""
+    if Config.DATABASE_URL:
+        return PostgresInvalidationBus(Config.DATABASE_URL, db)
+    if Config.INVALIDATION_FILE:
+        return FileInvalidationBus(Config.INVALIDATION_FILE)
+    return InvalidationBus()
@@ -0,0 +1,103 @@
+import discord
+from discord.ext import commands, tasks
+from datetime import datetime
+from config import Config
+from models import Application
+
+
+class ApplicationJanitor(commands.Cog):
+    """Expires stale applications and archives processed data"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.cleanup.change_interval(minutes=Config.JANITOR_INTERVAL_MINUTES)
+
+    async def cog_load(self):
+        self.cleanup.start()
+
+    async def cog_unload(self):
+        self.cleanup.cancel()
+
+    @tasks.loop(minutes=30)
+    async def cleanup(self):
+        now = int(datetime.now().timestamp())
+
+        try:
+            expired = 0
+            if Config.APPLICATION_TTL_HOURS > 0:
+                expired = await self.expire_applications(now - Config.APPLICATION_TTL_HOURS * 3600)
+
+            archived_apps = archived_logs = 0
+            if Config.ARCHIVE_AFTER_DAYS > 0:
+                cutoff = now - Config.ARCHIVE_AFTER_DAYS * 86400
+                archived_apps = await self.bot.db.archive_applications(cutoff)
+                archived_logs = await self.bot.db.archive_tier_assignments(cutoff)
+
+            if expired or archived_apps or archived_logs:
+                print(f"[JANITOR] Expired {expired} application(s), archived {archived_apps} application(s) "
+                      f"and {archived_logs} assignment log entries")
+        except Exception as e:
+            print(f"[JANITOR] Cleanup failed: {e}")
+
+    @cleanup.before_loop
+    async def before_cleanup(self):
+        await self.bot.wait_until_ready()
+
+    async def expire_applications(self, cutoff: int) -> int:
+        """Expire pending applications created before the cutoff"""
+        expired = 0
+
+        while True:
+            apps = await self.bot.db.get_expired_applications(cutoff, Config.JANITOR_BATCH_SIZE)
+            if not apps:
+                break
+
+            for app in apps:
+                if not await self.bot.db.expire_application(app.id):
+                    continue
+                expired += 1
+                await self.disable_application_message(app)
+                await self.notify_user(app)
+
+            if len(apps) < Config.JANITOR_BATCH_SIZE:
+                break
+
+        return expired
+
+    async def disable_application_message(self, app: Application):
+        """Mark the moderator message as expired and disable its buttons"""
+        if not app.message_id or not app.channel_id:
+            return
+
+        channel = self.bot.get_channel(int(app.channel_id))
+        if not channel:
+            return
+
+        from views import assignment_view
+
+        try:
+            message = await channel.fetch_message(int(app.message_id))
+            embed = message.embeds[0] if message.embeds else discord.Embed()
+            embed.color = Config.COLOR_EXPIRED
+            embed.title = f"⌛ Заявка #{app.id} истекла"
+
+            view = assignment_view(app.id, self.bot.tiers.get(channel.guild.id), disabled=True)
+            await message.edit(embed=embed, view=view)
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            print(f"[JANITOR] Could not update message for application #{app.id}: {e}")
+
+    async def notify_user(self, app: Application):
+        """Tell the applicant their application expired"""
+        from views import resolve_user
+
+        try:
+            user = await resolve_user(self.bot, int(app.discord_id))
+            if user:
+                await user.send(
+                    f"⌛ Ваша заявка на тир #{app.id} истекла, так как не была рассмотрена вовремя.\n\n"
+                    f"Вы можете подать новую заявку."
+                )
+        except:
+            pass  # User might have DMs disabled
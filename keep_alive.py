@@ -1,9 +1,10 @@
 from flask import Flask, jsonify
 from threading import Thread
 import time
-import requests
 import datetime
 
+from metrics import METRICS
+
 app = Flask('')
 
 # Статистика для мониторинга
@@ -34,6 +35,11 @@ def health():
         'service': 'discord-tier-bot'
     })
 
+@app.route('/metrics')
+def metrics():
+    """Эндпоинт с внутренними метриками бота (очередь записи и т.п.)"""
+    return jsonify(METRICS.snapshot())
+
 def run():
     app.run(host='0.0.0.0', port=8080, debug=False)
 
@@ -44,6 +50,8 @@ def keep_alive():
 
 def ping_server():
     """Keep the server alive by pinging it every 5 minutes"""
+    import requests
+    
     while True:
         try:
             response = requests.get("http://localhost:8080/status", timeout=10)
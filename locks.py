@@ -0,0 +1,25 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from metrics import METRICS
+
+LOCK_POLL_INTERVAL = 0.05  # Seconds between attempts while another process holds the lock
+
+
+class LockTimeout(Exception):
+    """The lock was still held by someone else when the timeout ran out"""
+
+
+async def wait_for_lock(try_acquire: Callable[[], Awaitable[bool]], kind: str, timeout: float):
+    """Retry try_acquire until it succeeds, recording the wait as the lock.<kind>.wait timing"""
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    delay = LOCK_POLL_INTERVAL
+    while not await try_acquire():
+        if time.monotonic() >= deadline:
+            METRICS.inc(f'lock.{kind}.timeouts')
+            raise LockTimeout(f"{kind} lock not acquired within {timeout}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1)
+    METRICS.observe(f'lock.{kind}.wait', time.perf_counter() - started)
@@ -1,112 +1,231 @@
+import time
+_PROCESS_START = time.perf_counter()
+
 import discord
 from discord.ext import commands
+import argparse
 import asyncio
+import hashlib
+import json
 import os
-from database import Database
 from bot_commands import TierCommands
+from client_profiles import PROFILES, client_options
 from config import Config
-from views_persistent import PersistentTierApplicationView, PersistentTierAssignmentView
-from keep_alive import keep_alive
+from invalidation import create_invalidation_bus
+from janitor import ApplicationJanitor
+from permissions import PermissionEngine
+from role_sync import RoleReconciler
+from snapshots import SnapshotScheduler
+from tiers import TierRegistry
+from views import DYNAMIC_ITEMS, TierApplicationView
+from names import DisplayNameResolver
+from startup_profile import StartupProfiler
+from write_buffer import WriteBehindBuffer
+
+_IMPORT_TIME = time.perf_counter() - _PROCESS_START
 
-# Configure intents
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
-intents.members = True
+def create_database():
+    """Create the configured database backend, importing only its driver"""
+    if Config.DATABASE_URL:
+        from database_pg import PostgreSQLDatabase
+        return PostgreSQLDatabase()
+    
+    from database import Database
+    return Database(Config.DATABASE_PATH)
 
 class TierBot(commands.Bot):
-    def __init__(self):
-        super().__init__(command_prefix='!', intents=intents)
-        self.db = Database()
+    def __init__(self, force_sync: bool = False, sync_guild_id: int = None, profiler: StartupProfiler = None,
+                 profile: str = Config.CLIENT_PROFILE):
+        super().__init__(command_prefix='!', **client_options(profile))
+        self.profiler = profiler or StartupProfiler()
+        with self.profiler.phase('db_backend'):
+            self.db = create_database()
+        self.permissions = PermissionEngine(self.db)
+        self.tiers = TierRegistry(self.db)
+        self.names = DisplayNameResolver(self)
+        self.role_sync = RoleReconciler(self)
+        self.writes = WriteBehindBuffer(self.db)
+        self.invalidation = create_invalidation_bus(self.db)
+        self.subscribe_invalidations()
+        self.force_sync = force_sync
+        self.sync_guild_id = sync_guild_id
+        self.connect_started_at = None
         
     async def setup_hook(self):
         # Initialize database
-        await self.db.init_db()
+        with self.profiler.phase('db_init'):
+            await self.db.init_db()
+            await self.tiers.load()
+            if Config.WRITE_BUFFER_FLUSH_MS > 0:
+                self.db.write_buffer = self.writes
+                self.writes.start()
+            await self.invalidation.start()
+            self.db.invalidation = self.invalidation
         
         # Add cog
-        await self.add_cog(TierCommands(self))
+        with self.profiler.phase('cog_load'):
+            await self.add_cog(TierCommands(self))
+            await self.add_cog(ApplicationJanitor(self))
+            await self.add_cog(self.role_sync)
+            if Config.SNAPSHOT_INTERVAL_HOURS > 0:
+                await self.add_cog(SnapshotScheduler(self))
         
-        # Restore persistent views
-        await self.restore_persistent_views()
+        # Buttons are routed by custom_id, so this does not grow with the number of posted messages
+        with self.profiler.phase('view_register'):
+            self.add_view(TierApplicationView())
+            self.add_dynamic_items(*DYNAMIC_ITEMS)
         
         # Sync commands
+        with self.profiler.phase('command_sync'):
+            await self.sync_commands()
+    
+    def subscribe_invalidations(self):
+        """Drop exactly the cached data another bot process changed"""
+        bus = self.invalidation
+        bus.subscribe('settings', lambda message: self.permissions.invalidate_guild(int(message['guild_id'])))
+        bus.subscribe('catalog', lambda message: self.tiers.reload(message['guild_id']))
+        bus.subscribe('names', lambda message: self.names.forget(int(message['guild_id']),
+                                                                 message.get('discord_ids')))
+        bus.subscribe('tier', self.on_remote_tier_change)
+        bus.subscribe('reset', self.on_invalidation_reset)
+    
+    def on_remote_tier_change(self, message: dict):
+        # Role sync is idempotent, so a guild served by several processes is safe
+        if message['guild_id'] and self.get_guild(int(message['guild_id'])):
+            self.role_sync.schedule(int(message['guild_id']), int(message['discord_id']))
+    
+    async def on_invalidation_reset(self, message: dict):
+        self.permissions.invalidate_all()
+        self.names.forget_all()
+        await self.tiers.load()
+    
+    def command_tree_hash(self, guild: discord.abc.Snowflake = None) -> str:
+        """Hash the serialized command tree for the given scope"""
+        payload = [command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)]
+        payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+        serialized = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+    
+    def load_sync_state(self) -> dict:
+        """Load stored command tree hashes"""
         try:
-            synced = await self.tree.sync()
-            print(f"Synced {len(synced)} command(s)")
-        except Exception as e:
-            print(f"Failed to sync commands: {e}")
+            with open(Config.COMMAND_SYNC_STATE_PATH, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
     
-    async def restore_persistent_views(self):
-        """Restore persistent views after bot restart"""
+    def save_sync_state(self, state: dict):
+        """Store command tree hashes"""
         try:
-            views_data = await self.db.get_persistent_views()
-            restored_count = 0
-            
-            for view_data in views_data:
-                try:
-                    message_id = view_data['message_id']
-                    channel_id = int(view_data['channel_id'])
-                    view_type = view_data['view_type']
-                    
-                    channel = self.get_channel(channel_id)
-                    if not channel:
-                        # Channel not found, remove from database
-                        await self.db.delete_persistent_view(message_id)
-                        continue
-                    
-                    try:
-                        message = await channel.fetch_message(int(message_id))
-                    except discord.NotFound:
-                        # Message deleted, remove from database
-                        await self.db.delete_persistent_view(message_id)
-                        continue
-                    
-                    # Create appropriate view
-                    if view_type == "tier_assignment":
-                        if view_data['view_data'] and 'application_id' in view_data['view_data']:
-                            app_id = view_data['view_data']['application_id']
-                            view = PersistentTierAssignmentView(app_id)
-                        else:
-                            continue
-                    elif view_type == "tier_application":
-                        view = PersistentTierApplicationView()
-                    else:
-                        continue
-                    
-                    # Attach view to message
-                    self.add_view(view, message_id=int(message_id))
-                    restored_count += 1
-                    
-                except Exception as e:
-                    print(f"Error restoring view {view_data['message_id']}: {e}")
-                    # Remove problematic view from database
-                    await self.db.delete_persistent_view(view_data['message_id'])
-            
-            if restored_count > 0:
-                print(f"Restored {restored_count} persistent view(s)")
-                
+            with open(Config.COMMAND_SYNC_STATE_PATH, 'w') as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            print(f"Failed to save command sync state: {e}")
+    
+    async def sync_commands(self):
+        """Sync application commands only when their definitions changed"""
+        guild = None
+        scope = 'global'
+        if self.sync_guild_id:
+            # Development: guild commands update instantly and have their own rate limit
+            guild = discord.Object(id=self.sync_guild_id)
+            self.tree.copy_global_to(guild=guild)
+            scope = str(self.sync_guild_id)
+        
+        state = self.load_sync_state()
+        tree_hash = self.command_tree_hash(guild)
+        
+        if not self.force_sync and state.get(scope) == tree_hash:
+            print(f"Command tree unchanged ({scope}), skipping sync")
+            return
+        
+        try:
+            synced = await self.tree.sync(guild=guild)
+            print(f"Synced {len(synced)} command(s) ({scope})")
         except Exception as e:
-            print(f"Error restoring persistent views: {e}")
+            print(f"Failed to sync commands: {e}")
+            return
+        
+        state[scope] = tree_hash
+        self.save_sync_state(state)
+    
+    async def start(self, token: str, *, reconnect: bool = True):
+        self.connect_started_at = time.perf_counter()
+        await super().start(token, reconnect=reconnect)
     
     async def on_ready(self):
         print(f'{self.user} has connected to Discord!')
         print(f'Bot is in {len(self.guilds)} guilds')
+        
+        if self.connect_started_at is not None:
+            self.profiler.record('gateway_ready', time.perf_counter() - self.connect_started_at)
+            self.connect_started_at = None
+            self.profiler.report()
+    
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.roles != after.roles:
+            self.permissions.invalidate_member(after.guild.id, after.id)
+        if before.display_name != after.display_name:
+            await self.names.update_member(after)
+    
+    async def on_member_join(self, member: discord.Member):
+        # Returning players get their tier role back
+        self.role_sync.schedule(member.guild.id, member.id, member)
+    
+    async def on_member_remove(self, member: discord.Member):
+        self.permissions.invalidate_member(member.guild.id, member.id)
+    
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.permissions != after.permissions:
+            self.permissions.invalidate_guild(after.guild.id)
+    
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.permissions.invalidate_guild(role.guild.id)
+    
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        if before.owner_id != after.owner_id:
+            self.permissions.invalidate_guild(after.id)
     
     async def close(self):
         """Called when the bot is shutting down"""
+        await self.writes.close()  # Flush buffered writes while the database is still open
+        await self.invalidation.close()
         await self.db.close()
         await super().close()
 
-async def main():
-    # Start keep_alive server
-    keep_alive()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Discord Tier Bot")
+    parser.add_argument('--force-sync', action='store_true',
+                        help="Sync application commands even if the command tree is unchanged")
+    parser.add_argument('--sync-guild', type=int, default=Config.DEV_GUILD_ID,
+                        help="Sync commands to a single guild (development)")
+    parser.add_argument('--profile', choices=PROFILES, default=Config.CLIENT_PROFILE,
+                        help="Client profile: 'lean' disables unneeded intents and caches")
+    parser.add_argument('--profile-startup', action='store_true', default=Config.STARTUP_PROFILE,
+                        help="Print import and startup phase timings")
+    parser.add_argument('--no-keep-alive', action='store_true', default=not Config.KEEP_ALIVE_ENABLED,
+                        help="Do not start the keep-alive HTTP server")
+    return parser.parse_args()
+
+async def main(args):
+    profiler = StartupProfiler(enabled=args.profile_startup, started_at=_PROCESS_START)
+    profiler.record('imports', _IMPORT_TIME)
     
-    # Уведомление о запуске
-    print("[BOT] Starting Discord Tier Bot with monitoring...")
-    print(f"[BOT] Keep-alive server: http://0.0.0.0:8080")
-    print(f"[BOT] Monitor endpoints: /status, /health")
+    if not args.no_keep_alive:
+        # Start keep_alive server (Flask is only imported when enabled)
+        with profiler.phase('keep_alive'):
+            from keep_alive import keep_alive
+            keep_alive()
+        
+        # Уведомление о запуске
+        print("[BOT] Starting Discord Tier Bot with monitoring...")
+        print(f"[BOT] Keep-alive server: http://0.0.0.0:8080")
+        print(f"[BOT] Monitor endpoints: /status, /health")
+    else:
+        print("[BOT] Starting Discord Tier Bot...")
     
-    bot = TierBot()
+    bot = TierBot(force_sync=args.force_sync, sync_guild_id=args.sync_guild, profiler=profiler,
+                  profile=args.profile)
     
     # Get token from environment
     token = os.getenv('DISCORD_TOKEN')
@@ -141,4 +260,4 @@ async def main():
         await bot.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Live migration from SQLite to PostgreSQL
+Mirrors every table the two schemas share into PostgreSQL: columns are matched
+by name, SQLite TIMESTAMP text becomes BIGINT epochs, and columns or tables
+PostgreSQL does not have are skipped. Each pass walks both databases in primary
+key order, COPYs rows missing from PostgreSQL and replaces or deletes rows that
+differ. A pass that compares every row and finds no differences verifies the
+migration.
+
+    # 1. With the bot still running on SQLite: bulk copy, then catch up
+    python3 migrate_to_pg.py --sqlite tier_bot.db --postgres postgresql://...
+    # 2. Stop the bot, run it again (only the rows written meanwhile move), then
+    #    start the bot with DATABASE_URL set
+    python3 migrate_to_pg.py --sqlite tier_bot.db --postgres postgresql://...
+
+SQLite is read in short keyset batches, so the running bot is not blocked.
+Anything in PostgreSQL that is not in SQLite is deleted.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiosqlite
+import asyncpg
+
+from config import Config
+from models import to_epoch
+
+Row = Tuple
+SYNC_PASSES = 3  # Catch-up passes after the copy; stop early once a pass finds nothing to change
+
+
+@dataclass
+class TablePlan:
+    table: str
+    columns: List[str]  # Shared columns in PostgreSQL order
+    key: List[str]  # PostgreSQL primary key
+    types: Dict[str, str]  # Column -> PostgreSQL type name, for array casts
+    epoch_columns: List[int] = field(default_factory=list)  # Indexes of SQLite TIMESTAMP -> BIGINT columns
+
+    @property
+    def key_indexes(self) -> List[int]:
+        return [self.columns.index(column) for column in self.key]
+
+    def key_of(self, row: Row) -> Row:
+        return tuple(row[i] for i in self.key_indexes)
+
+
+@dataclass
+class PassResult:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    target_rows: int = 0
+
+    @property
+    def changes(self) -> int:
+        return self.inserted + self.updated + self.deleted
+
+
+async def build_plans(sqlite_db: aiosqlite.Connection, pg: asyncpg.Connection) -> List[TablePlan]:
+    """Match the two schemas table by table"""
+    sqlite_tables = {row[0] for row in await sqlite_db.execute_fetchall(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )}
+    pg_tables = [row['tablename'] for row in await pg.fetch('''
+        SELECT tablename FROM pg_tables WHERE schemaname = current_schema() ORDER BY tablename
+    ''')]
+    for table in sorted(sqlite_tables - set(pg_tables)):
+        print(f"[MIGRATE] Skipping {table}: not in the PostgreSQL schema")
+
+    plans = []
+    for table in pg_tables:
+        if table not in sqlite_tables:
+            continue
+        sqlite_types = {row[1]: (row[2] or '').upper()
+                        for row in await sqlite_db.execute_fetchall(f'PRAGMA table_info({table})')}
+        pg_columns = await pg.fetch('''
+            SELECT column_name, udt_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = $1
+            ORDER BY ordinal_position
+        ''', table)
+        key = [row['attname'] for row in await pg.fetch('''
+            SELECT a.attname FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = $1::regclass AND i.indisprimary
+            ORDER BY array_position(i.indkey, a.attnum)
+        ''', table)]
+        columns = [row['column_name'] for row in pg_columns if row['column_name'] in sqlite_types]
+        dropped = sorted(set(sqlite_types) - set(columns))
+        if dropped:
+            print(f"[MIGRATE] {table}: not copying SQLite-only column(s) {', '.join(dropped)}")
+        if not key or not set(key) <= set(columns):
+            print(f"[MIGRATE] Skipping {table}: its primary key is not shared by both schemas")
+            continue
+        types = {row['column_name']: row['udt_name'] for row in pg_columns}
+        plans.append(TablePlan(
+            table=table, columns=columns, key=key, types=types,
+            epoch_columns=[i for i, column in enumerate(columns)
+                           if 'TIMESTAMP' in sqlite_types[column] and types[column] == 'int8']
+        ))
+    return plans
+
+
+async def source_rows(sqlite_db: aiosqlite.Connection, plan: TablePlan, batch_size: int) -> AsyncIterator[Row]:
+    """SQLite rows in key order, converted to PostgreSQL values; each batch is its own short read"""
+    key = ', '.join(plan.key)
+    last: Optional[Row] = None
+    while True:
+        after = f"WHERE ({key}) > ({', '.join('?' * len(plan.key))})" if last is not None else ''
+        rows = await sqlite_db.execute_fetchall(f'''
+            SELECT {', '.join(plan.columns)} FROM {plan.table} {after}
+            ORDER BY {key}
+            LIMIT ?
+        ''', (*(last or ()), batch_size))
+        for row in rows:
+            row = list(row)
+            for i in plan.epoch_columns:
+                row[i] = to_epoch(row[i])
+            yield tuple(row)
+        if len(rows) < batch_size:
+            return
+        last = plan.key_of(tuple(rows[-1]))
+
+
+async def target_rows(pg: asyncpg.Connection, plan: TablePlan, batch_size: int) -> AsyncIterator[Row]:
+    """PostgreSQL rows in the same order as SQLite's (byte order for text keys)"""
+    order = ', '.join(f'{column} COLLATE "C"' if plan.types[column] == 'text' else column for column in plan.key)
+    async with pg.transaction(isolation='repeatable_read', readonly=True):
+        async for row in pg.cursor(f"SELECT {', '.join(plan.columns)} FROM {plan.table} ORDER BY {order}",
+                                   prefetch=batch_size):
+            yield tuple(row)
+
+
+async def apply_changes(pg: asyncpg.Connection, plan: TablePlan, deletes: List[Row], inserts: List[Row]):
+    """Delete changed and removed keys, then COPY the new versions, in one transaction"""
+    async with pg.transaction():
+        if deletes:
+            casts = ', '.join(f'${i + 1}::{plan.types[column]}[]' for i, column in enumerate(plan.key))
+            await pg.execute(
+                f"DELETE FROM {plan.table} WHERE ({', '.join(plan.key)}) IN (SELECT * FROM unnest({casts}))",
+                *[[key[i] for key in deletes] for i in range(len(plan.key))]
+            )
+        if inserts:
+            await pg.copy_records_to_table(plan.table, records=inserts, columns=plan.columns)
+    deletes.clear()
+    inserts.clear()
+
+
+async def sync_table(sqlite_db: aiosqlite.Connection, reader: asyncpg.Connection, writer: asyncpg.Connection,
+                     plan: TablePlan, batch_size: int) -> PassResult:
+    """Merge the two key-ordered streams, fixing every difference in PostgreSQL"""
+    result = PassResult()
+    deletes: List[Row] = []
+    inserts: List[Row] = []
+    source = source_rows(sqlite_db, plan, batch_size)
+    target = target_rows(reader, plan, batch_size)
+    src = await anext(source, None)
+    dst = await anext(target, None)
+
+    while src is not None or dst is not None:
+        src_key = plan.key_of(src) if src is not None else None
+        dst_key = plan.key_of(dst) if dst is not None else None
+        if dst is None or (src is not None and src_key < dst_key):
+            inserts.append(src)
+            result.inserted += 1
+        elif src is None or src_key > dst_key:
+            deletes.append(dst_key)
+            result.deleted += 1
+        elif src != dst:
+            deletes.append(dst_key)
+            inserts.append(src)
+            result.updated += 1
+
+        if src is not None and (dst is None or src_key <= dst_key):
+            result.rows += 1
+            src = await anext(source, None)
+        if dst is not None and (src_key is None or dst_key <= src_key):
+            result.target_rows += 1
+            dst = await anext(target, None)
+
+        if len(inserts) + len(deletes) >= batch_size:
+            await apply_changes(writer, plan, deletes, inserts)
+
+    await apply_changes(writer, plan, deletes, inserts)
+    return result
+
+
+async def reset_sequences(pg: asyncpg.Connection):
+    """Continue serial ids after the highest copied id"""
+    for row in await pg.fetch('''
+        SELECT pg_get_serial_sequence(table_name, column_name) AS sequence, table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND pg_get_serial_sequence(table_name, column_name) IS NOT NULL
+    '''):
+        await pg.execute(f"SELECT setval('{row['sequence']}', COALESCE((SELECT MAX({row['column_name']}) "
+                         f"FROM {row['table_name']}), 0) + 1, false)")
+
+
+async def migrate(sqlite_path: str, dsn: str, passes: int, batch_size: int) -> bool:
+    """Copy and catch up until a pass finds no differences; returns whether the databases match"""
+    from database import Database
+    from database_pg import PostgreSQLDatabase
+
+    # Bring both schemas up to date the way the bot would on startup
+    source_db = Database(sqlite_path)
+    await source_db.init_db()
+    await source_db.close()
+    target_db = PostgreSQLDatabase()
+    target_db.db_url = dsn
+    target_db.replica_url = None
+    await target_db.init_db()
+    await target_db.close()
+
+    sqlite_db = await aiosqlite.connect(sqlite_path)
+    reader = await asyncpg.connect(dsn)
+    writer = await asyncpg.connect(dsn)
+    try:
+        plans = await build_plans(sqlite_db, reader)
+        for number in range(1, passes + 2):
+            label = 'copy' if number == 1 else f'catch-up {number - 1}'
+            started = time.perf_counter()
+            results = {}
+            for plan in plans:
+                table_started = time.perf_counter()
+                result = results[plan.table] = await sync_table(sqlite_db, reader, writer, plan, batch_size)
+                elapsed = time.perf_counter() - table_started
+                print(f"[MIGRATE] {label}: {plan.table} {result.rows} row(s), +{result.inserted} "
+                      f"~{result.updated} -{result.deleted} in {elapsed:.2f}s "
+                      f"({result.rows / elapsed if elapsed else 0:,.0f} rows/s)")
+            await reset_sequences(writer)
+            changes = sum(result.changes for result in results.values())
+            print(f"[MIGRATE] {label} finished in {time.perf_counter() - started:.2f}s, {changes} change(s)")
+
+            if changes == 0:
+                # The pass compared every row on both sides and nothing had to change
+                for table, result in results.items():
+                    print(f"[MIGRATE] verified {table}: {result.rows} row(s) identical in both databases")
+                return True
+        print("[MIGRATE] Rows are still changing; stop the bot and run the migration again to finish")
+        return False
+    finally:
+        await writer.close()
+        await reader.close()
+        await sqlite_db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the tier database from SQLite to PostgreSQL")
+    parser.add_argument('--sqlite', default=Config.DATABASE_PATH, help="SQLite database file")
+    parser.add_argument('--postgres', default=Config.DATABASE_URL, help="PostgreSQL URL (default: DATABASE_URL)")
+    parser.add_argument('--passes', type=int, default=SYNC_PASSES, help="Catch-up passes after the copy")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Rows per SQLite read and PostgreSQL write")
+    args = parser.parse_args()
+    if not args.postgres:
+        parser.error("--postgres or DATABASE_URL is required")
+    sys.exit(0 if asyncio.run(migrate(args.sqlite, args.postgres, args.passes, args.batch_size)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,53 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
 
-@dataclass
+from tiers import NO_TIER
+
+# Unix epoch seconds on both backends
+Timestamp = int
+
+_FIELD_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def _row_values(cls, row) -> dict:
+    """Pick the dataclass fields present in a database row (aiosqlite.Row or asyncpg.Record)"""
+    names = _FIELD_NAMES.get(cls)
+    if names is None:
+        names = _FIELD_NAMES[cls] = tuple(f.name for f in fields(cls))
+    keys = set(row.keys())
+    return {name: row[name] for name in names if name in keys}
+
+
+@dataclass(slots=True)
 class Player:
     discord_id: str
     game_id: str
     game_nickname: str
     current_clan: str
     page_info: str
-    tier: str = "None"
-    tier_assigned_at: Optional[datetime] = None
+    tier: str = NO_TIER
+    tier_rank: int = 0
+    tier_assigned_at: Optional[Timestamp] = None
     tier_assigned_by: Optional[str] = None
-    created_at: Optional[datetime] = None
-    updated_at: Optional[datetime] = None
+    created_at: Optional[Timestamp] = None
+    updated_at: Optional[Timestamp] = None
+    guild_id: str = ''
+
+    @property
+    def has_tier(self) -> bool:
+        return bool(self.tier) and self.tier != NO_TIER
 
-@dataclass
+    @classmethod
+    def from_row(cls, row) -> 'Player':
+        values = _row_values(cls, row)
+        values['tier'] = values.get('tier') or NO_TIER
+        return cls(**values)
+
+
+@dataclass(slots=True)
 class Application:
+    id: int
     discord_id: str
     game_id: str
     game_nickname: str
@@ -26,36 +57,45 @@ class Application:
     status: str = "pending"
     message_id: Optional[str] = None
     channel_id: Optional[str] = None
-    created_at: Optional[datetime] = None
-    processed_at: Optional[datetime] = None
+    created_at: Optional[Timestamp] = None
+    processed_at: Optional[Timestamp] = None
     processed_by: Optional[str] = None
+    guild_id: str = ''
+
+    @classmethod
+    def from_row(cls, row) -> 'Application':
+        return cls(**_row_values(cls, row))
 
-@dataclass
+
+@dataclass(slots=True)
 class TierAssignment:
+    id: int
     discord_id: str
-    old_tier: Optional[str]
-    new_tier: str
+    old_tier: Optional[str]  # None when the player had no tier
+    new_tier: str  # NO_TIER when the tier was removed
     assigned_by: str
-    assigned_at: Optional[datetime] = None
+    assigned_at: Optional[Timestamp] = None
     application_id: Optional[int] = None
+    guild_id: str = ''
+
+    @classmethod
+    def from_row(cls, row) -> 'TierAssignment':
+        values = _row_values(cls, row)
+        if values.get('old_tier') == NO_TIER:
+            values['old_tier'] = None
+        return cls(**values)
+
 
-# Tier hierarchy (T1 is highest, T5 is lowest)
-TIER_HIERARCHY = {
-    'T1': 1,
-    'T2': 2,
-    'T3': 3,
-    'T4': 4,
-    'T5': 5
-}
-
-TIER_EMOJIS = {
-    'T1': '🏆',
-    'T2': '🥈',
-    'T3': '🥉',
-    'T4': '🎖️',
-    'T5': '🏅'
-}
-
-def get_tier_emoji(tier: str) -> str:
-    """Get emoji for tier"""
-    return TIER_EMOJIS.get(tier, '❓')
+def to_epoch(value) -> Optional[int]:
+    """Convert a timestamp to unix time; also accepts CURRENT_TIMESTAMP text from older SQLite data"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(value)
+    except ValueError:
+        dt = datetime.fromisoformat(str(value))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)  # SQLite CURRENT_TIMESTAMP is UTC
+        return int(dt.timestamp())
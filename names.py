@@ -0,0 +1,100 @@
+import asyncio
+from typing import Dict, Iterable, Set
+
+import discord
+
+QUERY_MEMBERS_BATCH = 100  # Gateway limit for query_members(user_ids=...)
+
+
+class DisplayNameResolver:
+    """Resolves member display names without relying on the member cache"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._names: Dict[int, Dict[str, str]] = {}
+        self._pending: Dict[int, Set[str]] = {}
+        self._not_found: Dict[int, Set[str]] = {}  # Queried but not in the guild
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def resolve(self, guild: discord.Guild, discord_ids: Iterable[str]) -> Dict[str, str]:
+        """Get display names for users, fetching unknown ones in the background"""
+        names = self._names.setdefault(guild.id, {})
+        wanted = set(discord_ids)
+        result = {discord_id: names[discord_id] for discord_id in wanted if discord_id in names}
+
+        missing = wanted - result.keys()
+        if missing:
+            stored = await self.bot.db.get_member_names(str(guild.id), list(missing))
+            names.update(stored)
+            result.update(stored)
+            missing -= stored.keys()
+
+        # Members that happen to be cached cost nothing to resolve
+        found = {}
+        for discord_id in missing:
+            member = guild.get_member(int(discord_id))
+            if member:
+                found[discord_id] = member.display_name
+        if found:
+            await self.remember(guild.id, found)
+            result.update(found)
+            missing -= found.keys()
+
+        if missing:
+            self.schedule_fetch(guild, missing)
+
+        return result
+
+    async def remember(self, guild_id: int, names: Dict[str, str]):
+        """Store names in memory and in the database"""
+        self._names.setdefault(guild_id, {}).update(names)
+        await self.bot.db.save_member_names(str(guild_id), names)
+
+    async def update_member(self, member: discord.Member):
+        """Refresh a member's stored name (from on_member_update)"""
+        discord_id = str(member.id)
+        self._not_found.get(member.guild.id, set()).discard(discord_id)
+        known = self._names.get(member.guild.id, {}).get(discord_id)
+        if known != member.display_name:
+            await self.remember(member.guild.id, {discord_id: member.display_name})
+
+    def forget(self, guild_id: int, discord_ids: Iterable[str] = None):
+        """Drop remembered names so they are re-read from the database; all of a guild's if no ids are given"""
+        if discord_ids is None:
+            self._names.pop(guild_id, None)
+            return
+        names = self._names.get(guild_id, {})
+        for discord_id in discord_ids:
+            names.pop(discord_id, None)
+
+    def forget_all(self):
+        self._names.clear()
+
+    def schedule_fetch(self, guild: discord.Guild, discord_ids: Set[str]):
+        """Queue users for a background query_members lookup"""
+        if not self.bot.intents.members:
+            return
+
+        discord_ids = discord_ids - self._not_found.get(guild.id, set())
+        if not discord_ids:
+            return
+
+        self._pending.setdefault(guild.id, set()).update(discord_ids)
+        task = self._tasks.get(guild.id)
+        if task is None or task.done():
+            self._tasks[guild.id] = asyncio.create_task(self._fetch_pending(guild))
+
+    async def _fetch_pending(self, guild: discord.Guild):
+        pending = self._pending.get(guild.id)
+        while pending:
+            batch = [pending.pop() for _ in range(min(QUERY_MEMBERS_BATCH, len(pending)))]
+            try:
+                members = await guild.query_members(user_ids=[int(i) for i in batch], cache=False)
+            except (discord.HTTPException, asyncio.TimeoutError) as e:
+                print(f"Error fetching member names for guild {guild.id}: {e}")
+                return
+
+            found = {str(member.id): member.display_name for member in members}
+            self._not_found.setdefault(guild.id, set()).update(set(batch) - found.keys())
+            if found:
+                await self.remember(guild.id, found)
@@ -0,0 +1,53 @@
+import discord
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+# fetch_page(cursor) -> (rows, next_cursor); next_cursor is None on the last page
+FetchPage = Callable[[Optional[Any]], Awaitable[Tuple[List[Any], Optional[Any]]]]
+# render(rows, page_number) -> embed
+RenderPage = Callable[[List[Any], int], discord.Embed]
+
+
+class KeysetPaginator(discord.ui.View):
+    """Pages through keyset-paginated query results"""
+
+    def __init__(self, author_id: int, fetch_page: FetchPage, render: RenderPage, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.fetch_page = fetch_page
+        self.render = render
+        self.cursors = [None]  # cursor used to load each visited page
+        self.page = 0
+        self.next_cursor = None
+        self.rows = []
+
+    async def load(self) -> discord.Embed:
+        """Load the current page and refresh button state"""
+        self.rows, self.next_cursor = await self.fetch_page(self.cursors[self.page])
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.next_cursor is None
+        return self.render(self.rows, self.page + 1)
+
+    async def start(self, interaction: discord.Interaction, ephemeral: bool = True):
+        """Send the first page"""
+        embed = await self.load()
+        await interaction.response.send_message(embed=embed, view=self, ephemeral=ephemeral)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Это не ваш список!", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Назад", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        embed = await self.load()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Далее", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        del self.cursors[self.page + 1:]
+        self.cursors.append(self.next_cursor)
+        self.page += 1
+        embed = await self.load()
+        await interaction.response.edit_message(embed=embed, view=self)
@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Tuple
+
+import discord
+
+from config import Config
+
+
+@dataclass(frozen=True, slots=True)
+class GuildRoleSettings:
+    allowed_roles: FrozenSet[int]
+    admin_roles: FrozenSet[int]
+
+
+@dataclass(frozen=True, slots=True)
+class MemberPermissions:
+    can_use: bool
+    can_admin: bool
+    expires_at: float
+
+
+class PermissionEngine:
+    """Cached permission decisions per (guild, member)"""
+
+    def __init__(self, db, max_members: int = Config.PERMISSION_CACHE_SIZE,
+                 ttl: int = Config.PERMISSION_CACHE_TTL):
+        self.db = db
+        self.max_members = max_members
+        self.ttl = ttl
+        self._settings: Dict[int, GuildRoleSettings] = {}
+        self._decisions: "OrderedDict[Tuple[int, int], MemberPermissions]" = OrderedDict()
+
+    async def get_settings(self, guild_id: int) -> GuildRoleSettings:
+        """Get role settings for a guild"""
+        settings = self._settings.get(guild_id)
+        if settings is None:
+            allowed = await self.db.get_guild_allowed_roles(str(guild_id))
+            admin = await self.db.get_guild_admin_roles(str(guild_id))
+            settings = GuildRoleSettings(
+                allowed_roles=frozenset(int(role_id) for role_id in allowed if role_id),
+                admin_roles=frozenset(int(role_id) for role_id in admin if role_id)
+            )
+            self._settings[guild_id] = settings
+        return settings
+
+    async def check(self, member: discord.Member) -> MemberPermissions:
+        """Get (possibly cached) permissions for a guild member"""
+        key = (member.guild.id, member.id)
+        now = time.monotonic()
+
+        decision = self._decisions.get(key)
+        if decision is not None and decision.expires_at > now:
+            self._decisions.move_to_end(key)
+            return decision
+
+        settings = await self.get_settings(member.guild.id)
+        is_administrator = member.guild_permissions.administrator
+        role_ids = {role.id for role in member.roles}
+
+        decision = MemberPermissions(
+            # No allowed roles configured means everyone may use the bot
+            can_use=is_administrator or not settings.allowed_roles
+                    or not settings.allowed_roles.isdisjoint(role_ids),
+            # Without admin roles only administrators may assign tiers
+            can_admin=is_administrator or not settings.admin_roles.isdisjoint(role_ids),
+            expires_at=now + self.ttl
+        )
+
+        self._decisions[key] = decision
+        if len(self._decisions) > self.max_members:
+            self._decisions.popitem(last=False)
+        return decision
+
+    async def can_use(self, member: discord.Member) -> bool:
+        """Check if member may use the bot"""
+        return (await self.check(member)).can_use
+
+    async def can_admin(self, member: discord.Member) -> bool:
+        """Check if member may assign tiers"""
+        return (await self.check(member)).can_admin
+
+    def invalidate_member(self, guild_id: int, member_id: int):
+        """Forget the decision for one member (roles changed)"""
+        self._decisions.pop((guild_id, member_id), None)
+
+    def invalidate_guild(self, guild_id: int):
+        """Forget settings and all decisions for a guild (settings or roles changed)"""
+        self._settings.pop(guild_id, None)
+        for key in [key for key in self._decisions if key[0] == guild_id]:
+            del self._decisions[key]
+
+    def invalidate_all(self):
+        """Forget everything (invalidation messages may have been missed)"""
+        self._settings.clear()
+        self._decisions.clear()
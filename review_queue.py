@@ -0,0 +1,115 @@
+import discord
+from typing import List, Optional
+
+from models import Application
+from pagination import FetchPage, KeysetPaginator, RenderPage
+from tiers import TierCatalog
+from views import finish_processing, process_application, update_application_message
+
+REVIEW_PAGE_SIZE = 5
+
+
+class ReviewQueueView(KeysetPaginator):
+    """Paged list of pending applications that moderators can approve or reject in place"""
+
+    def __init__(self, author_id: int, guild: discord.Guild, catalog: TierCatalog,
+                 fetch_page: FetchPage, render: RenderPage):
+        super().__init__(author_id, fetch_page, render)
+        self.guild = guild
+        self.catalog = catalog
+        self.selected: Optional[Application] = None
+
+        self.application_select = discord.ui.Select(placeholder="Выберите заявку", row=1,
+                                                    options=[discord.SelectOption(label="—")])
+        self.application_select.callback = self.select_application
+        self.tier_select = discord.ui.Select(
+            placeholder="Одобрить с тиром…", row=2,
+            options=[discord.SelectOption(label=tier.name, value=tier.name, emoji=tier.emoji)
+                     for tier in catalog][:25]
+        )
+        self.tier_select.callback = self.approve
+        self.reject_button = discord.ui.Button(label="Отклонить", style=discord.ButtonStyle.danger,
+                                               emoji="❌", row=3)
+        self.reject_button.callback = self.reject
+
+        self.add_item(self.application_select)
+        self.add_item(self.tier_select)
+        self.add_item(self.reject_button)
+
+    async def load(self) -> discord.Embed:
+        embed = await super().load()
+        self.selected = None
+        self.application_select.options = self.application_options(self.rows)
+        self.application_select.disabled = not self.rows
+        self.tier_select.disabled = True
+        self.reject_button.disabled = True
+        return embed
+
+    @staticmethod
+    def application_options(rows: List[Application]) -> List[discord.SelectOption]:
+        if not rows:
+            return [discord.SelectOption(label="Нет заявок")]
+        return [
+            discord.SelectOption(
+                label=f"#{app.id} {app.game_nickname}"[:100],
+                description=f"{app.desired_tier} • {app.current_clan or 'Без клана'}"[:100],
+                value=str(app.id)
+            )
+            for app in rows
+        ]
+
+    async def select_application(self, interaction: discord.Interaction):
+        app_id = int(self.application_select.values[0])
+        self.selected = next((app for app in self.rows if app.id == app_id), None)
+        self.tier_select.disabled = self.reject_button.disabled = self.selected is None
+        content = None
+        if self.selected:
+            content = (f"Выбрана заявка **#{self.selected.id}** ({self.selected.game_nickname}), "
+                       f"желаемый тир: **{self.selected.desired_tier}**")
+        await interaction.response.edit_message(content=content, view=self)
+
+    async def approve(self, interaction: discord.Interaction):
+        await self.process(interaction, self.tier_select.values[0])
+
+    async def reject(self, interaction: discord.Interaction):
+        await self.process(interaction, None)
+
+    async def process(self, interaction: discord.Interaction, tier: Optional[str]):
+        """Approve or reject the selected application and reload the current page"""
+        bot = interaction.client
+
+        if not await bot.permissions.can_admin(interaction.user):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для обработки заявок!",
+                ephemeral=True
+            )
+            return
+
+        if not self.selected:
+            await interaction.response.send_message("❌ Сначала выберите заявку!", ephemeral=True)
+            return
+
+        try:
+            app, error = await process_application(bot, self.guild, interaction.user, self.selected.id, tier)
+            if error:
+                content = error
+            elif tier is not None:
+                content = f"✅ Заявка #{app.id} одобрена: тир **{tier}** {self.catalog.emoji(tier)}"
+            else:
+                content = f"❌ Заявка #{app.id} отклонена"
+
+            # The processed application drops out of the page
+            embed = await self.load()
+            await interaction.response.edit_message(content=content, embed=embed, view=self)
+
+            if app:
+                await update_application_message(bot, app, self.catalog, tier, interaction.user)
+                await finish_processing(bot, self.guild, app, tier)
+
+        except Exception as e:
+            print(f"Error processing application from review queue: {e}")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(
+                    "❌ Произошла ошибка при обработке заявки.",
+                    ephemeral=True
+                )
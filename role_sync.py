@@ -0,0 +1,184 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import discord
+from discord.ext import commands, tasks
+
+from config import Config
+
+QUERY_MEMBERS_BATCH = 100  # Gateway limit for query_members(user_ids=...)
+
+
+class RoleReconciler(commands.Cog):
+    """Keeps members' tier roles in line with their stored tiers"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._pending: Dict[int, Dict[int, Optional[discord.Member]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._reconciles: Dict[int, asyncio.Task] = {}
+        self._retired: Dict[int, Set[int]] = {}  # Roles unmapped from a tier, stripped by the next reconcile
+        self.full_reconcile.change_interval(hours=Config.ROLE_RECONCILE_HOURS or 24)
+
+    async def cog_load(self):
+        if Config.ROLE_RECONCILE_HOURS > 0:
+            self.full_reconcile.start()
+
+    async def cog_unload(self):
+        self.full_reconcile.cancel()
+        for task in [*self._workers.values(), *self._reconciles.values()]:
+            task.cancel()
+
+    def tier_roles(self, guild_id: int) -> Dict[str, int]:
+        """Tier name -> Discord role id for tiers that have a role"""
+        return {tier.name: tier.role_id for tier in self.bot.tiers.get(guild_id) if tier.role_id}
+
+    def managed_roles(self, guild_id: int) -> Set[int]:
+        """Roles the reconciler may add or remove"""
+        return set(self.tier_roles(guild_id).values()) | self._retired.get(guild_id, set())
+
+    def schedule(self, guild_id: int, member_id: int, member: discord.Member = None):
+        """Queue a member for a role update; edits are applied in batches per guild"""
+        if not self.managed_roles(guild_id):
+            return
+
+        pending = self._pending.setdefault(guild_id, {})
+        pending[member_id] = member or pending.get(member_id)
+        worker = self._workers.get(guild_id)
+        if worker is None or worker.done():
+            self._workers[guild_id] = asyncio.create_task(self._drain(guild_id))
+
+    async def _drain(self, guild_id: int):
+        # Let changes made in quick succession land in the same batch
+        await asyncio.sleep(Config.ROLE_SYNC_DELAY)
+
+        pending = self._pending.get(guild_id)
+        while pending:
+            batch = {}
+            for member_id in list(pending)[:QUERY_MEMBERS_BATCH]:
+                batch[member_id] = pending.pop(member_id)
+
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                pending.clear()
+                break
+
+            try:
+                await self.apply_batch(guild, batch)
+            except Exception as e:
+                print(f"[ROLES] Batch for guild {guild_id} failed: {e}")
+
+        reconcile = self._reconciles.get(guild_id)
+        if reconcile is None or reconcile.done():
+            self._retired.pop(guild_id, None)
+
+    async def apply_batch(self, guild: discord.Guild, members: Dict[int, Optional[discord.Member]]) -> int:
+        """Bring a batch of members' tier roles in line with the database"""
+        tier_roles = self.tier_roles(guild.id)
+        managed = self.managed_roles(guild.id)
+        if not managed:
+            return 0
+
+        tiers = await self.bot.db.get_player_tiers(str(guild.id), [str(member_id) for member_id in members])
+
+        # Members that are neither passed in nor cached are looked up in one gateway request
+        missing = [member_id for member_id, member in members.items()
+                   if member is None and guild.get_member(member_id) is None]
+        fetched = {}
+        if missing and self.bot.intents.members:
+            try:
+                for member in await guild.query_members(user_ids=missing, cache=False):
+                    fetched[member.id] = member
+            except (discord.HTTPException, asyncio.TimeoutError) as e:
+                print(f"[ROLES] Could not fetch members for guild {guild.id}: {e}")
+
+        edited = 0
+        for member_id, member in members.items():
+            member = member or guild.get_member(member_id) or fetched.get(member_id)
+            if member is None:
+                continue  # Left the guild
+
+            changes = self.role_changes(member, managed, tier_roles.get(tiers.get(str(member_id))))
+            if changes is None:
+                continue
+
+            # Only the tier roles that differ are touched, so roles granted elsewhere since the member
+            # snapshot was taken are never overwritten
+            add, remove = changes
+            try:
+                if remove:
+                    await member.remove_roles(*remove, reason="Синхронизация ролей тиров")
+                if add:
+                    await member.add_roles(*add, reason="Синхронизация ролей тиров")
+                edited += 1
+            except discord.Forbidden:
+                print(f"[ROLES] Missing permissions to edit roles of {member_id} in guild {guild.id}")
+            except discord.HTTPException as e:
+                print(f"[ROLES] Could not edit roles of {member_id} in guild {guild.id}: {e}")
+
+            # Stay well under the per-guild member edit rate limit
+            await asyncio.sleep(Config.ROLE_SYNC_EDIT_INTERVAL)
+
+        return edited
+
+    @staticmethod
+    def role_changes(member: discord.Member, managed: Set[int],
+                     wanted_id: Optional[int]) -> Optional[Tuple[List[discord.Object], List[discord.Object]]]:
+        """Tier roles to (add, remove) for a member, or None if its tier roles are already right"""
+        current = {role.id for role in member.roles} & managed
+        wanted = {wanted_id} if wanted_id and member.guild.get_role(wanted_id) else set()
+        if current == wanted:
+            return None
+        return ([discord.Object(id=role_id) for role_id in wanted - current],
+                [discord.Object(id=role_id) for role_id in current - wanted])
+
+    async def _iter_members(self, guild: discord.Guild) -> AsyncIterator[discord.Member]:
+        if guild.chunked:
+            for member in guild.members:
+                yield member
+        else:
+            # No member cache (lean profile): page through the member list over HTTP
+            async for member in guild.fetch_members(limit=None):
+                yield member
+
+    async def reconcile_guild(self, guild: discord.Guild) -> int:
+        """Compare stored tiers with actual member roles and queue only the members that differ"""
+        tier_roles = self.tier_roles(guild.id)
+        managed = self.managed_roles(guild.id)
+        if not managed:
+            return 0
+
+        tiers = await self.bot.db.get_guild_player_tiers(str(guild.id))
+        queued = 0
+        async for member in self._iter_members(guild):
+            wanted = tier_roles.get(tiers.get(str(member.id)))
+            if self.role_changes(member, managed, wanted) is not None:
+                self.schedule(guild.id, member.id, member)
+                queued += 1
+        return queued
+
+    def request_reconcile(self, guild: discord.Guild, retired_role_id: int = None):
+        """Run a full reconcile for a guild in the background (e.g. after tier roles changed)"""
+        if retired_role_id:
+            self._retired.setdefault(guild.id, set()).add(retired_role_id)
+        task = self._reconciles.get(guild.id)
+        if task is None or task.done():
+            self._reconciles[guild.id] = asyncio.create_task(self._reconcile_logged(guild))
+
+    async def _reconcile_logged(self, guild: discord.Guild):
+        try:
+            queued = await self.reconcile_guild(guild)
+            if queued:
+                print(f"[ROLES] Queued {queued} role update(s) for guild {guild.id}")
+        except (discord.HTTPException, asyncio.TimeoutError) as e:
+            print(f"[ROLES] Reconcile for guild {guild.id} failed: {e}")
+
+    @tasks.loop(hours=24)
+    async def full_reconcile(self):
+        for guild in self.bot.guilds:
+            if self.tier_roles(guild.id):
+                await self._reconcile_logged(guild)
+
+    @full_reconcile.before_loop
+    async def before_full_reconcile(self):
+        await self.bot.wait_until_ready()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Online database snapshots
+Copies the live database without stopping the bot (SQLite backup API in page
+steps on a worker thread, PostgreSQL COPY in one repeatable-read transaction),
+gzip-compresses it and keeps the newest SNAPSHOT_KEEP files.
+
+    python3 snapshots.py --dir snapshots --keep 7
+
+The bot takes one every SNAPSHOT_INTERVAL_HOURS when that is set.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from discord.ext import commands, tasks
+
+from config import Config
+from locks import LockTimeout
+from metrics import METRICS
+
+SNAPSHOT_PREFIX = 'tier_bot-'
+
+
+def list_snapshots(directory: str, suffix: str) -> List[str]:
+    """Snapshot file names in directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if name.startswith(SNAPSHOT_PREFIX) and name.endswith(suffix))
+
+
+def prune_snapshots(directory: str, suffix: str, keep: int) -> List[str]:
+    """Delete all but the newest keep snapshots; returns the deleted names"""
+    names = list_snapshots(directory, suffix)
+    removed = names[:-keep] if keep > 0 else []
+    for name in removed:
+        os.remove(os.path.join(directory, name))
+    return removed
+
+
+async def take_snapshot(db, directory: str = None, keep: int = None) -> dict:
+    """Snapshot the database into directory and apply retention
+
+    Only one process snapshots a shared database at a time; raises LockTimeout when another is busy.
+    """
+    directory = directory or Config.SNAPSHOT_DIR
+    keep = Config.SNAPSHOT_KEEP if keep is None else keep
+    os.makedirs(directory, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{datetime.now(timezone.utc):%Y%m%d-%H%M%S}{db.SNAPSHOT_SUFFIX}"
+    path = os.path.join(directory, name)
+
+    async with db.lease('snapshot', 'database', timeout=0, ttl=Config.SNAPSHOT_LEASE_SECONDS):
+        started = time.perf_counter()
+        size = await db.snapshot(path)
+        elapsed = time.perf_counter() - started
+    removed = await asyncio.to_thread(prune_snapshots, directory, db.SNAPSHOT_SUFFIX, keep)
+
+    result = {
+        'path': path,
+        'bytes': size,
+        'compressed_bytes': os.path.getsize(path),
+        'seconds': round(elapsed, 3),
+        'mb_per_second': round(size / 2**20 / elapsed, 2) if elapsed else 0.0,
+        'pruned': removed
+    }
+    METRICS.observe('snapshot.duration', elapsed)
+    METRICS.set_gauge('snapshot.last_bytes', result['compressed_bytes'])
+    METRICS.set_gauge('snapshot.mb_per_second', result['mb_per_second'])
+    print(f"[SNAPSHOT] Wrote {path}: {size / 2**20:.2f} MB ({result['compressed_bytes'] / 2**20:.2f} MB compressed) "
+          f"in {elapsed:.2f}s, {result['mb_per_second']} MB/s; pruned {len(removed)} old snapshot(s)")
+    return result
+
+
+class SnapshotScheduler(commands.Cog):
+    """Takes a snapshot every SNAPSHOT_INTERVAL_HOURS"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.snapshot.change_interval(hours=Config.SNAPSHOT_INTERVAL_HOURS)
+
+    async def cog_load(self):
+        self.snapshot.start()
+
+    async def cog_unload(self):
+        self.snapshot.cancel()
+
+    @tasks.loop(hours=24)
+    async def snapshot(self):
+        try:
+            await take_snapshot(self.bot.db)
+        except LockTimeout:
+            print("[SNAPSHOT] Another process is taking a snapshot, skipping")
+        except Exception as e:
+            print(f"[SNAPSHOT] Snapshot failed: {e}")
+
+    @snapshot.before_loop
+    async def before_snapshot(self):
+        await self.bot.wait_until_ready()
+
+
+async def run(args):
+    from main import create_database
+
+    db = create_database()
+    await db.init_db()
+    try:
+        await take_snapshot(db, args.dir, args.keep)
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Take an online snapshot of the tier database")
+    parser.add_argument('--dir', default=Config.SNAPSHOT_DIR, help="Directory for snapshot files")
+    parser.add_argument('--keep', type=int, default=Config.SNAPSHOT_KEEP, help="Snapshots to keep (0 keeps all)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Collects phase timings during bot startup"""
+    
+    def __init__(self, enabled: bool = False, started_at: float = None):
+        self.enabled = enabled
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.phases = []
+        self._reported = False
+    
+    def record(self, name: str, duration: float):
+        """Record a finished phase"""
+        if self.enabled:
+            self.phases.append((name, duration))
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of startup work"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+    
+    def report(self):
+        """Print collected timings once"""
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        
+        total = time.perf_counter() - self.started_at
+        print("[PROFILE] Startup timings:")
+        for name, duration in self.phases:
+            print(f"[PROFILE]   {name:<16} {duration * 1000:9.1f} ms")
+        print(f"[PROFILE]   {'total':<16} {total * 1000:9.1f} ms")
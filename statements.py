@@ -0,0 +1,29 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from metrics import METRICS
+
+
+class StatementRegistry:
+    """Named statements for the hottest lookups
+
+    Each statement is always sent with the same SQL text, so the driver's per-connection statement
+    cache (asyncpg's LRU, sqlite3's cached_statements) prepares it once per connection and reuses it.
+    Every execution is timed into the metrics registry as db.statement.<name>, so /metrics shows
+    per-statement counts and latencies.
+    """
+
+    def __init__(self, statements: Dict[str, str]):
+        self.statements = statements
+
+    def __getitem__(self, name: str) -> str:
+        return self.statements[name]
+
+    @contextmanager
+    def timed(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            METRICS.observe(f'db.statement.{name}', time.perf_counter() - started)
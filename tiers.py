@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from config import Config
+
+NO_TIER = 'None'  # Stored tier name for players without a tier
+MAX_TIERS = 24  # Assignment view: 25 buttons per message, one is "reject"
+
+
+@dataclass(frozen=True, slots=True)
+class TierDefinition:
+    name: str
+    rank: int  # 1 is the highest tier
+    color: int
+    emoji: str
+    role_id: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row) -> 'TierDefinition':
+        return cls(
+            name=row['name'],
+            rank=row['rank'],
+            color=row['color'],
+            emoji=row['emoji'],
+            role_id=int(row['role_id']) if row['role_id'] else None
+        )
+
+    def to_row(self) -> dict:
+        return {
+            'name': self.name,
+            'rank': self.rank,
+            'color': self.color,
+            'emoji': self.emoji,
+            'role_id': str(self.role_id) if self.role_id else None
+        }
+
+
+class TierCatalog:
+    """Immutable, rank-ordered set of tiers for one guild"""
+
+    __slots__ = ('tiers', '_by_name')
+
+    def __init__(self, tiers: Iterable[TierDefinition]):
+        self.tiers: Tuple[TierDefinition, ...] = tuple(sorted(tiers, key=lambda tier: tier.rank))
+        self._by_name = MappingProxyType({tier.name.upper(): tier for tier in self.tiers})
+
+    def __iter__(self) -> Iterator[TierDefinition]:
+        return iter(self.tiers)
+
+    def __len__(self) -> int:
+        return len(self.tiers)
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and name.upper() in self._by_name
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(tier.name for tier in self.tiers)
+
+    def get(self, name: Optional[str]) -> Optional[TierDefinition]:
+        """Look up a tier by name (case-insensitive)"""
+        return self._by_name.get(name.upper()) if name else None
+
+    def rank(self, name: Optional[str]) -> int:
+        """Sort rank for a tier name, 0 if it is not in the catalog"""
+        tier = self.get(name)
+        return tier.rank if tier else 0
+
+    def color(self, name: Optional[str]) -> int:
+        tier = self.get(name)
+        return tier.color if tier else Config.COLOR_INFO
+
+    def emoji(self, name: Optional[str]) -> str:
+        tier = self.get(name)
+        return tier.emoji if tier else '❓'
+
+    def with_tier(self, tier: TierDefinition) -> 'TierCatalog':
+        """Copy of the catalog with a tier added or replaced"""
+        return TierCatalog([t for t in self.tiers if t.name.upper() != tier.name.upper()] + [tier])
+
+    def without_tier(self, name: str) -> 'TierCatalog':
+        """Copy of the catalog without the named tier"""
+        return TierCatalog(t for t in self.tiers if t.name.upper() != name.upper())
+
+
+DEFAULT_CATALOG = TierCatalog([
+    TierDefinition('T1', 1, 0xffd700, '🏆'),  # Gold
+    TierDefinition('T2', 2, 0xc0c0c0, '🥈'),  # Silver
+    TierDefinition('T3', 3, 0xcd7f32, '🥉'),  # Bronze
+    TierDefinition('T4', 4, 0x4169e1, '🎖️'),  # Royal Blue
+    TierDefinition('T5', 5, 0x32cd32, '🏅'),  # Lime Green
+])
+
+
+class TierRegistry:
+    """Per-guild tier catalogs, loaded once and swapped wholesale on change"""
+
+    def __init__(self, db):
+        self.db = db
+        self._catalogs: Dict[str, TierCatalog] = {}
+
+    async def load(self):
+        """Load every customized catalog from the database"""
+        grouped: Dict[str, list] = {}
+        for row in await self.db.get_tier_catalogs():
+            grouped.setdefault(row['guild_id'], []).append(TierDefinition.from_row(row))
+        self._catalogs = {guild_id: TierCatalog(tiers) for guild_id, tiers in grouped.items()}
+
+    async def reload(self, guild_id):
+        """Re-read one guild's catalog (changed by another bot process)"""
+        tiers = [TierDefinition.from_row(row) for row in await self.db.get_guild_tier_catalog(str(guild_id))]
+        if tiers:
+            self._catalogs[str(guild_id)] = TierCatalog(tiers)
+        else:
+            self._catalogs.pop(str(guild_id), None)
+
+    def get(self, guild_id) -> TierCatalog:
+        """Catalog for a guild; guilds that never customized tiers share the default"""
+        return self._catalogs.get(str(guild_id), DEFAULT_CATALOG)
+
+    async def save(self, guild_id, catalog: TierCatalog):
+        """Store a guild's catalog and re-rank its players"""
+        await self.db.save_guild_tier_catalog(str(guild_id), [tier.to_row() for tier in catalog])
+        self._catalogs[str(guild_id)] = catalog
+
+
+def parse_color(value: str) -> Optional[int]:
+    """Parse a hex color such as '#ffd700' or 'ffd700'"""
+    try:
+        color = int(value.strip().lstrip('#'), 16)
+    except ValueError:
+        return None
+    return color if 0 <= color <= 0xffffff else None
+
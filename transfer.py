@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Streaming export and import of a guild's players, applications and tier log
+CSV or JSON lines (chosen by file extension or --format), one row at a time on
+both sides, so memory stays flat however many rows there are.
+
+    python3 transfer.py export --guild <ID> --table players --file players.csv
+    python3 transfer.py import --guild <ID> --table players --file players.csv
+
+Timestamps are unix epochs. Tier names are checked against the target guild's
+catalog; rows with unknown tiers or missing fields are skipped and reported.
+Imported applications and log entries get new ids, and are not linked to each
+other or to application messages.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from models import to_epoch
+from tiers import NO_TIER, TierCatalog, TierRegistry
+
+TEXT, EPOCH = 'text', 'epoch'
+FORMATS = ('csv', 'jsonl')
+PROGRESS_EVERY = 100000  # Rows between progress lines
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    key: str  # Export order
+    columns: Dict[str, str]  # Column -> TEXT or EPOCH
+    required: Tuple[str, ...]
+    tier_column: str  # Must name a tier of the guild's catalog (or NO_TIER)
+
+
+TABLES = {
+    'players': TableSpec(
+        key='discord_id',
+        columns={'discord_id': TEXT, 'game_id': TEXT, 'game_nickname': TEXT, 'current_clan': TEXT,
+                 'page_info': TEXT, 'tier': TEXT, 'tier_assigned_at': EPOCH, 'tier_assigned_by': TEXT,
+                 'created_at': EPOCH, 'updated_at': EPOCH},
+        required=('discord_id', 'game_id', 'game_nickname', 'tier'),
+        tier_column='tier'
+    ),
+    'applications': TableSpec(
+        key='id',
+        columns={'discord_id': TEXT, 'game_id': TEXT, 'game_nickname': TEXT, 'current_clan': TEXT,
+                 'page_info': TEXT, 'desired_tier': TEXT, 'status': TEXT, 'created_at': EPOCH,
+                 'processed_at': EPOCH, 'processed_by': TEXT},
+        required=('discord_id', 'game_id', 'game_nickname', 'desired_tier'),
+        tier_column='desired_tier'
+    ),
+    'tier_assignments': TableSpec(
+        key='id',
+        columns={'discord_id': TEXT, 'old_tier': TEXT, 'new_tier': TEXT, 'assigned_by': TEXT,
+                 'assigned_at': EPOCH},
+        required=('discord_id', 'new_tier', 'assigned_by'),
+        tier_column='new_tier'
+    ),
+}
+
+
+class Progress:
+    """Row counter that prints rows/second to stderr"""
+
+    def __init__(self, action: str, table: str):
+        self.action = action
+        self.table = table
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, rows: int = 1):
+        before = self.rows
+        self.rows += rows
+        if self.rows // PROGRESS_EVERY > before // PROGRESS_EVERY:
+            self.report(final=False)
+
+    def report(self, final: bool = True, extra: str = ''):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        print(f"[TRANSFER] {self.action} {self.rows} {self.table} row(s) in {elapsed:.2f}s "
+              f"({rate:,.0f} rows/s){extra}{'' if final else ' …'}", file=sys.stderr)
+
+
+def normalize(spec: TableSpec, raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Typed row with exactly the spec's columns; empty CSV cells become None"""
+    row = {}
+    for column, kind in spec.columns.items():
+        value = raw.get(column)
+        if value == '':
+            value = None
+        if value is not None:
+            value = to_epoch(value) if kind == EPOCH else str(value)
+        row[column] = value
+    return row
+
+
+def validate(spec: TableSpec, row: Dict[str, Any], catalog: TierCatalog) -> Optional[str]:
+    """Error message for a row that cannot be imported; tier names are normalized in place"""
+    missing = [column for column in spec.required if not row[column]]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    tier_name = row[spec.tier_column]
+    if tier_name != NO_TIER:
+        tier = catalog.get(tier_name)
+        if tier is None:
+            return f"unknown tier {tier_name!r}"
+        row[spec.tier_column] = tier.name
+    return None
+
+
+def read_rows(path: str, fmt: str) -> Iterator[Dict[str, Any]]:
+    with (sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', newline='')) as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+async def export_table(db, guild_id: str, table: str, path: str, fmt: str, batch_size: int) -> int:
+    spec = TABLES[table]
+    progress = Progress('Exported', table)
+    with (sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')) as f:
+        writer = csv.DictWriter(f, fieldnames=list(spec.columns)) if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+        async for row in db.iter_guild_rows(table, guild_id, list(spec.columns), spec.key, batch_size):
+            row = normalize(spec, row)
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            progress.add()
+    progress.report()
+    return progress.rows
+
+
+async def import_table(db, guild_id: str, table: str, path: str, fmt: str, batch_size: int,
+                       catalog: TierCatalog) -> int:
+    spec = TABLES[table]
+    insert = getattr(db, f'import_{table}')
+    progress = Progress('Imported', table)
+    written = rejected = 0
+    batch = []
+
+    async def flush():
+        nonlocal written
+        written += await insert(guild_id, batch)
+        progress.add(len(batch))
+        batch.clear()
+
+    for line, raw in enumerate(read_rows(path, fmt), start=1):
+        row = normalize(spec, raw)
+        error = validate(spec, row, catalog)
+        if error:
+            rejected += 1
+            if rejected <= MAX_REPORTED_ERRORS:
+                print(f"[TRANSFER] Skipping row {line}: {error}", file=sys.stderr)
+            continue
+        if table == 'players':
+            row['tier_rank'] = catalog.rank(row['tier'])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    if table == 'players':
+        await db.rebuild_tier_counters()
+    progress.report(extra=f", {written} written, {rejected} skipped")
+    return written
+
+
+async def run(args):
+    from main import create_database
+
+    fmt = args.format or ('csv' if args.file.endswith('.csv') else 'jsonl')
+    db = create_database()
+    await db.init_db()
+    try:
+        if args.command == 'export':
+            await export_table(db, str(args.guild), args.table, args.file, fmt, args.batch_size)
+        else:
+            registry = TierRegistry(db)
+            await registry.load()
+            await import_table(db, str(args.guild), args.table, args.file, fmt, args.batch_size,
+                               registry.get(args.guild))
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a guild's tier data as CSV or JSON lines")
+    parser.add_argument('command', choices=('export', 'import'))
+    parser.add_argument('--guild', type=int, required=True, help="Guild ID")
+    parser.add_argument('--table', choices=TABLES, required=True)
+    parser.add_argument('--file', default='-', help="File to write or read ('-' for stdout/stdin)")
+    parser.add_argument('--format', choices=FORMATS, help="Default: from the file extension, else jsonl")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Rows per database round trip")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
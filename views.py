@@ -1,46 +1,207 @@
 import discord
-from discord.ext import commands
-from typing import Optional
-from models import get_tier_emoji
 from config import Config
+from metrics import METRICS
+from models import Application, to_epoch
+from tiers import TierCatalog
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import asyncio
+import re
+import weakref
+
+# One submission at a time per user; entries vanish once no submission holds the lock
+_submission_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def submission_lock(user_id: int) -> asyncio.Lock:
+    """Get the in-process application submission lock for a user"""
+    lock = _submission_locks.get(user_id)
+    if lock is None:
+        lock = _submission_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+async def resolve_user(bot, user_id: int) -> Optional[discord.User]:
+    """Cached user, or fetched over HTTP when it is not cached (always the case in the lean profile)"""
+    user = bot.get_user(user_id)
+    if user is None:
+        METRICS.inc('users.fetched')
+        try:
+            user = await bot.fetch_user(user_id)
+        except discord.HTTPException:
+            return None
+    return user
+
+
+def application_embed(app: Application, emoji: str, avatar_url: str = None) -> discord.Embed:
+    """Moderator message embed for an application, built from its stored row"""
+    created_at = to_epoch(app.created_at)
+    embed = discord.Embed(
+        title="📋 Новая заявка на тир",
+        description=f"Заявка #{app.id}",
+        color=Config.COLOR_WARNING,
+        timestamp=datetime.fromtimestamp(created_at, tz=timezone.utc) if created_at else discord.utils.utcnow()
+    )
+    
+    embed.add_field(name="👤 Пользователь", value=f"<@{app.discord_id}>", inline=True)
+    embed.add_field(name="🎮 ID в игре", value=app.game_id, inline=True)
+    embed.add_field(name="📝 Никнейм", value=app.game_nickname, inline=True)
+    embed.add_field(name="🏰 Клан", value=app.current_clan or "Не указан", inline=True)
+    embed.add_field(name="🔗 Информация", value=app.page_info or "Не указана", inline=True)
+    embed.add_field(name="🎯 Желаемый тир", value=f"{app.desired_tier} {emoji}", inline=True)
+    
+    embed.set_footer(text=f"ID заявки: {app.id}")
+    if avatar_url:
+        embed.set_thumbnail(url=avatar_url)
+    return embed
+
+
+def mark_processed(embed: discord.Embed, app_id: int, tier: Optional[str], emoji: str,
+                   moderator: discord.abc.User) -> discord.Embed:
+    """Restyle an application embed as approved (with a tier) or rejected (tier is None)"""
+    if tier is not None:
+        embed.color = Config.COLOR_SUCCESS
+        embed.title = f"✅ Заявка #{app_id} одобрена"
+        embed.add_field(
+            name="📈 Присвоен тир",
+            value=f"{tier} {emoji}",
+            inline=True
+        )
+    else:
+        embed.color = Config.COLOR_ERROR
+        embed.title = f"❌ Заявка #{app_id} отклонена"
+    embed.add_field(
+        name="👤 Обработано",
+        value=moderator.mention,
+        inline=True
+    )
+    return embed
+
+
+async def process_application(bot, guild: discord.Guild, moderator: discord.abc.User, app_id: int,
+                              tier: Optional[str]) -> Tuple[Optional[Application], Optional[str]]:
+    """Approve a pending application with a tier, or reject it when tier is None
+    
+    Returns (application, None), or (None, error message) if it cannot be processed.
+    """
+    # The catalog may have changed since the application was posted
+    if tier is not None and tier not in bot.tiers.get(guild.id):
+        return None, f"❌ Тир {tier} больше не существует!"
+    
+    app = await bot.db.get_application(app_id)
+    if not app:
+        return None, "❌ Заявка не найдена!"
+    # A button and /review_queue can race for the same application: only one claim succeeds, and an
+    # approval claims and assigns the tier in one transaction, so a failed assignment leaves it pending
+    if app.status != 'pending':
+        return None, "❌ Заявка уже обработана!"
+    if tier is not None:
+        claimed = await bot.db.approve_application(
+            app_id=app_id,
+            tier=tier,
+            processed_by=str(moderator.id),
+            guild_id=str(guild.id)
+        )
+    else:
+        claimed = await bot.db.update_application_status(
+            app_id=app_id,
+            status='rejected',
+            processed_by=str(moderator.id)
+        )
+    if not claimed:
+        return None, "❌ Заявка уже обработана!"
+    
+    if tier is not None:
+        bot.role_sync.schedule(guild.id, int(app.discord_id))
+    return app, None
+
+
+async def finish_processing(bot, guild: discord.Guild, app: Application, tier: Optional[str]):
+    """Work that can wait until the moderator got a response: tier list update, DM"""
+    if tier is not None:
+        try:
+            tier_commands = bot.get_cog('TierCommands')
+            if tier_commands:
+                await tier_commands.update_tierlist(str(guild.id))
+        except Exception as e:
+            print(f"Error updating tierlist: {e}")
+    
+    try:
+        user = await resolve_user(bot, int(app.discord_id))
+        if user:
+            if tier is not None:
+                emoji = bot.tiers.get(guild.id).emoji(tier)
+                await user.send(
+                    f"🎉 Ваша заявка на тир одобрена! Вам присвоен тир **{tier}** {emoji}\n\n"
+                    f"Теперь вы можете подать новую заявку для изменения тира, если потребуется."
+                )
+            else:
+                await user.send(
+                    f"❌ Ваша заявка на тир #{app.id} была отклонена администратором.\n\n"
+                    f"Вы можете подать новую заявку с исправленными данными."
+                )
+    except:
+        pass  # User might have DMs disabled
+
+
+async def update_application_message(bot, app: Application, catalog: TierCatalog, tier: Optional[str],
+                                     moderator: discord.abc.User):
+    """Mark an application's moderator message as processed without fetching it first"""
+    if not app.message_id or not app.channel_id:
+        return
+    
+    user = await resolve_user(bot, int(app.discord_id))
+    embed = application_embed(app, catalog.emoji(app.desired_tier), user.display_avatar.url if user else None)
+    mark_processed(embed, app.id, tier, catalog.emoji(tier), moderator)
+    
+    view = assignment_view(app.id, catalog, disabled=True)
+    channel = bot.get_partial_messageable(int(app.channel_id))
+    try:
+        await channel.get_partial_message(int(app.message_id)).edit(embed=embed, view=view)
+    except discord.NotFound:
+        pass
+    except discord.HTTPException as e:
+        print(f"Could not update message for application #{app.id}: {e}")
+
 
 class TierApplicationModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, catalog: TierCatalog):
         super().__init__(title="Заявка на тир")
+        self.catalog = catalog
         
         self.game_id = discord.ui.TextInput(
             label="ID в игре",
-            placeholder="Введите ваш ID в игре",
+            placeholder="Введите ваш игровой ID",
             required=True,
-            max_length=100
+            max_length=50
         )
         
         self.game_nickname = discord.ui.TextInput(
-            label="Ник в игре",
-            placeholder="Введите ваш ник в игре",
+            label="Никнейм в игре", 
+            placeholder="Введите ваш никнейм в игре",
             required=True,
-            max_length=100
+            max_length=50
         )
         
         self.current_clan = discord.ui.TextInput(
             label="Текущий клан",
-            placeholder="Введите название вашего клана",
+            placeholder="Введите название клана (если есть)",
             required=False,
-            max_length=100
+            max_length=50
         )
         
         self.page_info = discord.ui.TextInput(
-            label="Пейдж",
-            placeholder="Введите информацию о пейдже",
+            label="Информация о странице",
+            placeholder="Ссылка на профиль или дополнительная информация",
             required=False,
             max_length=200
         )
         
         self.desired_tier = discord.ui.TextInput(
-            label="Желаемый тир (T1-T5)",
-            placeholder="T1, T2, T3, T4 или T5",
+            label="Желаемый тир",
+            placeholder=", ".join(catalog.names)[:100],
             required=True,
-            max_length=2
+            max_length=20
         )
         
         self.add_item(self.game_id)
@@ -50,117 +211,109 @@ class TierApplicationModal(discord.ui.Modal):
         self.add_item(self.desired_tier)
     
     async def on_submit(self, interaction: discord.Interaction):
-        # Validate tier
-        desired_tier = self.desired_tier.value.upper()
-        if desired_tier not in Config.AVAILABLE_TIERS:
+        # Validate tier input
+        tier = self.catalog.get(self.desired_tier.value.strip())
+        if not tier:
             await interaction.response.send_message(
-                f"❌ Неверный тир! Доступные тиры: {', '.join(Config.AVAILABLE_TIERS)}", 
+                f"❌ Неверный тир! Доступные тиры: {', '.join(self.catalog.names)}",
                 ephemeral=True
             )
             return
-        
-        # Check if user has pending application
+        desired_tier = tier.name
         bot = interaction.client
-        has_pending = await bot.db.has_pending_application(str(interaction.user.id))
         
-        if has_pending:
+        # Get applications channel before creating anything
+        channel_id = await bot.db.get_guild_applications_channel(str(interaction.guild.id))
+        
+        if not channel_id:
             await interaction.response.send_message(
-                "❌ Ваша активная заявка еще не рассмотрена! Дождитесь решения администратора, после чего сможете подать новую заявку.",
+                "❌ Канал для заявок не настроен! Обратитесь к администратору.",
                 ephemeral=True
             )
             return
         
-        # Create application
+        channel = bot.get_channel(int(channel_id))
+        if not channel:
+            await interaction.response.send_message(
+                "❌ Канал для заявок не найден! Обратитесь к администратору.",
+                ephemeral=True
+            )
+            return
+        
+        # A double submit waits here and then finds the application created by the first one
+        async with submission_lock(interaction.user.id):
+            await self.create_application(interaction, channel, desired_tier, tier.emoji)
+    
+    async def create_application(self, interaction: discord.Interaction, channel: discord.TextChannel,
+                                 desired_tier: str, emoji: str):
+        """Create the application and post it to moderators, unless one is already pending"""
+        bot = interaction.client
         try:
-            app_id = await bot.db.create_application(
+            app, created = await bot.db.create_application_if_absent(
                 discord_id=str(interaction.user.id),
                 game_id=self.game_id.value,
                 game_nickname=self.game_nickname.value,
                 current_clan=self.current_clan.value or "Не указан",
                 page_info=self.page_info.value or "Не указан",
-                desired_tier=desired_tier
+                desired_tier=desired_tier,
+                guild_id=str(interaction.guild.id)
             )
             
-            # Get applications channel
-            channel_id = await bot.db.get_guild_applications_channel(str(interaction.guild.id))
-            
-            if not channel_id:
-                await interaction.response.send_message(
-                    "❌ Канал для заявок не настроен! Обратитесь к администратору.",
-                    ephemeral=True
-                )
-                return
-            
-            channel = bot.get_channel(int(channel_id))
-            if not channel:
+            if not created:
                 await interaction.response.send_message(
-                    "❌ Канал для заявок не найден! Обратитесь к администратору.",
+                    f"❌ Ваша активная заявка{f' #{app.id}' if app else ''} еще не рассмотрена! "
+                    f"Дождитесь решения администратора, после чего сможете подать новую заявку.",
                     ephemeral=True
                 )
                 return
             
-            # Create embed for application
-            embed = discord.Embed(
-                title=f"📋 Заявка на тир {desired_tier}",
-                color=Config.get_tier_color(desired_tier),
-                timestamp=interaction.created_at
-            )
-            
-            embed.add_field(name="👤 Пользователь", value=f"{interaction.user.mention}", inline=True)
-            embed.add_field(name="🎮 ID в игре", value=self.game_id.value, inline=True)
-            embed.add_field(name="🏷️ Ник в игре", value=self.game_nickname.value, inline=True)
-            embed.add_field(name="🏰 Клан", value=self.current_clan.value or "Не указан", inline=True)
-            embed.add_field(name="📄 Пейдж", value=self.page_info.value or "Не указан", inline=True)
-            embed.add_field(name="🎯 Желаемый тир", value=f"{get_tier_emoji(desired_tier)} {desired_tier}", inline=True)
+            app_id = app.id
             
-            embed.set_footer(text=f"ID заявки: {app_id}")
+            # Create application embed
+            embed = application_embed(app, emoji, interaction.user.display_avatar.url)
             
-            # Create tier assignment view
-            view = TierAssignmentView(app_id)
+            # Buttons carry the application id, so nothing has to be registered for this message
+            view = assignment_view(app_id, self.catalog)
             
-            # Send to applications channel
+            # Send application message
             message = await channel.send(embed=embed, view=view)
-            
+            await bot.db.set_application_message(app_id, str(message.id), str(channel.id))
+
             await interaction.response.send_message(
-                f"✅ Ваша заявка на тир {desired_tier} успешно отправлена! Ожидайте рассмотрения.",
+                f"✅ Заявка #{app_id} успешно отправлена! Ожидайте рассмотрения администратором.",
                 ephemeral=True
             )
             
         except Exception as e:
             print(f"Error creating application: {e}")
             await interaction.response.send_message(
-                "❌ Произошла ошибка при создании заявки. Попробуйте еще раз.",
+                "❌ Произошла ошибка при отправке заявки. Попробуйте позже.",
                 ephemeral=True
             )
 
+
 class TierApplicationView(discord.ui.View):
+    """Application panel; registered once, serves every panel message"""
+
     def __init__(self):
         super().__init__(timeout=None)
     
     @discord.ui.button(
         label="Подать заявку на тир",
         style=discord.ButtonStyle.primary,
-        emoji="📋"
+        emoji="📋",
+        custom_id="persistent_tier_application"
     )
     async def submit_application(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Check user permissions
-        guild_id = str(interaction.guild.id)
         bot = interaction.client
         
-        # Get allowed roles
-        allowed_roles = await bot.db.get_guild_allowed_roles(guild_id)
-        
-        if allowed_roles:
-            # Check if user has required role
-            user_role_ids = [str(role.id) for role in interaction.user.roles]
-            has_permission = any(role_id in allowed_roles for role_id in user_role_ids)
-            
-            if not has_permission and not interaction.user.guild_permissions.administrator:
-                await interaction.response.send_message(
-                    "❌ У вас нет прав для подачи заявки!",
-                    ephemeral=True
-                )
-                return
+        if not await bot.permissions.can_use(interaction.user):
+            await interaction.response.send_message(
+                "❌ У вас нет прав для подачи заявки!",
+                ephemeral=True
+            )
+            return
         
         # Check if user already has pending application
         has_pending = await bot.db.has_pending_application(str(interaction.user.id))
@@ -172,224 +325,188 @@ class TierApplicationView(discord.ui.View):
             )
             return
         
-        modal = TierApplicationModal()
+        modal = TierApplicationModal(bot.tiers.get(interaction.guild.id))
         await interaction.response.send_modal(modal)
 
-class TierAssignmentView(discord.ui.View):
-    def __init__(self, application_id: int):
-        super().__init__(timeout=None)
+
+class TierAssignButton(discord.ui.DynamicItem[discord.ui.Button],
+                       template=r'tier:assign:(?P<app_id>[0-9]+):(?P<tier>.+)'):
+    """Assigns one catalog tier to the author of the application encoded in the custom_id"""
+    
+    def __init__(self, application_id: int, tier_name: str, emoji: str = None, highest: bool = False,
+                 disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label=tier_name,
+            style=discord.ButtonStyle.success if highest else discord.ButtonStyle.secondary,
+            emoji=emoji,
+            custom_id=f"tier:assign:{application_id}:{tier_name}",
+            disabled=disabled
+        ))
         self.application_id = application_id
+        self.tier_name = tier_name
     
-    @discord.ui.button(label="T1", style=discord.ButtonStyle.success, emoji="🏆")
-    async def assign_t1(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.assign_tier(interaction, "T1")
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match):
+        return cls(int(match['app_id']), match['tier'])
     
-    @discord.ui.button(label="T2", style=discord.ButtonStyle.secondary, emoji="🥈")
-    async def assign_t2(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.assign_tier(interaction, "T2")
+    async def callback(self, interaction: discord.Interaction):
+        await assign_tier(interaction, self.application_id, self.tier_name)
+
+
+class RejectApplicationButton(discord.ui.DynamicItem[discord.ui.Button],
+                              template=r'tier:reject:(?P<app_id>[0-9]+)'):
+    """Rejects the application encoded in the custom_id"""
     
-    @discord.ui.button(label="T3", style=discord.ButtonStyle.secondary, emoji="🥉")
-    async def assign_t3(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.assign_tier(interaction, "T3")
+    def __init__(self, application_id: int, disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label="Отклонить",
+            style=discord.ButtonStyle.danger,
+            emoji="❌",
+            custom_id=f"tier:reject:{application_id}",
+            disabled=disabled
+        ))
+        self.application_id = application_id
     
-    @discord.ui.button(label="T4", style=discord.ButtonStyle.secondary, emoji="🎖️")
-    async def assign_t4(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.assign_tier(interaction, "T4")
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match):
+        return cls(int(match['app_id']))
     
-    @discord.ui.button(label="T5", style=discord.ButtonStyle.secondary, emoji="🏅")
-    async def assign_t5(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.assign_tier(interaction, "T5")
+    async def callback(self, interaction: discord.Interaction):
+        await reject_application(interaction, self.application_id)
+
+
+async def _legacy_application_id(interaction: discord.Interaction) -> Optional[int]:
+    app = await interaction.client.db.get_application_by_message(str(interaction.message.id))
+    return app.id if app else None
+
+
+class LegacyTierAssignButton(discord.ui.DynamicItem[discord.ui.Button], template=r'assign_(?P<tier>.+)'):
+    """Tier buttons on messages posted before custom_ids carried the application id"""
     
-    @discord.ui.button(label="Отклонить", style=discord.ButtonStyle.danger, emoji="❌")
-    async def reject_application(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.reject_application_handler(interaction)
+    def __init__(self, custom_id: str, application_id: Optional[int], tier_name: str):
+        super().__init__(discord.ui.Button(label=tier_name, custom_id=custom_id))
+        self.application_id = application_id
+        self.tier_name = tier_name
     
-    async def assign_tier(self, interaction: discord.Interaction, tier: str):
-        """Assign tier to user"""
-        # Check admin permissions
-        guild_id = str(interaction.guild.id)
-        bot = interaction.client
-        
-        # Get admin roles
-        admin_roles = await bot.db.get_guild_admin_roles(guild_id)
-        
-        if admin_roles:
-            # Check if user has admin role
-            user_role_ids = [str(role.id) for role in interaction.user.roles]
-            has_admin_permission = any(role_id in admin_roles for role_id in user_role_ids)
-            
-            if not has_admin_permission and not interaction.user.guild_permissions.administrator:
-                await interaction.response.send_message(
-                    "❌ У вас нет прав для выдачи тиров!",
-                    ephemeral=True
-                )
-                return
-        elif not interaction.user.guild_permissions.administrator:
-            await interaction.response.send_message(
-                "❌ У вас нет прав для выдачи тиров!",
-                ephemeral=True
-            )
-            return
-        
-        try:
-            bot = interaction.client
-            
-            # Get application
-            app = await bot.db.get_application(self.application_id)
-            if not app:
-                await interaction.response.send_message(
-                    "❌ Заявка не найдена!",
-                    ephemeral=True
-                )
-                return
-            
-            if app['status'] != 'pending':
-                await interaction.response.send_message(
-                    "❌ Эта заявка уже была обработана!",
-                    ephemeral=True
-                )
-                return
-            
-            # Assign tier
-            await bot.db.assign_tier(
-                discord_id=app['discord_id'],
-                new_tier=tier,
-                assigned_by=str(interaction.user.id),
-                application_id=self.application_id
-            )
-            
-            # Update application status
-            await bot.db.update_application_status(
-                app_id=self.application_id,
-                status='approved',
-                processed_by=str(interaction.user.id)
-            )
-            
-            # Update embed
-            embed = interaction.message.embeds[0]
-            embed.color = Config.get_tier_color(tier)
-            embed.title = f"✅ Заявка одобрена - Тир {tier}"
-            embed.add_field(
-                name="👨‍💼 Обработано",
-                value=f"{interaction.user.mention} - {tier}",
-                inline=False
-            )
-            
-            # Disable buttons
-            for item in self.children:
-                item.disabled = True
-            
-            await interaction.response.edit_message(embed=embed, view=self)
-            
-            # Update tier list
-            try:
-                tier_commands = bot.get_cog('TierCommands')
-                if tier_commands:
-                    await tier_commands.update_tierlist(str(interaction.guild.id))
-            except Exception as e:
-                print(f"Error updating tierlist: {e}")
-            
-            # Notify user
-            try:
-                user = bot.get_user(int(app['discord_id']))
-                if user:
-                    await user.send(
-                        f"🎉 Ваша заявка на тир одобрена! Вам присвоен тир **{tier}** {get_tier_emoji(tier)}\n\n"
-                        f"Теперь вы можете подать новую заявку для изменения тира, если потребуется."
-                    )
-            except:
-                pass  # User might have DMs disabled
-            
-        except Exception as e:
-            print(f"Error assigning tier: {e}")
-            await interaction.response.send_message(
-                "❌ Произошла ошибка при выдаче тира.",
-                ephemeral=True
-            )
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match):
+        return cls(match.string, await _legacy_application_id(interaction), match['tier'])
     
-    async def reject_application_handler(self, interaction: discord.Interaction):
-        """Reject application"""
-        # Check admin permissions
-        guild_id = str(interaction.guild.id)
-        bot = interaction.client
+    async def callback(self, interaction: discord.Interaction):
+        await assign_tier(interaction, self.application_id, self.tier_name)
+
+
+class LegacyRejectApplicationButton(discord.ui.DynamicItem[discord.ui.Button], template=r'reject_application'):
+    """Reject button on messages posted before custom_ids carried the application id"""
+    
+    def __init__(self, application_id: Optional[int]):
+        super().__init__(discord.ui.Button(label="Отклонить", custom_id="reject_application"))
+        self.application_id = application_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match):
+        return cls(await _legacy_application_id(interaction))
+    
+    async def callback(self, interaction: discord.Interaction):
+        await reject_application(interaction, self.application_id)
+
+
+# Registered once at startup with Client.add_dynamic_items
+DYNAMIC_ITEMS = (TierAssignButton, RejectApplicationButton, LegacyTierAssignButton, LegacyRejectApplicationButton)
+
+
+def assignment_view(application_id: int, catalog: TierCatalog, disabled: bool = False) -> discord.ui.View:
+    """Moderator buttons for an application: one per tier, highest first, then reject"""
+    view = discord.ui.View(timeout=None)
+    for index, tier in enumerate(catalog):
+        view.add_item(TierAssignButton(application_id, tier.name, tier.emoji, highest=index == 0, disabled=disabled))
+    view.add_item(RejectApplicationButton(application_id, disabled=disabled))
+    return view
+
+
+async def assign_tier(interaction: discord.Interaction, application_id: Optional[int], tier_name: str):
+    """Assign tier to user"""
+    # Check admin permissions
+    bot = interaction.client
+    
+    if not await bot.permissions.can_admin(interaction.user):
+        await interaction.response.send_message(
+            "❌ У вас нет прав для выдачи тиров!",
+            ephemeral=True
+        )
+        return
+    
+    if application_id is None:
+        await interaction.response.send_message(
+            "❌ Заявка не найдена!",
+            ephemeral=True
+        )
+        return
+    
+    catalog = bot.tiers.get(interaction.guild.id)
+    tier = catalog.get(tier_name)
+    tier_name = tier.name if tier else tier_name
+    
+    try:
+        app, error = await process_application(bot, interaction.guild, interaction.user, application_id, tier_name)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
         
-        # Get admin roles
-        admin_roles = await bot.db.get_guild_admin_roles(guild_id)
+        # Update embed and disable buttons
+        embed = mark_processed(interaction.message.embeds[0], application_id, tier_name,
+                               catalog.emoji(tier_name), interaction.user)
+        await interaction.response.edit_message(embed=embed, view=assignment_view(application_id, catalog,
+                                                                                   disabled=True))
         
-        if admin_roles:
-            # Check if user has admin role
-            user_role_ids = [str(role.id) for role in interaction.user.roles]
-            has_admin_permission = any(role_id in admin_roles for role_id in user_role_ids)
-            
-            if not has_admin_permission and not interaction.user.guild_permissions.administrator:
-                await interaction.response.send_message(
-                    "❌ У вас нет прав для отклонения заявок!",
-                    ephemeral=True
-                )
-                return
-        elif not interaction.user.guild_permissions.administrator:
-            await interaction.response.send_message(
-                "❌ У вас нет прав для отклонения заявок!",
-                ephemeral=True
-            )
+        # Update tier list and notify user
+        await finish_processing(bot, interaction.guild, app, tier_name)
+    
+    except Exception as e:
+        print(f"Error assigning tier: {e}")
+        await interaction.response.send_message(
+            "❌ Произошла ошибка при выдаче тира.",
+            ephemeral=True
+        )
+
+
+async def reject_application(interaction: discord.Interaction, application_id: Optional[int]):
+    """Reject application"""
+    # Check admin permissions
+    bot = interaction.client
+    
+    if not await bot.permissions.can_admin(interaction.user):
+        await interaction.response.send_message(
+            "❌ У вас нет прав для отклонения заявок!",
+            ephemeral=True
+        )
+        return
+    
+    if application_id is None:
+        await interaction.response.send_message(
+            "❌ Заявка не найдена!",
+            ephemeral=True
+        )
+        return
+    
+    try:
+        app, error = await process_application(bot, interaction.guild, interaction.user, application_id, None)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
             return
         
-        try:
-            bot = interaction.client
-            
-            # Get application
-            app = await bot.db.get_application(self.application_id)
-            if not app:
-                await interaction.response.send_message(
-                    "❌ Заявка не найдена!",
-                    ephemeral=True
-                )
-                return
-            
-            if app['status'] != 'pending':
-                await interaction.response.send_message(
-                    "❌ Эта заявка уже была обработана!",
-                    ephemeral=True
-                )
-                return
-            
-            # Update application status
-            await bot.db.update_application_status(
-                app_id=self.application_id,
-                status='rejected',
-                processed_by=str(interaction.user.id)
-            )
-            
-            # Update embed
-            embed = interaction.message.embeds[0]
-            embed.color = Config.COLOR_ERROR
-            embed.title = "❌ Заявка отклонена"
-            embed.add_field(
-                name="👨‍💼 Обработано",
-                value=f"{interaction.user.mention} - Отклонена",
-                inline=False
-            )
-            
-            # Disable buttons
-            for item in self.children:
-                item.disabled = True
-            
-            await interaction.response.edit_message(embed=embed, view=self)
-            
-            # Notify user
-            try:
-                user = bot.get_user(int(app['discord_id']))
-                if user:
-                    await user.send(
-                        "❌ Ваша заявка на тир была отклонена.\n\n"
-                        "Вы можете подать новую заявку с исправленными данными."
-                    )
-            except:
-                pass  # User might have DMs disabled
-            
-        except Exception as e:
-            print(f"Error rejecting application: {e}")
-            await interaction.response.send_message(
-                "❌ Произошла ошибка при отклонении заявки.",
-                ephemeral=True
-            )
+        # Update embed and disable buttons
+        embed = mark_processed(interaction.message.embeds[0], application_id, None, '', interaction.user)
+        await interaction.response.edit_message(
+            embed=embed, view=assignment_view(application_id, bot.tiers.get(interaction.guild.id), disabled=True)
+        )
+        
+        # Notify user
+        await finish_processing(bot, interaction.guild, app, None)
+    
+    except Exception as e:
+        print(f"Error rejecting application: {e}")
+        await interaction.response.send_message(
+            "❌ Произошла ошибка при отклонении заявки.",
+            ephemeral=True
+        )
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+from typing import Any, List, Optional, Tuple
+
+from config import Config
+from metrics import METRICS
+
+
+class WriteBehindBuffer:
+    """Queues non-critical writes and applies them in batches, one transaction per flush
+
+    A flush happens every flush_interval_ms, or as soon as max_rows writes are
+    queued. Writes keep their order. When a batch fails its writes are retried one
+    by one, so a single bad write cannot hold back the rest; a write that still
+    fails is put back, and after max_attempts failures it is appended to the
+    dead-letter file instead of being retried forever.
+    """
+
+    def __init__(self, db, flush_interval_ms: int = None, max_rows: int = None):
+        self.db = db
+        self.flush_interval = (flush_interval_ms if flush_interval_ms is not None
+                               else Config.WRITE_BUFFER_FLUSH_MS) / 1000
+        self.max_rows = max_rows or Config.WRITE_BUFFER_MAX_ROWS
+        self.max_attempts = Config.WRITE_BUFFER_MAX_ATTEMPTS
+        self.dead_letter_path = Config.WRITE_BUFFER_DEAD_LETTER_FILE
+        self._ops: List[Tuple[str, Any]] = []
+        self._attempts: List[int] = []  # Failed attempts so far, per queued write
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def add(self, kind: str, params: Any):
+        """Queue a write; kind names one of the database's deferred statements"""
+        if self._closed:
+            raise RuntimeError("write buffer is closed")
+        self._ops.append((kind, params))
+        self._attempts.append(0)
+        METRICS.set_gauge('write_buffer.queue_depth', len(self._ops))
+        if len(self._ops) >= self.max_rows:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows written"""
+        async with self._flush_lock:
+            if not self._ops:
+                return 0
+
+            ops, self._ops = self._ops, []
+            attempts, self._attempts = self._attempts, []
+            started = time.perf_counter()
+            try:
+                await self.db.apply_writes(ops)
+                written = len(ops)
+            except Exception as e:
+                METRICS.inc('write_buffer.flush_errors')
+                print(f"[WRITES] Flush of {len(ops)} write(s) failed, retrying them one by one: {e}")
+                written = await self._apply_one_by_one(ops, attempts)
+            finally:
+                METRICS.set_gauge('write_buffer.queue_depth', len(self._ops))
+
+            METRICS.observe('write_buffer.flush', time.perf_counter() - started)
+            METRICS.inc('write_buffer.rows_flushed', written)
+            return written
+
+    async def _apply_one_by_one(self, ops: List[Tuple[str, Any]], attempts: List[int]) -> int:
+        """Write each op on its own; failed ones go back (ahead of anything queued meanwhile) or are dead-lettered"""
+        written = 0
+        retry_ops, retry_attempts, dead = [], [], []
+        for op, failures in zip(ops, attempts):
+            try:
+                await self.db.apply_writes([op])
+                written += 1
+            except Exception as e:
+                if failures + 1 >= self.max_attempts:
+                    dead.append((op, e))
+                else:
+                    retry_ops.append(op)
+                    retry_attempts.append(failures + 1)
+        self._ops[:0] = retry_ops
+        self._attempts[:0] = retry_attempts
+        if dead:
+            self._dead_letter(dead)
+        return written
+
+    def _dead_letter(self, dead: List[Tuple[Tuple[str, Any], Exception]]):
+        """Append writes that kept failing to the dead-letter file, so they can be inspected or replayed"""
+        METRICS.inc('write_buffer.dead_lettered', len(dead))
+        print(f"[WRITES] Giving up on {len(dead)} write(s) after {self.max_attempts} attempts, "
+              f"see {self.dead_letter_path}")
+        try:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                for (kind, params), error in dead:
+                    f.write(json.dumps({'kind': kind, 'params': params, 'error': str(error),
+                                        'at': int(time.time())}, default=str) + '\n')
+        except OSError as e:
+            print(f"[WRITES] Could not write the dead-letter file, {len(dead)} write(s) lost: {e}")
+
+    async def close(self):
+        """Stop the flush loop and write out whatever is still queued"""
+        self._closed = True
+        if self._task:
+            # Never cancel a flush midway: its batch would be neither written nor requeued
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Each failing flush counts an attempt, so this ends with every write saved or dead-lettered
+        for _ in range(self.max_attempts):
+            if not self._ops:
+                break
+            await self.flush()
+        if self._ops:
+            print(f"[WRITES] {len(self._ops)} queued write(s) could not be saved on shutdown")